@@ -17,7 +17,33 @@ Enumeration limitation
 >>> @Setter(enum=["Head", "Tail"])
 ... def set_coin_toss(self, toss):
 ...     self.toss = toss
+
+Validate all the setters of a class in one call with setter_schema,
+the errors of all the fields are raised together
+
+>>> @setter_schema
+... class Person(object):
+...     def __init__(self, **kwargs):
+...         self.set_fields(kwargs)
+...
+...     @Setter(min=0, max=150, dtype=float)
+...     def set_age(self, age):
+...         self.age = age
+...
+...     @Setter(enum=["Male", "Female"])
+...     def set_sex(self, sex):
+...         self.sex = sex
+>>> person = Person(age="42", sex="Female")
+>>> invalid = {"age": -1, "sex": "Bob"}
+>>> Person.validate_fields(invalid)  # doctest: +IGNORE_EXCEPTION_DETAIL
+Traceback (most recent call last):
+...
+ValidationError: Invalid fields: age (Minimum is 0), sex (Expecting in ...)
 """
+from collections import OrderedDict
+
+SCHEMA_ATTRIBUTES = ("set_fields", "validate_fields", "setter_fields")
+"""Attributes added to the class by setter_schema"""
 
 
 class Setter(object):
@@ -72,4 +98,263 @@ class Setter(object):
             # ------------------  run function  -----------------------------
             return func(obj, value)
 
+        # constraints and undecorated function, for setter_schema
+        wrapper.setter = self
+        wrapper.func = func
         return wrapper
+
+
+class ValidationError(ValueError):
+    """Values rejected by the validator of setter_schema
+
+    Attributes
+    ----------
+    errors : dict
+        Error message by field name
+    """
+    def __init__(self, errors):
+        self.errors = errors
+        ValueError.__init__(self, "Invalid fields: %s" % ", ".join(
+            "%s (%s)" % (name, message) for name, message in errors.items()))
+
+
+class _Invalid(Exception):
+    """Raised by the checks of _field_check, args are the message"""
+
+
+def _field_check(setter):
+    """Function checking one value against the constraints of a Setter
+
+    Parameters
+    ----------
+    setter : Setter
+        Constraints of the field
+
+    Returns
+    -------
+    check : function
+        check(value) returns the value converted to the dtype, raises
+        _Invalid with the error message.  The constraints that are not
+        set are not tested.
+    """
+    dtype, v_min, v_max, enum = setter.dtype, setter.min, setter.max, \
+        setter.enum
+    min_msg = "Minimum is %s" % str(v_min)
+    max_msg = "Maximum is %s" % str(v_max)
+    enum_msg = "Expecting in %s" % str(enum)
+
+    def check(value):
+        if dtype is not None:
+            try:
+                value = dtype(value)
+            except Exception:
+                raise _Invalid(
+                    "Expecting %s but got %s" % (dtype, type(value)))
+
+        # comparisons may raise too, like a str against a number
+        try:
+            if v_min is not None and not value >= v_min:
+                message = min_msg
+            elif v_max is not None and not value <= v_max:
+                message = max_msg
+            elif enum is not None and value not in enum:
+                message = enum_msg
+            else:
+                return value
+        except Exception as e:
+            message = "%s: %s" % (type(e).__name__, e)
+        raise _Invalid(message)
+    return check
+
+
+def compile_validator(setters):
+    """Build one function checking the values of several setters
+
+    The constraints of each field are bound once, when the class is
+    decorated, instead of being looked up on every call.
+
+    Parameters
+    ----------
+    setters : OrderedDict
+        Setter by field name
+
+    Returns
+    -------
+    validate : function
+        validate(values) returns a dict of the valid values (converted
+        to the dtype of their setter), in the order of setters.  Raises
+        ValidationError with the errors of all the fields (unknown
+        names included).
+    """
+    checks = [(name, _field_check(setter))
+              for name, setter in setters.items()]
+    known = frozenset(setters)
+
+    def validate(values):
+        errors = {}
+        checked = {}
+        for name, check in checks:
+            if name in values:
+                try:
+                    checked[name] = check(values[name])
+                except _Invalid as e:
+                    errors[name] = e.args[0]
+        if len(checked) + len(errors) < len(values):
+            for name in values:
+                if name not in known:
+                    errors[name] = "Unknown field"
+        if errors:
+            raise ValidationError(errors)
+        return checked
+    return validate
+
+
+def compile_setter(setters, funcs):
+    """Build one function validating then setting several fields
+
+    Parameters
+    ----------
+    setters : OrderedDict
+        Setter by field name
+    funcs : dict
+        Undecorated setter function by field name
+
+    Returns
+    -------
+    set_fields : function
+        set_fields(self, values) checks all the values of the dict
+        like the function of compile_validator, then calls the
+        functions in the order of setters.  Nothing is set if a value
+        is invalid.  Its 'setters' attribute is the setters argument.
+    """
+    validate = compile_validator(setters)
+
+    def set_fields(self, values):
+        for name, value in validate(values).items():
+            funcs[name](self, value)
+    set_fields.setters = setters
+    return set_fields
+
+
+def setter_schema(cls):
+    """Class decorator validating all the Setter methods in one call
+
+    The methods decorated with Setter (inherited ones included) are
+    the fields of the class, named without the "set_" prefix.  The
+    class gets:
+
+    validate_fields(values)
+        static method returning the valid values, see compile_validator
+    set_fields(self, values)
+        validates all the values, then calls the undecorated setters in
+        the order of the class definition, see compile_setter
+    setter_fields
+        tuple of the field names
+
+    A setter overridden without Setter is no longer a field.  The
+    methods are built for cls only: a subclass adding or overriding
+    setters inherits the set_fields of cls, which ignores them, unless
+    it is decorated with setter_schema as well.
+
+    Raises TypeError if cls already has one of these attributes, unless
+    it comes from a base class decorated with setter_schema.
+    """
+    for klass in cls.__mro__:
+        attrs = vars(klass)
+        if hasattr(attrs.get("set_fields"), "setters"):
+            # set by setter_schema
+            continue
+        for name in SCHEMA_ATTRIBUTES:
+            if name in attrs:
+                raise TypeError(
+                    "setter_schema would replace %s.%s"
+                    % (klass.__name__, name))
+
+    setters = OrderedDict()
+    funcs = {}
+    fields = {}     # field by method name
+    for klass in reversed(cls.__mro__):
+        for name, method in vars(klass).items():
+            if not isinstance(getattr(method, "setter", None), Setter):
+                if name in fields:
+                    # overridden by a plain method
+                    field = fields.pop(name)
+                    setters.pop(field, None)
+                    funcs.pop(field, None)
+                continue
+            field = name[4:] if name[:4] == "set_" else name
+            fields[name] = field
+            setters[field] = method.setter
+            funcs[field] = method.func
+
+    cls.validate_fields = staticmethod(compile_validator(setters))
+    cls.set_fields = compile_setter(setters, funcs)
+    cls.setter_fields = tuple(setters)
+    return cls
+
+
+if __name__ == "__main__":
+    # ------------  compare the setters one by one with set_fields  ---------
+    from argparse import ArgumentParser
+    import time
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--objects", default=100000, type=int,
+        help="Number of objects constructed")
+    parser.add_argument("--repeat", default=3, type=int)
+    args = parser.parse_args()
+
+    @setter_schema
+    class Sample(object):
+        @Setter(min=0, max=150, dtype=float)
+        def set_age(self, age):
+            self.age = age
+
+        @Setter(enum=["Male", "Female"])
+        def set_sex(self, sex):
+            self.sex = sex
+
+        @Setter(min=1, max=12, dtype=int)
+        def set_month(self, month):
+            self.month = month
+
+        @Setter(dtype=str)
+        def set_name(self, name):
+            self.name = name
+
+        @Setter(min=0.0, max=1.0)
+        def set_ratio(self, ratio):
+            self.ratio = ratio
+
+        @Setter(enum=["Head", "Tail"], dtype=str)
+        def set_toss(self, toss):
+            self.toss = toss
+
+    class OneByOne(Sample):
+        def __init__(self, **kwargs):
+            self.set_age(kwargs["age"])
+            self.set_sex(kwargs["sex"])
+            self.set_month(kwargs["month"])
+            self.set_name(kwargs["name"])
+            self.set_ratio(kwargs["ratio"])
+            self.set_toss(kwargs["toss"])
+
+    class AllAtOnce(Sample):
+        def __init__(self, **kwargs):
+            self.set_fields(kwargs)
+
+    values = {"age": 42, "sex": "Male", "month": "3", "name": "Bob",
+              "ratio": 0.5, "toss": "Tail"}
+
+    rates = {}
+    for label, cls in [("setters", OneByOne), ("set_fields", AllAtOnce)]:
+        best = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for _ in range(args.objects):
+                cls(**values)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        rates[label] = args.objects / best
+        print("%10s: %10.0f objects/s" % (label, rates[label]))
+    print("Speedup %.2fx" % (rates["set_fields"] / rates["setters"]))
@@ -1 +1,3 @@
+from . import inheritance
+from . import parser_bytecode
 from . import parser_python
\ No newline at end of file
@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+"""Resolve the parents of the classes to qualified class names
+
+The parsers store the bases of a class as written in the source
+('Base', 'mod.Mixin', 'Generic[T]').  The same bare name can be a
+different class in each module, so drawing the extensions by name
+links the wrong classes.  ClassIndex walks a package specification
+once to index the qualified name of every class (module name + "." +
+class name) and the import table of every module (the 'imports' of the
+parsers), then resolves each base like python would:
+
+1. a class of the enclosing class or of the module,
+2. a name bound by an import ("from .core import Base as B" or the
+   "core" of "core.Base"), following the re-exports of the packages
+   (a name imported in pkg/__init__.py from pkg.core),
+3. a star import, searched in the dependencies of the module,
+4. without an import table, a class name unique in the package.
+
+map_with_inspect records where each base is defined
+('parent_qualnames'), these are looked up directly.
+
+Every (module, base) pair is resolved once, so the whole package is
+resolved in time linear in the number of classes.  The bases defined
+outside of the package (object, builtins, libraries) are not resolved.
+
+Examples
+--------
+>>> from boring_stuff.projects.map import map_python
+>>> from boring_stuff.parser.inheritance import ClassIndex
+>>> c_package = map_python("boring_stuff", single_pass=True)
+>>> index = ClassIndex(c_package)
+>>> index.resolve("boring_stuff.projects.map_git", "GitError")
+'boring_stuff.projects.map_git.GitError'
+>>> edges = index.annotate(c_package)
+
+Each class spec now has 'parent_ids', class_diagram draws the
+extensions between modules with them.  The mappers of
+boring_stuff.projects (map_python, map_module, ...) call
+resolve_parents once on the package they return, so the renderers
+never resolve anything.
+"""
+import logging
+
+logger = logging.getLogger("boring_stuff.parser.inheritance")
+
+
+class ClassIndex(object):
+    """Qualified names of the classes of a package and the import tables
+
+    Parameters
+    ----------
+    package : dict
+        Package specification from the mappers
+    """
+    def __init__(self, package):
+        self.classes = set()
+        """Qualified names of the classes"""
+
+        self.aliases = {}
+        """Qualified name of the classes of package/__init__.py by the
+        name they are imported with (pkg.Base for pkg.__init__.Base)"""
+
+        self.modules = {}
+        """Module name by the name it is imported with"""
+
+        self.imports = {}
+        """Import table by module name, see
+        boring_stuff.parser.parser_python.import_table"""
+
+        self.dependencies = {}
+        """Imported modules by module name"""
+
+        self.by_name = {}
+        """Qualified names by class name (last part)"""
+
+        self._resolved = {}
+
+        to_visit = [package]
+        while to_visit:
+            spec = to_visit.pop()
+            to_visit.extend(spec.get("subpackages", []))
+            to_visit.extend(spec.get("modules", []))
+            if spec.get("type") != "module" or spec.get("skipped"):
+                continue
+            self._add_module(spec)
+
+    def _add_module(self, module):
+        name = module["name"]
+        package_name = None
+        if name.endswith(".__init__"):
+            package_name = name[:-len(".__init__")]
+            self.modules[package_name] = name
+        self.modules[name] = name
+        if module.get("imports") is not None:
+            self.imports[name] = module["imports"]
+        self.dependencies[name] = [
+            dependency for _, dependency in module.get("dependencies", [])]
+
+        for class_spec in module.get("class_list", []):
+            class_id = name + "." + class_spec["name"]
+            self.classes.add(class_id)
+            if package_name is not None:
+                self.aliases[package_name + "." + class_spec["name"]] = \
+                    class_id
+            self.by_name.setdefault(
+                class_spec["name"].split(".")[-1], []).append(class_id)
+
+    def class_id(self, name):
+        """Qualified name of a class from an absolute name, or None"""
+        if name in self.classes:
+            return name
+        return self.aliases.get(name)
+
+    def resolve(self, module_name, base, scope=None):
+        """Qualified name of a base of a class of a module
+
+        Parameters
+        ----------
+        module_name : str
+            Name of the module defining the class
+
+        base : str
+            The base as written, like "Base", "core.Base" or
+            "Generic[T]"
+
+        scope : str or None
+            Qualified name of the class in the module ("Outer.Inner"),
+            for the classes of the enclosing classes
+
+        Returns
+        -------
+        class_id : str or None
+            Qualified name of the parent, None if it is not a class of
+            the package
+        """
+        name = base.split("[")[0].strip()
+        if not name or "(" in name:
+            return None
+
+        # classes of the enclosing classes
+        scopes = scope.split(".")[:-1] if scope else []
+        while scopes:
+            class_id = self.class_id(
+                "%s.%s.%s" % (module_name, ".".join(scopes), name))
+            if class_id is not None:
+                return class_id
+            scopes.pop()
+        return self._resolve(module_name, name)
+
+    def _resolve(self, module_name, name):
+        """Resolve name in the namespace of a module, memoized"""
+        key = (module_name, name)
+        if key in self._resolved:
+            return self._resolved[key]
+        # None while resolving, a cycle of imports resolves to nothing
+        self._resolved[key] = None
+
+        class_id = self.class_id(module_name + "." + name)
+        head, _, rest = name.partition(".")
+        table = self.imports.get(module_name)
+        if class_id is None and table is not None and head in table:
+            class_id = self._lookup(
+                table[head] + "." + rest if rest else table[head])
+        elif class_id is None:
+            # absolute name (the import of the head is not parsed) or
+            # class of a dependency, through a star import
+            class_id = self.class_id(name)
+            for dependency in self.dependencies.get(module_name, []):
+                if class_id is not None:
+                    break
+                if dependency in self.modules:
+                    class_id = self.class_id(
+                        self.modules[dependency] + "." + name)
+            if class_id is None and table is None:
+                candidates = self.by_name.get(name.split(".")[-1], [])
+                if len(candidates) == 1:
+                    class_id = candidates[0]
+
+        self._resolved[key] = class_id
+        return class_id
+
+    def _lookup(self, target):
+        """Class of an absolute name, through the modules re-exporting it"""
+        class_id = self.class_id(target)
+        if class_id is not None:
+            return class_id
+        parts = target.split(".")
+        for i_part in range(len(parts) - 1, 0, -1):
+            module_name = self.modules.get(".".join(parts[:i_part]))
+            if module_name is not None:
+                return self._resolve(module_name, ".".join(parts[i_part:]))
+        return None
+
+    def parent_ids(self, module_name, class_spec):
+        """Qualified names of the parents of a class
+
+        Returns
+        -------
+        parent_ids : list or None
+            One entry per base in 'parent', None for an unresolved
+            base.  None if the class has no parent.
+        """
+        parent_list = class_spec.get("parent")
+        if not parent_list:
+            return None
+        qualnames = class_spec.get("parent_qualnames")
+        if qualnames is not None:
+            return [self.class_id(qualname) for qualname in qualnames]
+        return [self.resolve(module_name, parent, class_spec["name"])
+                for parent in parent_list]
+
+    def annotate(self, package):
+        """Add the 'parent_ids' of each class of a package specification
+
+        Returns
+        -------
+        edges : list
+            [class id, parent id] of the resolved parents
+        """
+        edges = []
+        n_bases = 0
+        to_visit = [package]
+        while to_visit:
+            spec = to_visit.pop()
+            to_visit.extend(spec.get("subpackages", []))
+            to_visit.extend(spec.get("modules", []))
+            for class_spec in spec.get("class_list", []):
+                parent_ids = self.parent_ids(spec["name"], class_spec)
+                class_spec["parent_ids"] = parent_ids
+                for parent_id in parent_ids or []:
+                    n_bases += 1
+                    if parent_id is not None:
+                        edges.append(
+                            [spec["name"] + "." + class_spec["name"],
+                             parent_id])
+        logger.info("Resolved %d of %d bases" % (len(edges), n_bases))
+        return edges
+
+
+def resolve_parents(package):
+    """Add the 'parent_ids' of each class, see ClassIndex.annotate"""
+    return ClassIndex(package).annotate(package)
+
+
+if __name__ == "__main__":
+    # --------------------------  parse commands  ---------------------------
+    from argparse import ArgumentParser
+    import time
+    parser = ArgumentParser()
+    parser.add_argument("project_dir", help="Project directory to parse")
+    parser.add_argument(
+        "--output", default="", help="Location to generate the class diagram")
+    parser.add_argument(
+        "--unresolved", action="store_true",
+        help="List the bases that are not classes of the project")
+    args = parser.parse_args()
+
+    from boring_stuff.projects.map import map_python
+    c_package = map_python(args.project_dir, single_pass=True)
+    start = time.time()
+    edges = resolve_parents(c_package)
+    print("%d inheritance edges resolved in %.3f s" % (
+        len(edges), time.time() - start))
+
+    if args.unresolved:
+        to_visit = [c_package]
+        while to_visit:
+            spec = to_visit.pop()
+            to_visit.extend(spec.get("subpackages", []))
+            to_visit.extend(spec.get("modules", []))
+            for class_spec in spec.get("class_list", []):
+                for parent, parent_id in zip(
+                        class_spec["parent"] or [],
+                        class_spec["parent_ids"] or []):
+                    if parent_id is None:
+                        print("%s.%s: %s" % (
+                            spec["name"], class_spec["name"], parent))
+
+    if args.output:
+        from boring_stuff.uml.class_diagram import write_class_diagram
+        write_class_diagram(c_package, args.output)
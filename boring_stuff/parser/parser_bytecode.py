@@ -0,0 +1,643 @@
+#!/usr/bin/env python
+"""Bytecode Parser Module
+
+Map the classes and functions of a python module from its compiled
+bytecode (.pyc).  The code objects are read back with marshal and
+their instructions and constants are walked, nothing is executed.  The
+result has the schema of parser_python.parse_buffer_single_pass:
+
+* a class body is a code object built by LOAD_BUILD_CLASS, its bases
+  are the names loaded before the call,
+* the parameters are the first co_argcount + co_kwonlyargcount names
+  of co_varnames, followed by the ``*args`` / ``**kwargs`` names,
+* the imports are the IMPORT_NAME instructions of all the code
+  objects, the names they bind are in the IMPORT_FROM and STORE_*
+  instructions following them.
+
+Bytecode is only readable by the python version that wrote it, files
+with another magic number raise a ValueError.  'signature_loc' is None
+since the source offsets are not kept in the bytecode.
+
+The bytecode sees the code as compiled, so a few specs differ from the
+ones of the source scanner:
+
+* the import statements of an if/try block of the module body are top
+  level, the scanner only counts the unindented ones, so the order of
+  'imports' can differ (with the same names),
+* the statements the scanner does not see are found: an import after
+  a ";" or a ":" on the same line, a class whose bases have more than
+  one level of nested brackets,
+* a base that is not a (dotted, subscripted) name, e.g. a call like
+  namedtuple(...), is left out of 'parent',
+* the private names imported in a class body are mangled
+  (_Class__name).
+
+Examples
+--------
+>>> from boring_stuff.parser import parser_bytecode as PB
+>>> module = PB.parse_pyc(
+...     "boring_stuff/__pycache__/__init__.cpython-311.pyc", "boring_stuff")
+>>> # parse the cached bytecode when fresh, the source otherwise
+>>> module = PB.parse_file("boring_stuff/parser/parser_python.py")
+"""
+from collections import OrderedDict
+import bisect
+import dis
+import importlib.util
+import inspect
+import logging
+import marshal
+import os
+import sys
+from types import CodeType
+from boring_stuff.parser.parser_python import _function_spec, \
+    dependency_pairs, import_table, module_name, parse_file as parse_source, \
+    resolve_import
+
+logger = logging.getLogger("boring_stuff.parser.parser_bytecode")
+
+PYC_HEADER_SIZE = 16
+"""Magic number, flags and either (mtime, size) or the source hash"""
+
+_IMPORT_NAME = bytes([dis.opmap["IMPORT_NAME"]])
+_MAKE_FUNCTION = bytes([dis.opmap["MAKE_FUNCTION"]])
+_LOAD_BUILD_CLASS = dis.opmap["LOAD_BUILD_CLASS"]
+_LOAD_CONST = dis.opmap["LOAD_CONST"]
+_EXTENDED_ARG = bytes([dis.EXTENDED_ARG])
+_OPNAMES = dis.opname
+
+_STATEMENT_ENDS = frozenset(
+    op for name, op in dis.opmap.items()
+    if name.startswith("STORE_") or name == "POP_TOP")
+"""Opcodes ending a statement, the decorators of a def follow them"""
+
+_NAME_ARGS = {
+    "LOAD_NAME": 0, "LOAD_METHOD": 0, "IMPORT_NAME": 0,
+    "LOAD_GLOBAL": 1 if sys.version_info >= (3, 11) else 0,
+    "LOAD_ATTR": 1 if sys.version_info >= (3, 12) else 0,
+}
+"""Instructions with an index in co_names as argument.  Since python
+3.11 (LOAD_GLOBAL) and 3.12 (LOAD_ATTR) the lowest bit of the argument
+is a flag."""
+
+_CALLS = set([
+    "CALL_FUNCTION", "CALL_FUNCTION_KW", "CALL_METHOD", "CALL", "CALL_KW",
+])
+"""Call instructions, with the number of arguments as argument"""
+
+
+def read_pyc(filename):
+    """Read the header and code object of a .pyc file
+
+    Parameters
+    ----------
+    filename : str
+        Path of the bytecode file
+
+    Returns
+    -------
+    code : code
+        The code object of the module body (not executed)
+
+    header : dict
+        'flags', and 'mtime' and 'size' of the source for a
+        timestamp-based pyc or 'hash' for a hash-based one (PEP 552)
+    """
+    with open(filename, "rb") as file_in:
+        data = file_in.read()
+    header = _read_header(data, filename)
+    return marshal.loads(memoryview(data)[PYC_HEADER_SIZE:]), header
+
+
+def _read_header(data, filename):
+    """Decode the header at the start of data, see read_pyc"""
+    if data[:4] != importlib.util.MAGIC_NUMBER:
+        raise ValueError(
+            "%s was not compiled by this python version (magic %r)" % (
+                filename, data[:4]))
+    if len(data) < PYC_HEADER_SIZE:
+        raise ValueError("%s is truncated" % filename)
+
+    flags = int.from_bytes(data[4:8], "little")
+    header = {"flags": flags}
+    if flags & 0x1:
+        header["hash"] = data[8:16]
+    else:
+        header["mtime"] = int.from_bytes(data[8:12], "little")
+        header["size"] = int.from_bytes(data[12:16], "little")
+    return header
+
+
+def is_fresh(header, source):
+    """Check a pyc header against its source file
+
+    Like the import system: the mtime and size are compared for a
+    timestamp-based pyc, the hash of the source for a checked
+    hash-based pyc.  An unchecked hash-based pyc is always fresh.
+    """
+    if header["flags"] & 0x1:
+        if not header["flags"] & 0x2:
+            return True
+        with open(source, "rb") as file_in:
+            return importlib.util.source_hash(file_in.read()) == \
+                header["hash"]
+
+    st = os.stat(source)
+    return header["mtime"] == int(st.st_mtime) & 0xFFFFFFFF and \
+        header["size"] == st.st_size & 0xFFFFFFFF
+
+
+def pyc_module_name(filename, base_name=None):
+    """Name of the module of a .pyc file
+
+    "pkg/__pycache__/mod.cpython-311.pyc" and "pkg/mod.pyc" both
+    define the module mod.
+    """
+    base = os.path.basename(filename)[:-4]
+    if os.path.basename(os.path.dirname(os.path.abspath(filename))) == \
+            "__pycache__":
+        base = base.split(".")[0]
+    if base_name is None:
+        return base
+    return base_name + "." + base
+
+
+def _is_function(code):
+    """True for the code of a def (not a class body, lambda, ...)"""
+    return bool(code.co_flags & inspect.CO_NEWLOCALS) and \
+        code.co_name[:1] != "<"
+
+
+def _params(code):
+    """Parameter names of a function code object"""
+    n_args = code.co_argcount + code.co_kwonlyargcount
+    params = list(code.co_varnames[:n_args])
+    var_params = None
+    varkw_params = None
+    if code.co_flags & inspect.CO_VARARGS:
+        var_params = code.co_varnames[n_args]
+        n_args += 1
+    if code.co_flags & inspect.CO_VARKEYWORDS:
+        varkw_params = code.co_varnames[n_args]
+    return {"params": params, "var_params": var_params,
+            "varkw_params": varkw_params}
+
+
+def _instructions(code):
+    """Opcodes and arguments of a code object
+
+    Much lighter than dis.get_instructions, there is no decoding at
+    all: the instructions of interest are found with bytes.find on the
+    opcodes, the others are never looked at.  Arguments larger than a
+    byte are prefixed by EXTENDED_ARG instructions, see _arg.  The
+    CACHE entries of python 3.11+ are kept too.
+
+    Returns
+    -------
+    opcodes : bytes
+        Opcode of each instruction
+
+    args : bytes
+        Lowest byte of the argument of each instruction
+    """
+    ops = code.co_code
+    return ops[::2], ops[1::2]
+
+
+def _arg(opcodes, args, i_instruction):
+    """Argument of an instruction, with its EXTENDED_ARG prefixes"""
+    arg = args[i_instruction]
+    shift = 8
+    i_instruction -= 1
+    while i_instruction >= 0 and opcodes[i_instruction] == dis.EXTENDED_ARG:
+        arg |= args[i_instruction] << shift
+        shift += 8
+        i_instruction -= 1
+    return arg
+
+
+def _previous(opcodes, i_instruction):
+    """Index of the instruction before, skipping the prefixes"""
+    i_instruction -= 1
+    while i_instruction >= 0 and opcodes[i_instruction] == dis.EXTENDED_ARG:
+        i_instruction -= 1
+    return i_instruction
+
+
+def _argval(code, opname, arg):
+    """Resolve the argument of a LOAD_CONST or of an instruction on a name"""
+    if opname == "LOAD_CONST" or opname == "KW_NAMES":
+        return code.co_consts[arg]
+    return code.co_names[arg >> _NAME_ARGS[opname]]
+
+
+def _class_bases(code, opcodes, args, i_start):
+    """Names of the bases of the class built from instruction i_start
+
+    Parameters
+    ----------
+    code : code
+        The code object defining the class
+
+    opcodes, args
+        Instructions of code, see _instructions
+
+    i_start : int
+        Index of the instruction after the class name
+
+    Returns
+    -------
+    bases : list
+        Dotted names of the bases, keyword arguments (metaclass) and
+        expressions other than names are dropped.
+    """
+    # one entry per value on the stack, None for anything but a name
+    stack = []
+    n_keywords = 0
+    for i_instruction in range(i_start, len(opcodes)):
+        opname = _OPNAMES[opcodes[i_instruction]]
+        if opname == "EXTENDED_ARG":
+            continue
+        arg = _arg(opcodes, args, i_instruction)
+        if opname == "LOAD_NAME" or opname == "LOAD_GLOBAL":
+            stack.append(_argval(code, opname, arg))
+        elif opname == "LOAD_ATTR" or opname == "LOAD_METHOD":
+            if stack and stack[-1] is not None:
+                stack[-1] += "." + _argval(code, opname, arg)
+        elif opname == "KW_NAMES":
+            # keyword names of the next CALL
+            n_keywords = len(_argval(code, opname, arg))
+        elif opname == "LOAD_CONST":
+            # only keep the tuples, they may be keyword names
+            argval = _argval(code, opname, arg)
+            stack.append(argval if isinstance(argval, tuple) else None)
+        elif opname in _CALLS:
+            if opname in ("CALL_FUNCTION_KW", "CALL_KW") and stack and \
+                    isinstance(stack[-1], tuple):
+                n_keywords = len(stack.pop())
+            if arg > len(stack):
+                # more arguments than bases: __build_class__(func, name,
+                # *bases, **keywords)
+                break
+            # call in the bases, replaced by its result
+            del stack[len(stack) - arg:]
+            if stack:
+                stack[-1] = None
+            n_keywords = 0
+        elif opname == "CALL_FUNCTION_EX":
+            # bases given as *args
+            break
+        elif opname.startswith("BUILD_"):
+            del stack[len(stack) - arg:]
+            stack.append(None)
+        elif opname == "BINARY_SUBSCR":
+            # Generic[T], the parameters are kept when they are names
+            if len(stack) > 1:
+                item = stack.pop()
+                if stack[-1] is not None:
+                    stack[-1] = stack[-1] + "[%s]" % item \
+                        if isinstance(item, str) else None
+        elif opname not in ("CACHE", "PUSH_NULL", "NOP", "PRECALL"):
+            # call, comprehension or operator in the bases
+            if stack:
+                stack[-1] = None
+
+    if n_keywords:
+        stack = stack[:-n_keywords]
+    return [base for base in stack if isinstance(base, str)]
+
+
+def _decorators(code, opcodes, args, i_code):
+    """Names loaded between the previous statement and instruction i_code"""
+    names = []
+    for i_instruction in range(i_code - 1, -1, -1):
+        op = opcodes[i_instruction]
+        if op in _STATEMENT_ENDS:
+            break
+        opname = _OPNAMES[op]
+        if opname == "LOAD_NAME" or opname == "LOAD_GLOBAL":
+            names.append(_argval(
+                code, opname, _arg(opcodes, args, i_instruction)))
+    return names
+
+
+def _walk_body(code, module, qualname=None, bases=None):
+    """Add the classes and functions defined by a module/class body
+
+    Each def and class statement ends with a MAKE_FUNCTION of the code
+    object loaded just before (and of its qualified name before python
+    3.11).  A class body is loaded right after LOAD_BUILD_CLASS.
+
+    Parameters
+    ----------
+    code : code
+        Code object of the module or of a class body
+
+    module : dict
+        The module spec being built
+
+    qualname : str or None
+        Qualified name of the class, None for the module body
+
+    bases : list or None
+        Names of the bases of the class
+    """
+    class_spec = None
+    if qualname is not None:
+        class_spec = OrderedDict([
+            ["type", "class"],
+            ["name", qualname],
+            ["parent", bases or None],
+            ["signature_loc", None],
+            ["attributes", []], ["methods", []],
+            ["classmethods", []], ["staticmethods", []],
+        ])
+        module["class_list"].append(class_spec)
+    decorated = class_spec is not None and (
+        "staticmethod" in code.co_names or "classmethod" in code.co_names)
+
+    consts = code.co_consts
+    opcodes, args = _instructions(code)
+    i_make = opcodes.find(_MAKE_FUNCTION)
+    while i_make >= 0:
+        body = None
+        i_code = _previous(opcodes, i_make)
+        for _ in range(2):
+            if i_code >= 0 and opcodes[i_code] == _LOAD_CONST:
+                const = consts[_arg(opcodes, args, i_code)]
+                if type(const) is CodeType:
+                    body = const
+                    break
+            i_code = _previous(opcodes, i_code)
+
+        if body is None:
+            pass
+        elif _LOAD_BUILD_CLASS in [
+                opcodes[_previous(opcodes, i_code)],
+                opcodes[_previous(opcodes, _previous(opcodes, i_code))]]:
+            # the class name follows MAKE_FUNCTION, then the bases
+            _walk_body(body, module, _body_qualname(body),
+                       _class_bases(code, opcodes, args, i_make + 2))
+        elif _is_function(body):
+            func_spec = _function_spec(body.co_name, _params(body))
+            names = _decorators(code, opcodes, args, i_code) \
+                if decorated else ()
+            if class_spec is None:
+                module["methods"].append(func_spec)
+            elif "staticmethod" in names:
+                class_spec["staticmethods"].append(func_spec)
+            elif "classmethod" in names:
+                class_spec["classmethods"].append(func_spec)
+            else:
+                class_spec["methods"].append(func_spec)
+        i_make = opcodes.find(_MAKE_FUNCTION, i_make + 1)
+
+
+def _body_qualname(body):
+    """Qualified name of a class from the code of its body"""
+    qualname = getattr(body, "co_qualname", None)
+    if qualname is not None:
+        return qualname
+    # before python 3.11, the first constant is stored as __qualname__
+    if body.co_consts and isinstance(body.co_consts[0], str):
+        return body.co_consts[0]
+    return body.co_name
+
+
+def code_imports(code, mod_name):
+    """Modules imported by a code object and the code objects it holds
+
+    Parameters
+    ----------
+    code : code
+        Usually the code object of a module
+
+    mod_name : str
+        The qualified name of the module, used to resolve relative
+        imports.
+
+    Returns
+    -------
+    dependency_list : list
+        List of [mod_name, module] pairs, see
+        boring_stuff.parser.parser_python.parse_imports
+    """
+    return dependency_pairs(mod_name, scan_code_imports(code, mod_name)[0])
+
+
+def scan_code_imports(code, mod_name):
+    """Modules and names imported by a code object and the ones it holds
+
+    The import statements of the module body are top level, the ones
+    of the functions and class bodies are not.  The statements are
+    sorted by line, in the order of the source like scan_imports.
+
+    Returns
+    -------
+    names, bindings
+        See boring_stuff.parser.parser_python.scan_imports
+    """
+    # (line, order found, names, bindings) of each statement
+    statements = []
+    to_visit = [code]
+    while to_visit:
+        c_code = to_visit.pop()
+        to_visit.extend(reversed(
+            [const for const in c_code.co_consts
+             if type(const) is CodeType]))
+
+        opcodes, args = _instructions(c_code)
+        i_import = opcodes.find(_IMPORT_NAME)
+        if i_import >= 0:
+            starts = [(offset, line) for offset, line in
+                      dis.findlinestarts(c_code) if line is not None]
+            offsets = [offset for offset, _ in starts]
+        while i_import >= 0:
+            # LOAD_CONST level, LOAD_CONST fromlist, IMPORT_NAME module
+            i_fromlist = _previous(opcodes, i_import)
+            i_level = _previous(opcodes, i_fromlist)
+            level, fromlist = [
+                c_code.co_consts[_arg(opcodes, args, i_const)]
+                for i_const in (i_level, i_fromlist)]
+            module = _argval(
+                c_code, "IMPORT_NAME", _arg(opcodes, args, i_import))
+            stored = _imported_names(c_code, opcodes, args, i_import)
+            i_line = bisect.bisect_right(offsets, 2 * i_import) - 1
+            names = []
+            bindings = []
+            statements.append((
+                starts[i_line][1] if i_line >= 0 else c_code.co_firstlineno,
+                len(statements), names, bindings))
+            i_import = opcodes.find(_IMPORT_NAME, i_import + 1)
+            if module == "__future__" and fromlist:
+                # future statement, "import __future__" is kept
+                continue
+
+            top_level = c_code is code
+            if not fromlist:
+                # import a.b binds a, import a.b as c binds c to a.b
+                names.append(module)
+                for local, attribute in stored:
+                    bindings.append((
+                        local, module if attribute else module.split(".")[0],
+                        top_level))
+                continue
+
+            if module or not level:
+                source = resolve_import(module, level, mod_name)
+                names.append(source)
+            for local, name in stored:
+                if module or not level:
+                    target = source + "." + name
+                else:
+                    # from . import a, b: the names are modules of the
+                    # package
+                    target = resolve_import(name, level, mod_name)
+                    names.append(target)
+                bindings.append((local, target, top_level))
+
+    names = []
+    bindings = []
+    for _, _, c_names, c_bindings in sorted(statements):
+        names.extend(c_names)
+        bindings.extend(c_bindings)
+    return names, bindings
+
+
+def _imported_names(code, opcodes, args, i_import):
+    """Names stored by the import statement of instruction i_import
+
+    Returns
+    -------
+    stored : list
+        (local name, imported name) of a from-import, (local name,
+        attribute) of a plain import where attribute is the last
+        IMPORT_FROM of "import a.b as c" (None without "as")
+    """
+    stored = []
+    imported = None
+    for i_instruction in range(i_import + 1, len(opcodes)):
+        opname = _OPNAMES[opcodes[i_instruction]]
+        if opname in ("EXTENDED_ARG", "CACHE", "ROT_TWO", "SWAP"):
+            continue
+        arg = _arg(opcodes, args, i_instruction)
+        if opname == "IMPORT_FROM":
+            imported = code.co_names[arg]
+        elif opname == "POP_TOP" and imported is not None:
+            # the package under the attribute of "import a.b as c"
+            continue
+        elif opname in ("STORE_NAME", "STORE_GLOBAL"):
+            stored.append((code.co_names[arg], imported))
+            imported = None
+        elif opname == "STORE_FAST":
+            stored.append((code.co_varnames[arg], imported))
+            imported = None
+        elif opname == "STORE_DEREF":
+            if sys.version_info >= (3, 11):
+                local = code._varname_from_oparg(arg)
+            else:
+                local = (code.co_cellvars + code.co_freevars)[arg]
+            stored.append((local, imported))
+            imported = None
+        else:
+            break
+    return stored
+
+
+def parse_code(code, mod_name):
+    """Map the code object of a module
+
+    Parameters
+    ----------
+    code : code
+        Code object of the module body, from read_pyc or compile
+
+    mod_name : str
+        The qualified name of the module.
+
+    Returns
+    -------
+    module : dict
+        See boring_stuff.parser.parser_python.parse_buffer_single_pass
+    """
+    module = OrderedDict([
+        ["type", "module"],
+        ["name", mod_name],
+        ["class_list", []],
+        ["methods", []],
+    ])
+    names, bindings = scan_code_imports(code, mod_name)
+    module["dependencies"] = dependency_pairs(mod_name, names)
+    module["imports"] = import_table(bindings)
+    _walk_body(code, module)
+    return module
+
+
+def parse_pyc(filename, base_name=None):
+    """Parse a bytecode file
+
+    Parameters
+    ----------
+    filename : str
+        Path of a .pyc file, in __pycache__ or in place of the source
+        (compileall -b)
+
+    base_name : str or None
+        If provided, the name of the module will
+        follow base_name + "." + module name.
+
+    Returns
+    -------
+    module : dict
+        See parse_code
+    """
+    code = read_pyc(filename)[0]
+    return parse_code(code, pyc_module_name(filename, base_name))
+
+
+def cached_pyc(filename):
+    """Path of the fresh bytecode of a source file, None if there is none"""
+    try:
+        pyc = importlib.util.cache_from_source(filename)
+    except NotImplementedError:
+        return None
+    if not os.path.isfile(pyc):
+        return None
+    try:
+        with open(pyc, "rb") as file_in:
+            header = _read_header(file_in.read(PYC_HEADER_SIZE), pyc)
+        return pyc if is_fresh(header, filename) else None
+    except (OSError, ValueError):
+        return None
+
+
+def parse_file(filename, base_name=None, single_pass=False):
+    """Parse a python file from its cached bytecode
+
+    Same interface as boring_stuff.parser.parser_python.parse_file, so
+    it can be given as the parse hook of map_python.  The fresh
+    __pycache__ file is used when there is one, otherwise the source is
+    parsed.
+
+    Parameters
+    ----------
+    filename : str
+        The file path to the python module.
+
+    base_name : str or None
+        If provided, the name of the module will
+        follow base_name + "." + file_name.
+
+    single_pass : bool
+        Ignored, the source is always parsed with the single pass
+        scanner so a map holds one schema, with or without __pycache__.
+    """
+    pyc = cached_pyc(filename)
+    if pyc is not None:
+        try:
+            code = read_pyc(pyc)[0]
+        except (ValueError, EOFError) as e:
+            logger.debug("Unable to read %s: %s" % (pyc, str(e)))
+        else:
+            return parse_code(code, module_name(filename, base_name))
+    return parse_source(filename, base_name, single_pass=True)
@@ -3,29 +3,173 @@
 
 This module can be applied to scan a Python module and map
 the classes and functions within.
+
+parse_file runs the multi-pass expressions by default (classes, then
+the methods of each class).  With single_pass, scan_events runs one
+combined expression for the classes, functions and imports and tracks
+the scopes, so nested functions are skipped and the top-level
+functions, static and class methods and nested classes are listed.
+That extra tracking makes it slower: about 0.7 times the throughput of
+the multi-pass parser on the standard library.  It is the accurate
+path, not the fast one.
 """
 from collections import OrderedDict
+import gc
+import itertools
+import mmap
 import os
 import re
 import logging
 
 logger = logging.getLogger("boring_stuff.parser.parser_python")
 
-"""Regular expression for 'class signature"""
-RE_CLASS = re.compile(r"class ([\w\d]+)(\([\w\d]+\))?\:[\n]")
+"""Regular expression for 'class signature
+
+The bases are any parenthesized list (with one level of nested
+brackets, e.g. Generic[T] or a call), split with split_bases.
+"""
+RE_CLASS = re.compile(r"class ([\w\d]+)(\((?:[^()]|\([^()]*\))*\))?\:[\n]")
 RE_CLASS_FUNC = re.compile(r"    def ([\w\d]+)[\(]([\w\d\,\s]+)[\)\:]")
 RE_FUNC = re.compile(r"def ([\w\d]+)[\(]([\w\d\,\=\s]+)[\)\:]")
 RE_PARAMS = re.compile(r"([\w\d]+)[\,\s]*")
 
+"""Bytes versions of the expressions, used on memory-mapped files
+
+Bytes \\w is ASCII only, so UTF-8 lead/continuation bytes are added to
+the word class to keep non-ASCII identifiers.  The class signature also
+accepts CRLF since the file is not read in text mode.
+"""
+RE_CLASS_B = re.compile(
+    RE_CLASS.pattern.replace(r"\:[\n]", r"\:\r?[\n]")
+    .replace(r"\w", r"\w\x80-\xff").encode())
+RE_CLASS_FUNC_B = re.compile(
+    RE_CLASS_FUNC.pattern.replace(r"\w", r"\w\x80-\xff").encode())
+RE_FUNC_B = re.compile(
+    RE_FUNC.pattern.replace(r"\w", r"\w\x80-\xff").encode())
+RE_PARAMS_B = re.compile(
+    RE_PARAMS.pattern.replace(r"\w", r"\w\x80-\xff").encode())
+
+RE_PARAM_NAMES_B = re.compile(rb"(?:^|,)\s*(\*{0,2})\s*([\w\x80-\xff]*)")
+RE_PARAM_NESTED_B = re.compile(rb"[\(\[\{\"']")
+
+"""Expressions to skip strings, comments and brackets
+
+RE_TOKEN_B finds the characters that open or close one of them and
+RE_STRING_B matches a whole string literal from its opening quote (an
+unterminated single quoted string stops at the end of the line), its
+loops are unrolled so runs of plain characters match at once.
+RE_QUOTE_B only finds the start of the strings and comments and
+RE_TRIPLE_B the triple quotes.  RE_QUOTE, RE_TRIPLE and RE_STRING are
+the str versions for scan_imports.
+RE_DEDENT_B holds, by indentation, the expression of the lines that
+are not blank or comments and are indented at most that much.
+RE_COMMENT_B matches the comments and, in group 1, the string literals
+so a "#" in a string is kept by substituting group 1.
+"""
+RE_TOKEN_B = re.compile(rb"[\"'#()\[\]{}]")
+RE_STRING_B = re.compile(
+    rb'(?P<triple>"""[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*"""'
+    rb"|'''[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*''')"
+    rb'|"[^"\\\n]*(?:\\.[^"\\\n]*)*(?:"|\n)'
+    rb"|'[^'\\\n]*(?:\\.[^'\\\n]*)*(?:'|\n)", re.DOTALL)
+RE_QUOTE_B = re.compile(rb"[\"'#]")
+RE_QUOTE = re.compile(RE_QUOTE_B.pattern.decode())
+RE_TRIPLE_B = re.compile(rb"\"\"\"|'''")
+RE_TRIPLE = re.compile(RE_TRIPLE_B.pattern.decode())
+RE_STRING = re.compile(RE_STRING_B.pattern.decode(), re.DOTALL)
+RE_DEDENT_B = {}
+RE_COMMENT_B = re.compile(
+    rb"((\"\"\"|''')(?:[^\\]|\\.)*?\2|([\"'])(?:[^\\\n]|\\.)*?(?:\3|\n))"
+    rb"|#[^\n]*", re.DOTALL)
+
+"""Expressions for import statements
+
+Group 'imports' holds the modules of an import statement, groups
+'dots' and 'module' the source of a from-import and 'names' the
+imported names (possibly in parenthesis over several lines, or
+continued with a backslash).  Like the single pass scanner, the
+statement has to follow a newline (RE_IMPORT_FIRST for the first line)
+so the engine searches for a literal instead of trying every position.
+"""
+_RE_IMPORT_STATEMENT = (
+    r"import[ \t]+(?P<imports>(?:[^\n\\#;]|\\\r?\n)+)"
+    r"|from(?=[ \t.])[ \t]*(?P<dots>\.*)[ \t]*(?P<module>[\w.]*)"
+    r"[ \t]+import[ \t]*"
+    r"(?P<names>\([^)]*\)|(?:[^\n\\#;]|\\\r?\n)+)")
+_RE_IMPORT_BODY = (
+    r"(?=(?P<indent>[ \t]*))(?P=indent)(?=[fi])(?:" +
+    _RE_IMPORT_STATEMENT + ")")
+RE_IMPORT = re.compile(r"\n" + _RE_IMPORT_BODY)
+RE_IMPORT_FIRST = re.compile(_RE_IMPORT_BODY)
+RE_IMPORT_B = re.compile(
+    RE_IMPORT.pattern.replace(r"\w", r"\w\x80-\xff").encode())
+RE_IMPORT_FIRST_B = re.compile(
+    RE_IMPORT_FIRST.pattern.replace(r"\w", r"\w\x80-\xff").encode())
+RE_COMMENT = re.compile(r"#[^\n]*")
+
+"""Combined expression for the single pass scanner
+
+One alternation finds decorators, class and function signatures and
+import statements (the groups of RE_IMPORT) at the start of a line.
+The indentation is captured to track nesting.  The
+lookahead/backreference pair consumes the indentation atomically so a
+failed line is rejected without backtracking, and the leading newline
+gives the engine a literal to search for.
+"""
+_RE_SCAN_BODY = (
+    rb"(?=(?P<indent>[ \t]*))(?P=indent)(?=[@cadfi])(?:"
+    rb"@(?P<deco>[\w\x80-\xff.]+)"
+    rb"|class[ \t]+(?P<cls>[\w\x80-\xff]+)[ \t]*"
+    rb"(?:\((?P<bases>(?:[^()]|\([^()]*\))*)\))?[ \t]*:"
+    rb"|(?:async[ \t]+)?def[ \t]+(?P<func>[\w\x80-\xff]+)[ \t]*"
+    rb"\((?P<params>[^)]*)\)"
+    rb"|" + _RE_IMPORT_STATEMENT.replace(r"\w", r"\w\x80-\xff").encode() +
+    rb")")
+RE_SCAN_B = re.compile(rb"\n" + _RE_SCAN_BODY)
+RE_SCAN_FIRST_B = re.compile(_RE_SCAN_BODY)
+
+RE_SPLIT_B = re.compile(rb"\n(?=class[ \t]|def[ \t]|async[ \t]+def[ \t])")
+"""Top-level class/def lines, candidate chunk boundaries"""
+
+PARALLEL_SIZE = 16 << 20
+"""Size in bytes above which parse_file splits a module between processes
+
+Only used when parse_file is given more than one worker.
+
+A chunk starts where the parsers start from a clean state: a top-level
+class (or, for the single pass scanner, a function without pending
+decorator), so the merged chunks are the same as the serial parse.
+"""
+
+
+def _to_str(value):
+    """Decode a regex group from a bytes buffer"""
+    if type(value) is bytes:
+        return value.decode("utf-8", "replace")
+    return value
+
+
+def get_access(name):
+    """Get access based on name
+
+    Same convention as parse_functions, "__" is private,
+    "_" protected and public otherwise.
+    """
+    if name[:2] == "__":
+        return "PRIVATE"
+    elif name[:1] == "_":
+        return "PROTECTED"
+    return "PUBLIC"
+
 
-def parse_functions(txt, class_method=True):
+def parse_functions(txt, class_method=True, pos=0, endpos=None):
     """parse_function
 
     Parse for a list of function.
 
     Parameters
     ----------
-    txt : str
+    txt : str, bytes or mmap
         This is the string of text to parse for function
         signatures.
 
@@ -33,6 +177,12 @@ def parse_functions(txt, class_method=True):
         If true, expects four spaces prior to "def" as
         described in PEP8.
 
+    pos : int
+        Offset in txt to start scanning.
+
+    endpos : int or None
+        Offset in txt to stop scanning.  None scans to the end.
+
     Returns
     -------
     func_list : list
@@ -47,47 +197,782 @@ def parse_functions(txt, class_method=True):
         params : list
             List of parameters (just name)
     """
+    if endpos is None:
+        endpos = len(txt)
+
+    if isinstance(txt, str):
+        re_class_func, re_func, re_params = RE_CLASS_FUNC, RE_FUNC, RE_PARAMS
+    else:
+        re_class_func, re_func, re_params = \
+            RE_CLASS_FUNC_B, RE_FUNC_B, RE_PARAMS_B
+
     func_list = []
     if class_method:
-        func_matches = RE_CLASS_FUNC.finditer(txt)
+        func_matches = re_class_func.finditer(txt, pos, endpos)
     else:
-        func_matches = RE_FUNC.finditer(txt)
+        func_matches = re_func.finditer(txt, pos, endpos)
 
     for func in func_matches:
         # prep param list
-        params = RE_PARAMS.finditer(func.group(2))
+        params = re_params.finditer(txt, func.start(2), func.end(2))
         param_list = []
         for param in params:
-            param_list.append(param.group(1))
+            param_list.append(_to_str(param.group(1)))
 
         # determine access by name
-        f_name = func.group(1)
-        if f_name[:2] == "__":
-            access = "PRIVATE"
-        elif f_name[:1] == "_":
-            access = "PROTECTED"
-        else:
-            access = "PUBLIC"
-
+        f_name = _to_str(func.group(1))
         func_list.append(OrderedDict([
             ["type", "function"],
             ["name", f_name],
-            ["access", access],
+            ["access", get_access(f_name)],
             ["params", param_list],
         ]))
     return func_list
 
 
-def parse_file(filename, base_name=None):
+def resolve_import(name, level, mod_name):
+    """Absolute name of an imported module
+
+    Parameters
+    ----------
+    name : str
+        The module as written after "from" (without the dots) or
+        "import".
+
+    level : int
+        Number of leading dots, 0 for an absolute import.
+
+    mod_name : str
+        The qualified name of the importing module.  Its package is
+        the name without the last part ("pkg.sub.mod" and
+        "pkg.sub.__init__" are both in "pkg.sub").
+
+    Returns
+    -------
+    name : str
+        The absolute name.  A relative import going above the top of
+        mod_name is returned as written, with the dots.
+    """
+    if level == 0:
+        return name
+
+    package = mod_name.split(".")[:-1]
+    if level > len(package):
+        logger.debug("Unable to resolve %s%s in %s" % (
+            "." * level, name, mod_name))
+        return "." * level + name
+    package = package[:len(package) - level + 1]
+    return ".".join(package + [name] if name else package)
+
+
+def parse_imports(buf, mod_name, pos=0, endpos=None):
+    """Extract the import statements of python source
+
+    Nothing is imported, the statements are found with RE_IMPORT.
+    Imports inside functions are included, imports of __future__ are
+    not.
+
+    Parameters
+    ----------
+    buf : str, bytes or mmap
+        The source of the python module.
+
+    mod_name : str
+        The qualified name of the module, used to resolve relative
+        imports.
+
+    pos : int
+        Offset in buf to start scanning.
+
+    endpos : int or None
+        Offset in buf to stop scanning.  None scans to the end.
+
+    Returns
+    -------
+    dependency_list : list
+        List of [mod_name, module] pairs without duplicates, in the
+        format of map_with_inspect.  "from package import name" depends
+        on package, except for "from . import name" which depends on
+        the sibling module name.
+    """
+    return dependency_pairs(
+        mod_name, scan_imports(buf, mod_name, pos, endpos)[0])
+
+
+def parse_import_table(buf, mod_name, pos=0, endpos=None):
+    """Names bound by the import statements of python source
+
+    Parameters are the ones of parse_imports.
+
+    Returns
+    -------
+    table : OrderedDict
+        Qualified name of each imported name, see import_table
+    """
+    return import_table(scan_imports(buf, mod_name, pos, endpos)[1])
+
+
+def scan_imports(buf, mod_name, pos=0, endpos=None):
+    """Modules and names of the import statements, for parse_imports
+
+    Returns
+    -------
+    names : list
+        Absolute names of the imported modules, with duplicates
+
+    bindings : list
+        (local name, qualified name, top level) of each imported name,
+        top level is false for an indented statement.  "import a.b"
+        binds a to "a", "import a.b as c" binds c to "a.b" and
+        "from .m import x as y" binds y to "<package>.m.x".
+    """
+    if endpos is None:
+        endpos = len(buf)
+    if isinstance(buf, str):
+        re_import, re_first = RE_IMPORT, RE_IMPORT_FIRST
+    else:
+        re_import, re_first = RE_IMPORT_B, RE_IMPORT_FIRST_B
+
+    first = re_first.match(buf, pos, endpos) if pos == 0 else None
+    names = []
+    bindings = []
+    last = pos
+    for match in itertools.chain(
+            [first] if first else [], re_import.finditer(buf, pos, endpos)):
+        if match.start() < last:
+            continue
+        string_end = _string_around(buf, last, match.start())
+        if string_end is not None:
+            # statement in a string literal
+            last = string_end
+            continue
+        last = match.end()
+        c_names, c_bindings = _import_statement(
+            match, mod_name, not match.group("indent"))
+        names.extend(c_names)
+        bindings.extend(c_bindings)
+    return names, bindings
+
+
+def _import_statement(match, mod_name, top_level):
+    """Modules and bindings of one import statement, see scan_imports
+
+    Parameters
+    ----------
+    match : re.Match
+        Match of RE_IMPORT (or of RE_SCAN_B on an import statement)
+
+    mod_name : str
+        The qualified name of the module.
+
+    top_level : bool
+        False for an indented statement
+    """
+    names = []
+    bindings = []
+    if match.group("imports") is not None:
+        # import a.b, c as d
+        imported = RE_COMMENT.sub("", _to_str(match.group("imports")))
+        for name in imported.replace("\\", " ").split(","):
+            words = name.split()
+            if not words:
+                continue
+            names.append(words[0])
+            if len(words) > 2 and words[1] == "as":
+                bindings.append((words[2], words[0], top_level))
+            else:
+                head = words[0].split(".")[0]
+                bindings.append((head, head, top_level))
+        return names, bindings
+
+    level = len(match.group("dots"))
+    module = _to_str(match.group("module"))
+    if module == "__future__":
+        return names, bindings
+
+    if module:
+        source = resolve_import(module, level, mod_name)
+        names.append(source)
+
+    # from . import a, b: the names are modules of the package
+    imported = RE_COMMENT.sub("", _to_str(match.group("names")))
+    for name in imported.strip("()").replace("\\", " ").split(","):
+        words = name.split()
+        if not words or words[0] == "*":
+            continue
+        if module:
+            target = source + "." + words[0]
+        else:
+            target = resolve_import(words[0], level, mod_name)
+            names.append(target)
+        local = words[2] if len(words) > 2 and words[1] == "as" else \
+            words[0]
+        bindings.append((local, target, top_level))
+    return names, bindings
+
+
+def dependency_pairs(mod_name, names):
+    """[mod_name, module] pairs of the imported modules, see parse_imports"""
+    dependency_list = []
+    for name in OrderedDict.fromkeys(names):
+        if name != mod_name:
+            dependency_list.append([mod_name, name])
+    return dependency_list
+
+
+def import_table(bindings):
+    """Import table of a module from its bindings
+
+    The statements at the top level come first, and the first binding
+    of a name wins: the fallback of a "try: import ... except
+    ImportError: import ..." and the imports in functions do not
+    shadow it.
+
+    Parameters
+    ----------
+    bindings : list
+        (local name, qualified name, top level), see scan_imports
+
+    Returns
+    -------
+    table : OrderedDict
+        Qualified name by local name
+    """
+    table = OrderedDict()
+    for top_level in (True, False):
+        for local, target, c_top in bindings:
+            if c_top == top_level and local not in table:
+                table[local] = target
+    return table
+
+
+def _string_end(buf, pos):
+    """End of the string literal whose opening quote is at pos"""
+    match = RE_STRING_B.match(buf, pos)
+    if match is None:
+        # unterminated triple quoted string
+        return len(buf)
+    return match.end()
+
+
+def _string_around(buf, pos, endpos):
+    """End of the string literal containing endpos, None if it is code
+
+    pos has to be outside of any string, e.g. at the end of a
+    signature.  The strings and comments from pos to endpos are
+    skipped.  endpos is the start of a line, only a triple quoted
+    string (or a continued line) gets there, so the lines before the
+    first triple quote are not tokenized.
+    """
+    if isinstance(buf, str):
+        re_quote, re_string, newline = RE_QUOTE, RE_STRING, "\n"
+        triple = RE_TRIPLE.search(buf, pos, endpos)
+    else:
+        re_quote, re_string, newline = RE_QUOTE_B, RE_STRING_B, b"\n"
+        triple = RE_TRIPLE_B.search(buf, pos, endpos)
+    if triple is None:
+        return None
+    pos = max(pos, buf.rfind(newline, pos, triple.start()))
+
+    token = re_quote.search(buf, pos, endpos)
+    while token is not None:
+        if token.group() in ("#", b"#"):
+            pos = buf.find(newline, token.end(), endpos)
+            if pos < 0:
+                # the comment runs to endpos
+                return None
+        else:
+            string = re_string.match(buf, token.start())
+            if string is None:
+                # unterminated triple quoted string
+                return len(buf)
+            pos = string.end()
+            if string.group("triple") is None and \
+                    buf[pos - 1:pos] == newline:
+                # unterminated single quoted string, not the newline
+                pos -= 1
+            if pos > endpos:
+                return pos
+        token = re_quote.search(buf, pos, endpos)
+    return None
+
+
+def _close_paren(buf, pos):
+    """Find the parenthesis closing the one opened before pos
+
+    Brackets in string literals and comments are not counted.
+    """
+    depth = 1
+    while True:
+        token = RE_TOKEN_B.search(buf, pos)
+        if token is None:
+            return len(buf)
+        c_char = token.group()
+        pos = token.end()
+        if c_char in b"([{":
+            depth += 1
+        elif c_char in b")]}":
+            depth -= 1
+            if depth == 0:
+                return token.start()
+        elif c_char == b"#":
+            pos = buf.find(b"\n", pos)
+            if pos < 0:
+                return len(buf)
+        else:
+            pos = _string_end(buf, token.start())
+
+
+def _next_dedent(buf, pos, endpos, indent):
+    """Find the first logical line indented at most indent
+
+    pos has to be outside of any string or bracket, e.g. at the end of
+    a signature.  The lines of a multi-line string and the
+    continuation lines of a statement are skipped.
+
+    Parameters
+    ----------
+    buf : bytes or mmap
+        The source to scan.
+
+    pos : int
+        Offset to start scanning.
+
+    endpos : int
+        Offset to stop scanning.
+
+    indent : int
+        Largest indentation of the line to find.
+
+    Returns
+    -------
+    dedent : tuple or None
+        (offset, indentation) of the line, None if there is no such
+        line before endpos.
+    """
+    re_dedent = RE_DEDENT_B.get(indent)
+    if re_dedent is None:
+        re_dedent = RE_DEDENT_B[indent] = re.compile(
+            rb"\n([ \t]{0,%d})(?=[^ \t\r\n#])" % indent)
+
+    depth = 0
+    line = re_dedent.search(buf, pos, endpos)
+    while line is not None:
+        # skip the code up to the line
+        newline = line.start()
+        token = RE_TOKEN_B.search(buf, pos, newline)
+        while token is not None:
+            c_char = token.group()
+            pos = token.end()
+            if c_char in b"([{":
+                depth += 1
+            elif c_char in b")]}":
+                depth = max(depth - 1, 0)
+            elif c_char == b"#":
+                pos = buf.find(b"\n", pos, newline)
+                if pos < 0:
+                    pos = newline
+            else:
+                pos = _string_end(buf, token.start())
+                if pos > newline:
+                    break
+            token = RE_TOKEN_B.search(buf, pos, newline)
+        else:
+            if depth == 0 and buf[newline - 1:newline] != b"\\" and \
+                    buf[newline - 2:newline] != b"\\\r":
+                return line.end(), len(line.group(1))
+            pos = newline + 1
+
+        # the line is in a string, in brackets or continued
+        line = re_dedent.search(buf, pos, endpos)
+    return None
+
+
+def _split_top(text):
+    """Split text on commas that are not nested in brackets or quotes"""
+    pieces = []
+    depth = 0
+    quote = None
+    last = 0
+    for i_char, c_char in enumerate(text):
+        if quote is not None:
+            if c_char == quote:
+                quote = None
+        elif c_char in b"([{":
+            depth += 1
+        elif c_char in b")]}":
+            depth -= 1
+        elif c_char in b"\"'":
+            quote = c_char
+        elif c_char == 44 and depth == 0:      # ","
+            pieces.append(text[last:i_char])
+            last = i_char + 1
+    pieces.append(text[last:])
+    return pieces
+
+
+def split_bases(bases):
+    """Split the bases of a class signature
+
+    Keyword arguments like ``metaclass=Meta`` are dropped.
+
+    Parameters
+    ----------
+    bases : bytes
+        Text between the parenthesis of a class signature.
+
+    Returns
+    -------
+    base_list : list
+        The base expressions, e.g. ["Base", "mod.Mixin"]
+    """
+    if b"#" in bases:
+        bases = RE_COMMENT_B.sub(rb"\1", bases)
+
+    base_list = []
+    for piece in _split_top(bases):
+        piece = piece.strip()
+        if piece and b"=" not in piece and piece[:1] != b"*":
+            base_list.append(_to_str(b" ".join(piece.split())))
+    return base_list
+
+
+def split_params(params):
+    """Split a parameter list into names
+
+    Parameters
+    ----------
+    params : bytes
+        Text between the parenthesis of a def.
+
+    Returns
+    -------
+    param_list : list
+        Names of the parameters, without annotations or defaults
+
+    var_params : str or None
+        Name of the ``*args`` parameter
+
+    varkw_params : str or None
+        Name of the ``**kwargs`` parameter
+    """
+    if b"#" in params:
+        params = RE_COMMENT_B.sub(rb"\1", params)
+    if b"\\" in params:
+        # backslash continuation lines
+        params = params.replace(b"\\\r\n", b" ").replace(b"\\\n", b" ")
+
+    if RE_PARAM_NESTED_B.search(params) is None:
+        # plain list, names follow the start or a comma
+        pieces = RE_PARAM_NAMES_B.findall(params)
+    else:
+        pieces = [RE_PARAM_NAMES_B.match(piece).groups()
+                  for piece in _split_top(params)]
+
+    param_list = []
+    var_params = None
+    varkw_params = None
+    for stars, name in pieces:
+        if not name:
+            # bare "*", "/" or trailing comma
+            continue
+        elif not stars:
+            param_list.append(name.decode("utf-8", "replace"))
+        elif stars == b"*":
+            var_params = _to_str(name)
+        else:
+            varkw_params = _to_str(name)
+    return param_list, var_params, varkw_params
+
+
+def scan_events(buf, pos=0, endpos=None, mod_name=None):
+    """Scan python source in a single pass
+
+    One combined expression is run over the buffer.  Indentation
+    is tracked with a scope stack so nested functions are skipped,
+    defs directly in a class body are methods and defs at the top
+    level are functions.  A scope is closed by the first logical line
+    that is not indented more than its signature, e.g. the "if" or
+    "try" of a def after a class.  The import statements are found by
+    the same expression, so the buffer is only scanned once.
+
+    Parameters
+    ----------
+    buf : bytes or mmap
+        The source to scan.
+
+    pos : int
+        Offset to start scanning.
+
+    endpos : int or None
+        Offset to stop scanning.  None scans to the end.
+
+    mod_name : str or None
+        The qualified name of the module, to resolve the relative
+        imports.  Without it, no "import" event is yielded.
+
+    Yields
+    ------
+    event : tuple
+        (kind, name, info) where kind is one of "class", "method",
+        "function" or "import".
+        class : info has 'qualname', 'bases' and 'signature_loc'
+        method : info has 'class' (qualname), 'params',
+            'var_params', 'varkw_params' and 'decorators'
+        function : same as method without 'class'
+        import : name is None, info has 'names' and 'bindings' (see
+            scan_imports)
+    """
+    if endpos is None:
+        endpos = len(buf)
+
+    # the first line has no leading newline
+    matches = RE_SCAN_B.finditer(buf, pos, endpos)
+    first = RE_SCAN_FIRST_B.match(buf, pos, endpos)
+    if first is not None:
+        matches = itertools.chain([first], matches)
+
+    # stack of (indent, is_class, qualname)
+    scope = []
+    decorators = []
+    last = pos
+    for match in matches:
+        if match.start() < last:
+            # in the string literal skipped below
+            continue
+        while scope:
+            # statements between the signatures close the scopes too
+            dedent = _next_dedent(buf, last, match.start(), scope[-1][0])
+            if dedent is None:
+                break
+            last, line_indent = dedent
+            while scope and scope[-1][0] >= line_indent:
+                scope.pop()
+        string_end = _string_around(buf, last, match.start())
+        if string_end is not None:
+            # signature in a string literal, e.g. a docstring example
+            last = string_end
+            continue
+        indent, deco, name, bases, func, params, imports, _, _, \
+            imported = match.groups()
+        indent = len(indent)
+        last = match.end()
+        while scope and scope[-1][0] >= indent:
+            scope.pop()
+        parent = scope[-1] if scope else None
+
+        if imports is not None or imported is not None:
+            # ---------------------  import  -------------------------------
+            if mod_name is not None:
+                names, bindings = _import_statement(
+                    match, mod_name, not indent)
+                yield "import", None, {"names": names, "bindings": bindings}
+            continue
+
+        if deco is not None:
+            decorators.append(_to_str(deco))
+            continue
+        c_decorators = decorators
+        decorators = []
+
+        if parent is not None and not parent[1]:
+            # nested in a function, not part of the module interface
+            scope.append((indent, False, None))
+            continue
+
+        if name is not None:
+            # -----------------------  class  ------------------------------
+            name = _to_str(name)
+            qualname = name if parent is None else parent[2] + "." + name
+            scope.append((indent, True, qualname))
+            yield "class", name, {
+                "qualname": qualname,
+                "bases": split_bases(bases) if bases else [],
+                "signature_loc": (match.start("indent"), match.end()),
+            }
+            continue
+
+        # -------------------------  def  ----------------------------------
+        scope.append((indent, False, None))
+        if RE_PARAM_NESTED_B.search(params) is not None:
+            # nested brackets or strings (defaults/annotations), find
+            # the real end
+            start = match.start("params")
+            last = _close_paren(buf, start)
+            params = buf[start:last]
+        param_list, var_params, varkw_params = split_params(params)
+        info = {
+            "params": param_list,
+            "var_params": var_params,
+            "varkw_params": varkw_params,
+            "decorators": c_decorators,
+        }
+        if parent is None:
+            yield "function", _to_str(func), info
+        else:
+            info["class"] = parent[2]
+            yield "method", _to_str(func), info
+
+
+def _function_spec(name, info):
+    """Create function spec from a scan_events info"""
+    if name[:1] != "_":
+        access = "PUBLIC"
+    else:
+        access = get_access(name)
+    func_spec = OrderedDict((
+        ("type", "function"),
+        ("name", name),
+        ("access", access),
+        ("params", info["params"]),
+    ))
+    if info["var_params"]:
+        func_spec["var_params"] = info["var_params"]
+    if info["varkw_params"]:
+        func_spec["varkw_params"] = info["varkw_params"]
+    return func_spec
+
+
+def parse_buffer_single_pass(buf, mod_name):
+    """Parse python source with the single pass scanner
+
+    Unlike the multi-pass expressions, top-level functions are kept
+    next to classes, nested functions are skipped, multiple bases are
+    listed and static/class methods are separated like in
+    boring_stuff.projects.map_with_inspect.
+
+    Parameters
+    ----------
+    buf : str, bytes or mmap
+        The source of the python module.
+
+    mod_name : str
+        The qualified name of the module.
+
+    Returns
+    -------
+    module : dict
+        See parse_file.  'parent' is a list of base names or None.
+    """
+    if isinstance(buf, str):
+        buf = buf.encode("utf-8")
+    names = []
+    bindings = []
+    events = list(_split_imports(
+        scan_events(buf, mod_name=mod_name), names, bindings))
+    return _module_from_events(
+        mod_name, events, dependency_pairs(mod_name, names),
+        import_table(bindings))
+
+
+def _split_imports(events, names, bindings):
+    """Events of scan_events other than the imports
+
+    The names and bindings of the "import" events are appended to
+    names and bindings.
+    """
+    for event in events:
+        if event[0] == "import":
+            names.extend(event[2]["names"])
+            bindings.extend(event[2]["bindings"])
+        else:
+            yield event
+
+
+def _module_from_events(mod_name, events, dependencies, imports):
+    """Module spec of the single pass scanner from its events"""
+    module = OrderedDict([
+        ["type", "module"],
+        ["name", mod_name],
+        ["class_list", []],
+        ["methods", []],
+        ["dependencies", dependencies],
+        ["imports", imports],
+    ])
+    class_dict = {}
+    for kind, name, info in events:
+        if kind == "class":
+            class_spec = OrderedDict([
+                ["type", "class"],
+                ["name", info["qualname"]],
+                ["parent", info["bases"] or None],
+                ["signature_loc", info["signature_loc"]],
+                ["attributes", []], ["methods", []],
+                ["classmethods", []], ["staticmethods", []],
+            ])
+            class_dict[info["qualname"]] = class_spec
+            module["class_list"].append(class_spec)
+
+        elif kind == "method":
+            class_spec = class_dict[info["class"]]
+            if "staticmethod" in info["decorators"]:
+                class_spec["staticmethods"].append(_function_spec(name, info))
+            elif "classmethod" in info["decorators"]:
+                class_spec["classmethods"].append(_function_spec(name, info))
+            else:
+                class_spec["methods"].append(_function_spec(name, info))
+
+        else:
+            module["methods"].append(_function_spec(name, info))
+    return module
+
+
+def module_name(filename, base_name=None):
+    """Name of the module defined by a python file
+
+    Parameters
+    ----------
+    filename : str
+        The file path to the python module.
+
+    base_name : str or None
+        If provided, the name is base_name + "." + file_name.
+
+    Returns
+    -------
+    mod_name : str
+        Name of the module
+    """
+    # get file path and remove the directory
+    full_path = os.path.abspath(filename)
+    base = full_path[full_path.rfind("/") + 1:-3]   # drop ".py"
+
+    if base_name is None:
+        return base
+    return base_name + "." + base
+
+
+def parse_file(filename, base_name=None, single_pass=False, workers=1,
+               parallel_size=None):
     """Parse a python file
 
-    Scans for classes and
+    Scans for classes and functions.  The file is memory-mapped and
+    scanned with bytes expressions by offset, so class bodies are never
+    copied.
 
     Parameters
     ----------
     filename : str
         The file path to the python module.
 
+    base_name : str or None
+        If provided, the name of the module will
+        follow base_name + "." + file_name.
+
+    single_pass : bool
+        If true, use the single pass scanner (parse_buffer_single_pass)
+        instead of the class/function/parameter expressions.
+
+    workers : int or None
+        Number of processes parsing a file larger than parallel_size
+        (see parse_file_parallel), None for os.cpu_count().  The
+        default 1 always parses in this process: the callers that map
+        many files may run in threads or worker processes already.
+
+    parallel_size : int or None
+        Size in bytes above which the file is split, default
+        PARALLEL_SIZE.
+
     Returns
     -------
     module : dict
@@ -96,73 +981,373 @@ def parse_file(filename, base_name=None):
         name : str
         class_list : list (list of class specs)
         methods : list (list of function specs)
-
-    base_name : str or None
-        If provided, the name of the module will
-        follow base_name + "." + file_name.
+        dependencies : list (list of [name, imported module])
+        imports : OrderedDict (qualified name by imported name, see
+            import_table)
     """
-    # ------------------  initialize  variables  ------------------------
-    # get file path and remove the directory
-    full_path = os.path.abspath(filename)
-    base = full_path[full_path.rfind("/") + 1:-3]   # drop ".py"
+    mod_name = module_name(filename, base_name)
+    if parallel_size is None:
+        parallel_size = PARALLEL_SIZE
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and os.path.getsize(filename) > parallel_size:
+        module = parse_file_parallel(filename, mod_name, single_pass, workers)
+        if module is not None:
+            return module
 
-    if base_name is None:
-        base_name = ""
-        mod_name = base
-    else:
-        mod_name = base_name + "." + base
+    parse = parse_buffer_single_pass if single_pass else parse_buffer
+    with open(filename, 'rb') as file_in:
+        try:
+            buf = mmap.mmap(file_in.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty file can not be mapped
+            return parse(file_in.read(), mod_name)
+
+        try:
+            return parse(buf, mod_name)
+        finally:
+            buf.close()
+
+
+def parse_buffer(buf, mod_name):
+    """Parse python source held in memory
+
+    Parameters
+    ----------
+    buf : str, bytes or mmap
+        The source of the python module.
 
-    # mod_name = mod_name.replace(".", "_")
-    # mod_name = mod_name.replace("/", "_")
+    mod_name : str
+        The qualified name of the module.
+
+    Returns
+    -------
+    module : dict
+        See parse_file.  'signature_loc' are offsets into buf (byte
+        offsets for bytes and mmap buffers).
+    """
+    names, bindings = scan_imports(buf, mod_name)
     module = OrderedDict([
         ["type", "module"],
         ["name", mod_name],
         ["class_list", []],         #
         ["methods", []],            # methods not in a class
+        ["dependencies", dependency_pairs(mod_name, names)],
+        ["imports", import_table(bindings)],
     ])
+    class_list = parse_classes(buf)
+    if class_list:
+        # update the module's class_list
+        module["class_list"] = class_list
+    else:
+        # module with functions only
+        module["methods"] = parse_functions(buf, False)
+
+    return module
+
+
+def parse_classes(buf, pos=0, endpos=None):
+    """Classes and their methods, for parse_buffer
+
+    Parameters
+    ----------
+    buf : str, bytes or mmap
+        The source of the python module.
+
+    pos : int
+        Offset in buf to start scanning.
+
+    endpos : int or None
+        Offset in buf to stop scanning.  None scans to the end.  The
+        methods of the last class are the ones up to endpos.
+
+    Returns
+    -------
+    class_list : list
+        Class specs, see parse_file
+    """
+    if endpos is None:
+        endpos = len(buf)
+    re_class = RE_CLASS if isinstance(buf, str) else RE_CLASS_B
     class_list = []
     last_class_loc = None
 
-    with open(filename, 'r') as file_in:
-        txt = file_in.read()
+    # --------------------  detect classes  -----------------------------
+    for cls1 in re_class.finditer(buf, pos, endpos):
+        # update last class with class methods
+        if last_class_loc:
+            class_list[-1]["methods"] = parse_functions(
+                buf, True, last_class_loc[1], cls1.start())
+
+        # get the list of parents, or fill with None
+        parent = cls1.group(2)
+        if parent is not None:
+            if isinstance(parent, str):
+                parent = parent.encode("utf-8")
+            parent = split_bases(parent[1:-1]) or None  # trim parenthesis
 
-        # --------------------  detect classes  -----------------------------
-        class_matches = RE_CLASS.finditer(txt)
+        # append class description
+        class_list.append(OrderedDict([
+            ["type", "class"],
+            ["name", _to_str(cls1.group(1))], ["parent", parent],
+            ["signature_loc", (cls1.start(), cls1.end())],
+            ["attributes", []], ["methods", []],
+        ]))
 
-        for cls1 in class_matches:
-            # update last class with class methods
-            if last_class_loc:
-                class_list[-1]["methods"] = parse_functions(
-                    txt[last_class_loc[1]:cls1.start()], True)
+        # update the last class signature  for class methods search
+        last_class_loc = (cls1.start(), cls1.end())
 
-            # get parent, or fill with None
-            try:
-                parent = cls1.group(2)
-                parent = parent[1:-1]  # trim parenthesis
-            except Exception as e:
-                logger.warn("parse_file get parent failed with %s" % str(e))
-                parent = None
+    if last_class_loc:
+        # update last class methods
+        class_list[-1]["methods"] = \
+            parse_functions(buf, True, last_class_loc[1], endpos)
+    return class_list
 
-            # append class description
-            class_list.append(OrderedDict([
-                ["type", "class"],
-                ["name", cls1.group(1)], ["parent", parent],
-                ["signature_loc", (cls1.start(), cls1.end())],
-                ["attributes", []], ["methods", []],
-            ]))
 
-            # update the last class signature  for class methods search
-            last_class_loc = (cls1.start(), cls1.end())
+def _decorated(buf, pos, start):
+    """True if the last scanner event in buf[start:pos] is a decorator"""
+    window = 4096
+    while True:
+        low = max(start, pos - window)
+        last = None
+        for last in RE_SCAN_B.finditer(buf, low, pos):
+            pass
+        if last is not None:
+            return last.group("deco") is not None
+        if low == start:
+            first = RE_SCAN_FIRST_B.match(buf, start, pos)
+            return first is not None and first.group("deco") is not None
+        window *= 4
 
-        if last_class_loc:
-            # update last class methods
-            class_list[-1]["methods"] = \
-                parse_functions(txt[last_class_loc[1]:], True)
 
-            # update the module's class_list
-            module["class_list"] = class_list
+def _is_boundary(buf, pos, start, single_pass=False):
+    """True if parsing can restart at pos, see PARALLEL_SIZE"""
+    if not single_pass:
+        return RE_CLASS_B.match(buf, pos) is not None
+    match = RE_SCAN_FIRST_B.match(buf, pos)
+    if match is None or match.group("indent"):
+        return False
+    if match.group("cls") is not None:
+        return True
+    return match.group("func") is not None and \
+        not _decorated(buf, pos, start)
+
+
+def split_points(buf, n_chunks, single_pass=False):
+    """Offsets splitting python source in chunks parsed independently
+
+    Parameters
+    ----------
+    buf : bytes or mmap
+        The source of the python module.
+
+    n_chunks : int
+        Number of chunks wanted, of about the same size
+
+    single_pass : bool
+        If true, split for the single pass scanner (also at top-level
+        functions), else only at top-level classes.
+
+    Returns
+    -------
+    points : list
+        0, the starts of the next chunks and len(buf).  Fewer chunks
+        than wanted if there are not enough boundaries.
+    """
+    size = len(buf)
+    points = [0]
+    for i_chunk in range(1, n_chunks):
+        target = max(size * i_chunk // n_chunks, points[-1])
+        for match in RE_SPLIT_B.finditer(buf, target):
+            if _is_boundary(buf, match.end(), points[-1], single_pass):
+                points.append(match.end())
+                break
         else:
-            # module with functions only
-            module["methods"] = parse_functions(txt, False)
+            break
+    points.append(size)
+    return points
 
-    return module
+
+def _parse_chunk(args):
+    """Parse buf[pos:endpos] of a file, run by the parse_file workers
+
+    The results are sent back as tuples, much faster to pickle than
+    the dictionaries.  The garbage collector is paused, the many small
+    containers made by the parse would trigger it over and over.
+
+    Returns
+    -------
+    result : tuple
+        (packed events of scan_events or classes of parse_classes,
+        imported module names)
+    """
+    filename, mod_name, single_pass, pos, endpos = args
+    with open(filename, "rb") as file_in:
+        buf = mmap.mmap(file_in.fileno(), 0, access=mmap.ACCESS_READ)
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        if single_pass:
+            imports = ([], [])
+            result = [
+                (kind, name, info["qualname"], info["bases"],
+                 info["signature_loc"]) if kind == "class" else
+                (kind, name, info["params"], info["var_params"],
+                 info["varkw_params"], info["decorators"], info.get("class"))
+                for kind, name, info in _split_imports(
+                    scan_events(buf, pos, endpos, mod_name), *imports)]
+        else:
+            result = [
+                (class_spec["name"], class_spec["parent"],
+                 class_spec["signature_loc"],
+                 [(func["name"], func["params"])
+                  for func in class_spec["methods"]])
+                for class_spec in parse_classes(buf, pos, endpos)]
+            imports = scan_imports(buf, mod_name, pos, endpos)
+    finally:
+        buf.close()
+        if gc_enabled:
+            gc.enable()
+    return result, imports
+
+
+def _unpack_events(results):
+    """Events of scan_events from the _parse_chunk results"""
+    for events, _ in results:
+        for event in events:
+            if event[0] == "class":
+                yield event[0], event[1], {
+                    "qualname": event[2],
+                    "bases": event[3],
+                    "signature_loc": event[4],
+                }
+                continue
+            info = {
+                "params": event[2],
+                "var_params": event[3],
+                "varkw_params": event[4],
+                "decorators": event[5],
+            }
+            if event[6] is not None:
+                info["class"] = event[6]
+            yield event[0], event[1], info
+
+
+def _unpack_classes(results):
+    """Class specs of parse_classes from the _parse_chunk results"""
+    for class_list, _ in results:
+        for name, parent, signature_loc, methods in class_list:
+            yield OrderedDict([
+                ["type", "class"],
+                ["name", name], ["parent", parent],
+                ["signature_loc", signature_loc],
+                ["attributes", []],
+                ["methods", [OrderedDict([
+                    ["type", "function"],
+                    ["name", f_name],
+                    ["access", get_access(f_name)],
+                    ["params", params],
+                ]) for f_name, params in methods]],
+            ])
+
+
+def parse_file_parallel(filename, mod_name, single_pass=False, workers=None):
+    """Parse a large python file in chunks across processes
+
+    Parameters
+    ----------
+    filename : str
+        The file path to the python module.
+
+    mod_name : str
+        The qualified name of the module.
+
+    single_pass : bool
+        See parse_file
+
+    workers : int or None
+        Number of processes, default os.cpu_count()
+
+    Returns
+    -------
+    module : dict or None
+        Same as the serial parse_file, None if the file can not be split
+        (not enough boundaries) or the processes can not be started.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    workers = workers or os.cpu_count() or 1
+    with open(filename, "rb") as file_in:
+        buf = mmap.mmap(file_in.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        # more chunks than workers to balance uneven chunks
+        points = split_points(buf, 2 * workers, single_pass)
+    finally:
+        buf.close()
+    if len(points) < 3:
+        return None
+
+    logger.debug("Parsing %s in %d chunks" % (filename, len(points) - 1))
+    chunks = [(filename, mod_name, single_pass, points[i_point],
+               points[i_point + 1]) for i_point in range(len(points) - 1)]
+
+    # like in _parse_chunk, pause the garbage collector while merging
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_parse_chunk, chunks))
+        except (OSError, RuntimeError, AssertionError) as e:
+            # e.g. daemonic processes can not have children
+            logger.warning("Parsing %s serially: %s" % (filename, str(e)))
+            return None
+
+        dependencies = dependency_pairs(mod_name, [
+            name for _, (names, _) in results for name in names])
+        imports = import_table([
+            binding for _, (_, bindings) in results for binding in bindings])
+        if single_pass:
+            return _module_from_events(
+                mod_name, _unpack_events(results), dependencies, imports)
+        return OrderedDict([
+            ["type", "module"],
+            ["name", mod_name],
+            ["class_list", list(_unpack_classes(results))],
+            ["methods", []],
+            ["dependencies", dependencies],
+            ["imports", imports],
+        ])
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+if __name__ == "__main__":
+    # ---------------  compare throughput of the two parsers  ---------------
+    from argparse import ArgumentParser
+    import time
+    parser = ArgumentParser()
+    parser.add_argument("files", nargs="+", help="Python files to parse")
+    parser.add_argument("--repeat", default=3, type=int)
+    parser.add_argument(
+        "--workers", default=1, type=int,
+        help="Processes parsing each file larger than --parallel-size")
+    parser.add_argument(
+        "--parallel-size", default=PARALLEL_SIZE, type=int,
+        help="Size in bytes above which a file is split")
+    args = parser.parse_args()
+
+    n_bytes = sum(os.path.getsize(filename) for filename in args.files)
+    for single_pass in (False, True):
+        best = None
+        for _ in range(args.repeat):
+            start = time.time()
+            for filename in args.files:
+                parse_file(filename, single_pass=single_pass,
+                           workers=args.workers,
+                           parallel_size=args.parallel_size)
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print("%-12s %8.1f MB/s" % (
+            "single-pass" if single_pass else "multi-pass",
+            n_bytes / 1e6 / max(best, 1e-9)))
@@ -1,2 +1,9 @@
+from . import budget
+from . import cache
+from . import dependency_graph
+from . import import_profile
+from . import lazy_package
 from . import map
-from . import map_with_inspect
\ No newline at end of file
+from . import map_git
+from . import map_with_inspect
+from . import name_filter
\ No newline at end of file
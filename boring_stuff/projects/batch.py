@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+"""Batch mapping of many targets in one run
+
+The __main__ of map and map_with_inspect handle one target per
+interpreter.  run_batch maps all the targets of a manifest and shares
+the work between them:
+
+* Parsed modules of directory targets are kept in a
+  boring_stuff.projects.daemon.MapService for the life of each worker.
+* Imported targets are mapped with map_module_cached.  The cache
+  directory is shared by all workers (and runs), so a package that is
+  a dependency of several targets is imported and inspected once.
+* Targets are run longest first, using the times of a previous report
+  if given, across a pool of worker processes.
+
+Manifest
+--------
+A JSON list of targets, or {"defaults": {...}, "targets": [...]}.
+Each target has an "output" and either a "module" to import or a
+"path" to scan.  Optional fields: "name", "access_level", "depend",
+"single_pass", "include", "exclude" and "max_depth".
+
+Examples
+--------
+>>> from boring_stuff.projects.batch import run_batch, format_report
+>>> targets = [
+...     {"module": "boring_stuff", "output": "/tmp/bs_inspect.wsd"},
+...     {"path": "boring_stuff", "output": "/tmp/bs_static.wsd"},
+... ]
+>>> records = run_batch(targets, workers=2, cache_dir="/tmp/map_cache")
+>>> print(format_report(records))
+"""
+from concurrent.futures import ProcessPoolExecutor
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger("boring_stuff.projects.batch")
+
+_WORKER = {}
+"""State of the current worker: MapService and MapCache"""
+
+
+def load_manifest(filename):
+    """Read the targets of a manifest
+
+    Parameters
+    ----------
+    filename : str
+        Path of the JSON manifest
+
+    Returns
+    -------
+    targets : list
+        Targets with the defaults applied and a 'name' set
+    """
+    with open(filename, "r") as file_in:
+        manifest = json.load(file_in)
+    if isinstance(manifest, list):
+        manifest = {"targets": manifest}
+
+    targets = []
+    for target in manifest["targets"]:
+        c_target = dict(manifest.get("defaults", {}))
+        c_target.update(target)
+        if "module" not in c_target and "path" not in c_target:
+            raise ValueError("Target without 'module' or 'path': %s" % target)
+        if "output" not in c_target:
+            raise ValueError("Target without 'output': %s" % target)
+        c_target.setdefault("name", c_target.get("module") or c_target["path"])
+        targets.append(c_target)
+    return targets
+
+
+def schedule(targets, history=None):
+    """Order the targets longest first
+
+    Parameters
+    ----------
+    targets : list
+        Targets from load_manifest
+
+    history : list or None
+        Records of a previous run.  Targets without a previous time are
+        run first since their duration is unknown.
+
+    Returns
+    -------
+    order : list
+        Indices of the targets in the order to submit them
+    """
+    seconds = {}
+    for record in history or []:
+        seconds[record["name"]] = record["seconds"]
+    return sorted(
+        range(len(targets)),
+        key=lambda i_target: -seconds.get(
+            targets[i_target]["name"], float("inf")))
+
+
+def _init_worker(cache_dir=None, cache_size=None):
+    """Create the caches of a worker"""
+    from boring_stuff.projects.daemon import MapService
+    _WORKER["service"] = MapService()
+    _WORKER["cache"] = None
+    if cache_dir:
+        from boring_stuff.projects.cache import MapCache
+        _WORKER["cache"] = MapCache(cache_dir, max_bytes=cache_size)
+
+
+def _count_modules(c_package):
+    n_modules = 0
+    to_visit = [c_package]
+    while to_visit:
+        spec = to_visit.pop()
+        n_modules += 1
+        to_visit.extend(spec.get("subpackages", []))
+        to_visit.extend(spec.get("modules", []))
+    return n_modules
+
+
+def run_target(target):
+    """Map one target and write its class diagram
+
+    Runs in a worker, see _init_worker.
+
+    Returns
+    -------
+    record : dict
+        'name', 'output', 'ok', 'error', 'seconds', 'modules' and 'pid'
+    """
+    import importlib
+    from boring_stuff.projects.name_filter import NameFilter
+    from boring_stuff.uml.class_diagram import write_class_diagram
+    if not _WORKER:
+        _init_worker()
+
+    record = {
+        "name": target["name"], "output": target["output"],
+        "ok": True, "error": None, "modules": 0, "pid": os.getpid()}
+    start = time.time()
+    try:
+        name_filter = None
+        if target.get("include") or target.get("exclude") or \
+                target.get("max_depth") is not None:
+            name_filter = NameFilter(
+                target.get("include"), target.get("exclude"),
+                target.get("max_depth"))
+
+        if "path" in target:
+            # parsed modules stay in the service for the next targets
+            c_package = _WORKER["service"].map_path(target, name_filter)[0]
+        elif _WORKER["cache"] is not None:
+            from boring_stuff.projects.cache import map_module_cached
+            c_package = map_module_cached(
+                target["module"], _WORKER["cache"],
+                access_level=target.get("access_level", 0),
+                name_filter=name_filter)
+        else:
+            from boring_stuff.projects.map_with_inspect import map_module
+            c_package = map_module(
+                importlib.import_module(target["module"]),
+                access_level=target.get("access_level", 0),
+                name_filter=name_filter)
+
+        write_class_diagram(
+            c_package, output=target["output"],
+            draw_depend=bool(target.get("depend")))
+        record["modules"] = _count_modules(c_package)
+    except Exception as e:
+        logger.error("Target %s failed: %s" % (target["name"], str(e)))
+        record["ok"] = False
+        record["error"] = "%s: %s" % (type(e).__name__, e)
+    record["seconds"] = time.time() - start
+    return record
+
+
+def run_batch(targets, workers=1, cache_dir=None, cache_size=None,
+              history=None):
+    """Map all the targets
+
+    Parameters
+    ----------
+    targets : list
+        Targets, see load_manifest
+
+    workers : int
+        Number of worker processes.  With 1, the targets run in this
+        process.
+
+    cache_dir : str or None
+        Directory of the MapCache shared by the workers for the
+        imported targets.  None maps them without a persistent cache.
+
+    cache_size : int or None
+        Size limit of the cache in bytes
+
+    history : list or None
+        Records of a previous run, used to schedule the longest targets
+        first
+
+    Returns
+    -------
+    records : list
+        One record per target (see run_target), in manifest order
+    """
+    order = schedule(targets, history)
+    records = [None] * len(targets)
+    if workers <= 1:
+        _init_worker(cache_dir, cache_size)
+        for i_target in order:
+            records[i_target] = run_target(targets[i_target])
+    else:
+        with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker,
+                initargs=(cache_dir, cache_size)) as pool:
+            futures = [(i_target, pool.submit(run_target, targets[i_target]))
+                       for i_target in order]
+            for i_target, future in futures:
+                records[i_target] = future.result()
+    return records
+
+
+def format_report(records):
+    """Summary table of the per-target times, longest first"""
+    lines = ["%8s %8s %8s  %s" % ("time(s)", "modules", "pid", "target")]
+    for record in sorted(records, key=lambda r: r["seconds"], reverse=True):
+        lines.append("%8.2f %8d %8d  %s%s" % (
+            record["seconds"], record["modules"], record["pid"],
+            record["name"], "" if record["ok"] else
+            "  FAILED (%s)" % record["error"]))
+    n_failed = len([record for record in records if not record["ok"]])
+    lines.append("%d targets, %d failed, %.2f s in total" % (
+        len(records), n_failed, sum(r["seconds"] for r in records)))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # --------------------------  parse commands  ---------------------------
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    parser.add_argument("manifest", help="JSON manifest of the targets")
+    parser.add_argument(
+        "--workers", default=1, type=int,
+        help="Number of worker processes (-1=one per core)")
+    parser.add_argument(
+        "--cache", default="", help="Directory of the persistent map cache")
+    parser.add_argument(
+        "--cache-size", default=256, type=int,
+        help="Size limit of the cache in MB")
+    parser.add_argument(
+        "--report", default="",
+        help="Write the records as JSON, also read as the schedule history")
+    parser.add_argument(
+        "--level", default="WARNING",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="The log level")
+    args = parser.parse_args()
+    logger.parent.setLevel(args.level)
+
+    history = None
+    if args.report and os.path.isfile(args.report):
+        with open(args.report, "r") as file_in:
+            history = json.load(file_in)
+
+    start = time.time()
+    records = run_batch(
+        load_manifest(args.manifest),
+        workers=(os.cpu_count() or 1) if args.workers < 0 else args.workers,
+        cache_dir=args.cache or None, cache_size=args.cache_size * 2**20,
+        history=history)
+    print(format_report(records))
+    print("Wall time %.2f s" % (time.time() - start))
+
+    if args.report:
+        with open(args.report, "w") as file_out:
+            json.dump(records, file_out, indent=2)
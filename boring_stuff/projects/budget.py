@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""Time and Memory Budget for mapping runs
+
+A Budget is passed to map_module or map_python to cap a run.  Once a
+limit is reached the mappers stop descending and return the partial
+tree.  Nodes that were not mapped carry a 'skipped' field with the
+reason, and nodes whose children are incomplete carry 'truncated'.
+
+Examples
+--------
+>>> import boring_stuff
+>>> from boring_stuff.projects.budget import Budget
+>>> from boring_stuff.projects.map_with_inspect import map_module
+>>> budget = Budget(wall_time=60, max_rss=2 * 2**30, module_timeout=10)
+>>> c_package = map_module(boring_stuff, budget=budget)
+"""
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger("boring_stuff.projects.budget")
+
+
+class BudgetExceeded(Exception):
+    """Raised when a call runs past its time budget"""
+    pass
+
+
+def get_rss():
+    """Resident memory of the current process in bytes
+
+    Reads /proc/self/statm where available, otherwise falls back to
+    the peak RSS from the resource module.  Returns 0 if unknown.
+    """
+    try:
+        with open("/proc/self/statm", "r") as file_in:
+            return int(file_in.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    try:
+        import resource
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+    except ImportError:
+        return 0
+
+
+def skipped_node(name, reason, node_type="module"):
+    """Placeholder for a node that was not mapped
+
+    Parameters
+    ----------
+    name : str
+        Name of the module/package
+
+    reason : str
+        Why it was skipped
+
+    node_type : str
+        "module" or "package"
+
+    Returns
+    -------
+    node : dict
+        Empty node with the 'skipped' field set.
+    """
+    return {
+        "type": node_type,
+        "name": name,
+        "subpackages": [],
+        "modules": [],
+        "class_list": [],
+        "methods": [],
+        "skipped": reason,
+    }
+
+
+class Budget(object):
+    """Limits of a mapping run
+
+    The wall clock starts when the budget is created.
+
+    Attributes
+    ----------
+    wall_time : float or None
+        Total seconds for the run
+
+    max_rss : int or None
+        Maximum resident memory in bytes
+
+    module_timeout : float or None
+        Maximum seconds to import or inspect a single module
+    """
+    def __init__(self, wall_time=None, max_rss=None, module_timeout=None):
+        self.wall_time = wall_time
+        self.max_rss = max_rss
+        self.module_timeout = module_timeout
+        self.start = time.time()
+
+    def remaining(self):
+        """Seconds left on the wall clock, None if unbounded"""
+        if self.wall_time is None:
+            return None
+        return self.wall_time - (time.time() - self.start)
+
+    def exceeded(self):
+        """Check the wall clock and memory limits
+
+        Returns
+        -------
+        reason : str or None
+            Description of the exceeded limit, None if within budget.
+        """
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            return "wall time of %s s exceeded" % self.wall_time
+
+        if self.max_rss is not None:
+            rss = get_rss()
+            if rss > self.max_rss:
+                return "RSS of %d MB exceeded" % (self.max_rss // 2**20)
+        return None
+
+    def run(self, func, *args, **kwargs):
+        """Call func within the time budget
+
+        With a module timeout or wall clock, func runs in a daemon
+        thread that is abandoned when the time is up.  A Python thread
+        can not be killed, so a hung import keeps its thread (and the
+        lock of that module) but no longer blocks the run.
+
+        Raises
+        ------
+        BudgetExceeded
+            If func did not return in time.
+        """
+        timeout = self.module_timeout
+        remaining = self.remaining()
+        if remaining is not None:
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        if timeout is None:
+            return func(*args, **kwargs)
+        if timeout <= 0:
+            raise BudgetExceeded("wall time of %s s exceeded" % self.wall_time)
+
+        result = {}
+
+        def target():
+            try:
+                result["value"] = func(*args, **kwargs)
+            except BaseException as e:
+                result["error"] = e
+
+        thread = threading.Thread(
+            target=target, name="budget-%s" % getattr(func, "__name__", ""))
+        thread.daemon = True
+        thread.start()
+        thread.join(timeout)
+        if thread.is_alive():
+            raise BudgetExceeded("timeout after %.1f s" % timeout)
+        if "error" in result:
+            raise result["error"]
+        return result["value"]
@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+"""Persistent cache of map_with_inspect results
+
+Each module mapped by map_module_cached is stored on disk (JSON), keyed
+by the version of the distribution that provides it and the hash of
+the module's source file.  A warm run reads unchanged modules from the
+cache without importing or inspecting them.  The cache directory can
+be shared between CI jobs and is bounded in size with LRU eviction.
+
+.. note:: A module's entry only depends on its own file.  Names it
+    imports from other modules of the same package are refreshed when
+    the distribution version changes, not when the other file changes.
+
+Examples
+--------
+>>> from boring_stuff.projects.cache import MapCache, map_module_cached
+>>> cache = MapCache("/tmp/map_cache", max_bytes=100 * 2**20)
+>>> c_package = map_module_cached("boring_stuff", cache)
+"""
+import hashlib
+import importlib
+import importlib.machinery
+import importlib.util
+import json
+import logging
+import os
+import sys
+import tempfile
+from boring_stuff.parser.inheritance import resolve_parents
+from boring_stuff.projects.map_with_inspect import inspect_module
+
+logger = logging.getLogger("boring_stuff.projects.cache")
+
+CACHE_VERSION = 1
+"""Bump when the layout of the cached specs changes"""
+
+
+class MapCache(object):
+    """Directory of cached module maps with LRU eviction
+
+    The access time of an entry is tracked through its mtime, which
+    is refreshed on every hit.  When a put takes the directory over
+    max_bytes, the least recently used entries are removed.
+
+    Attributes
+    ----------
+    directory : str
+        Location of the cache files
+
+    max_bytes : int or None
+        Size limit of the cache.  None means unbounded.
+
+    hits : int
+        Number of successful lookups
+
+    misses : int
+        Number of failed lookups
+    """
+    def __init__(self, directory, max_bytes=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.total_bytes = sum(size for _, _, size in self._entries())
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + ".json")
+
+    def _entries(self):
+        """List (mtime, path, size) of the cache files"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name[-5:] != ".json":
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    # removed by another job
+                    continue
+                entries.append((st.st_mtime, entry.path, st.st_size))
+        return entries
+
+    def get(self, key):
+        """Get a cached value, None if missing"""
+        path = self._path(key)
+        try:
+            with open(path, "r") as file_in:
+                value = json.load(file_in)
+            os.utime(path, None)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Store a value (atomically) and evict old entries"""
+        path = self._path(key)
+        f_id, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(f_id, "w") as file_out:
+                json.dump(value, file_out)
+            # size of the entry being replaced, it no longer counts
+            try:
+                old_size = os.path.getsize(path)
+            except OSError:
+                old_size = 0
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self.total_bytes += os.path.getsize(path) - old_size
+
+        if self.max_bytes is not None and self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until under max_bytes"""
+        entries = sorted(self._entries())
+        self.total_bytes = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.total_bytes -= size
+
+
+_PACKAGES_DISTRIBUTIONS = {}
+"""Memoized importlib.metadata.packages_distributions(), it scans all
+installed distributions"""
+
+
+def get_dist_version(top_name):
+    """Version of the distribution providing a top level package
+
+    Parameters
+    ----------
+    top_name : str
+        Name of the top level package
+
+    Returns
+    -------
+    version : str
+        The version, or "" if no distribution is found
+    """
+    try:
+        import importlib.metadata as metadata
+    except ImportError:
+        return ""
+
+    try:
+        return metadata.version(top_name)
+    except Exception:
+        pass
+
+    # distribution name differs from the package name
+    if hasattr(metadata, "packages_distributions"):
+        if _PACKAGES_DISTRIBUTIONS.get("map") is None:
+            _PACKAGES_DISTRIBUTIONS["map"] = metadata.packages_distributions()
+        for dist_name in _PACKAGES_DISTRIBUTIONS["map"].get(top_name, []):
+            try:
+                return metadata.version(dist_name)
+            except Exception:
+                continue
+    return ""
+
+
+def find_module_file(name):
+    """Locate the file of a module without importing it
+
+    Only the top level package is looked up with the import system,
+    the submodules are searched in its directories.
+
+    Parameters
+    ----------
+    name : str
+        Qualified name of the module
+
+    Returns
+    -------
+    filename : str or None
+        Path of the source (or extension) file, None if not found.
+    """
+    parts = name.split(".")
+    try:
+        spec = importlib.util.find_spec(parts[0])
+    except (ImportError, ValueError):
+        return None
+    if spec is None:
+        return None
+    if len(parts) == 1:
+        return spec.origin if spec.has_location else None
+
+    suffixes = importlib.machinery.all_suffixes()
+    for root in spec.submodule_search_locations or []:
+        base = os.path.join(root, *parts[1:])
+        candidates = [os.path.join(base, "__init__.py")] + \
+            [base + suffix for suffix in suffixes]
+        for candidate in candidates:
+            if os.path.isfile(candidate):
+                return candidate
+    return None
+
+
+def hash_file(filename):
+    """SHA1 of a file"""
+    digest = hashlib.sha1()
+    with open(filename, "rb") as file_in:
+        for chunk in iter(lambda: file_in.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _as_json(spec):
+    """Replace the type objects of variable specs by their str()
+
+    This is how class_diagram writes them, so diagrams are unchanged.
+    """
+    if isinstance(spec, dict):
+        for key, value in spec.items():
+            if key == "type" and isinstance(value, type):
+                spec[key] = str(value)
+            else:
+                _as_json(value)
+    elif isinstance(spec, list):
+        for value in spec:
+            _as_json(value)
+    return spec
+
+
+def map_module_cached(name, cache, access_level=0, name_filter=None):
+    """Map a module with a persistent cache
+
+    Same result as map_module(importlib.import_module(name)), except
+    that variable types are stored as strings.  A module is only
+    imported and inspected if its entry is missing from the cache.
+
+    Parameters
+    ----------
+    name : str
+        Qualified name of the module/package to map.
+
+    cache : MapCache
+        The cache to use.
+
+    access_level : int
+        If 0, only track public
+        If 1, track up to protected
+        If 2, track private
+
+    name_filter : NameFilter or None
+        Submodules rejected by the filter are neither imported nor
+        read from the cache.
+
+    Returns
+    -------
+    c_package : dict
+        The dictionary describing the package.
+    """
+    if name_filter is not None and name_filter.root is None:
+        name_filter = name_filter.bind(name)
+
+    prefix = "%d|%s|%s|%d" % (
+        CACHE_VERSION, sys.version.split()[0],
+        get_dist_version(name.split(".")[0]), access_level)
+    c_package = _map_cached(name, cache, prefix, access_level, name_filter)
+    resolve_parents(c_package)
+    return c_package
+
+
+def _map_cached(name, cache, prefix, access_level, name_filter=None):
+    """Map a module and its submodules through the cache"""
+    filename = find_module_file(name)
+    key = None
+    entry = None
+    if filename is not None:
+        key = "%s|%s|%s" % (prefix, name, hash_file(filename))
+        entry = cache.get(key)
+
+    if entry is None:
+        # ---------------------  import and inspect  ------------------------
+        logger.info("Cache miss for %s" % name)
+        c_package, module_dict = inspect_module(
+            importlib.import_module(name), access_level)
+        entry = {
+            "node": _as_json(c_package),
+            "children": list(module_dict),
+        }
+        if key is not None:
+            cache.put(key, entry)
+
+    c_package = entry["node"]
+    for child in entry["children"]:
+        if name_filter is not None and not name_filter.allows(child):
+            continue
+        try:
+            tmp_mod = _map_cached(
+                child, cache, prefix, access_level, name_filter)
+            if tmp_mod["type"] == "package":
+                c_package["subpackages"].append(tmp_mod)
+            else:
+                c_package["modules"].append(tmp_mod)
+        except Exception as e:
+            logger.error(
+                "Caught exception(%s) in map_module_cached(%s)" %
+                (str(e), child))
+    return c_package
@@ -0,0 +1,617 @@
+#!/usr/bin/env python
+"""Mapping daemon
+
+A long running server keeps the parsed modules, inspected packages and
+rendered diagrams warm, so editor plugins and docs tooling do not pay
+the interpreter startup, imports and cold parsing on every request.
+
+The server listens on a Unix domain socket.  Each request is one JSON
+object on a line, answered by one JSON object on a line, and a
+connection can send several requests.  Requests run concurrently, one
+thread per connection.
+
+Requests ("op" and its parameters)
+
+* ping
+* map: path, base_name, ignore, single_pass, keep_misc
+* render: same as map, plus output and draw_depend
+* query: same as map, plus name
+* inspect: module, access_level
+* stats
+* shutdown
+
+Answers are {"ok": true, "result": ...} or {"ok": false, "error": ...}.
+
+Entries are invalidated when files change.  Parsed modules are keyed
+on the (mtime, size) of their file, and the least recently used ones
+are dropped past MAX_PARSED files.  Rendered diagrams and inspected
+packages are keyed on the stamps of all their files, and changed
+modules are reloaded before an inspect is redone.  They are dropped
+the same way past MAX_RENDERED and MAX_INSPECTED entries.
+
+The socket is in $XDG_RUNTIME_DIR or else in a directory of the
+temporary directory that only the user can access.  The client only
+connects to a socket owned by the user.
+
+Examples
+--------
+Start the server
+
+$ python -m boring_stuff.projects.daemon serve &
+
+Then request a diagram, this runs in-process if no server is running
+
+>>> from boring_stuff.projects.daemon import call
+>>> result = call("render", path="boring_stuff", output="/tmp/gen.wsd")
+"""
+from collections import OrderedDict
+import copy
+import getpass
+import importlib
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+import threading
+
+logger = logging.getLogger("boring_stuff.projects.daemon")
+
+MAX_PARSED = 10000
+"""Number of parsed modules kept by a MapService"""
+
+MAX_RENDERED = 256
+"""Number of rendered diagrams kept by a MapService"""
+
+MAX_INSPECTED = 64
+"""Number of inspected packages kept by a MapService"""
+
+_UnixStreamServer = getattr(
+    socketserver, "UnixStreamServer", socketserver.TCPServer)
+"""Base of MapServer.  Without Unix sockets (Windows) the module still
+imports, MapServer refuses to start and the client runs in-process."""
+
+
+def default_socket():
+    """Socket of the daemon, one per user
+
+    Computed when needed (and not at import, where os.getuid may be
+    missing), also available as DEFAULT_SOCKET.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if not runtime_dir:
+        user = os.getuid() if hasattr(os, "getuid") else getpass.getuser()
+        runtime_dir = os.path.join(
+            tempfile.gettempdir(), "boring_stuff-%s" % user)
+    return os.path.join(runtime_dir, "boring_stuff.sock")
+
+
+def __getattr__(name):
+    # DEFAULT_SOCKET is computed on access
+    if name == "DEFAULT_SOCKET":
+        return default_socket()
+    raise AttributeError(
+        "module %r has no attribute %r" % (__name__, name))
+
+
+class DaemonError(Exception):
+    """Raised when the daemon answers a request with an error"""
+    pass
+
+
+def _stamp(filename):
+    """(mtime, size) of a file, None if missing"""
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _walk_specs(package):
+    """Iterate over a package specification and all its children"""
+    to_visit = [package]
+    while to_visit:
+        spec = to_visit.pop()
+        yield spec
+        to_visit.extend(spec.get("subpackages", []))
+        to_visit.extend(spec.get("modules", []))
+
+
+class MapService(object):
+    """Warm state and request handlers of the daemon
+
+    Also used in-process by the client when no daemon is running.
+
+    Parameters
+    ----------
+    max_parsed : int
+        Number of parsed modules to keep, the least recently used are
+        dropped first.
+
+    max_rendered : int
+        Number of rendered diagrams to keep, same policy.
+
+    max_inspected : int
+        Number of inspected packages to keep, same policy.
+
+    Attributes
+    ----------
+    stats : dict
+        Number of requests and cache hits/misses
+    """
+    def __init__(self, max_parsed=MAX_PARSED, max_rendered=MAX_RENDERED,
+                 max_inspected=MAX_INSPECTED):
+        self.lock = threading.Lock()
+        self.inspect_lock = threading.Lock()
+        self.max_parsed = max_parsed
+        self.max_rendered = max_rendered
+        self.max_inspected = max_inspected
+        self.parsed = OrderedDict()
+        self.rendered = OrderedDict()
+        self.inspected = OrderedDict()
+        self.stats = {
+            "requests": 0,
+            "parse_hits": 0, "parse_misses": 0,
+            "render_hits": 0, "render_misses": 0,
+            "inspect_hits": 0, "inspect_misses": 0,
+        }
+
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    @staticmethod
+    def _lookup(cache, key):
+        """Entry of a cache marked as recently used, the caller locks"""
+        entry = cache.get(key)
+        if entry is not None:
+            cache.move_to_end(key)
+        return entry
+
+    @staticmethod
+    def _store(cache, key, entry, max_entries):
+        """Add an entry, drop the least recently used, the caller locks"""
+        cache[key] = entry
+        cache.move_to_end(key)
+        while len(cache) > max_entries:
+            cache.popitem(last=False)
+
+    def handle(self, request):
+        """Answer a request
+
+        Parameters
+        ----------
+        request : dict
+            The request with its "op"
+
+        Returns
+        -------
+        response : dict
+            {"ok": True, "result": ...} or {"ok": False, "error": ...}
+        """
+        self._count("requests")
+        op = request.get("op")
+        handler = getattr(self, "op_%s" % op, None)
+        if handler is None:
+            return {"ok": False, "error": "Unknown op: %s" % op}
+        try:
+            return {"ok": True, "result": handler(request)}
+        except Exception as e:
+            logger.exception("Request %s failed" % op)
+            return {"ok": False, "error": "%s: %s" % (type(e).__name__, e)}
+
+    def op_ping(self, request):
+        return "pong"
+
+    def op_stats(self, request):
+        with self.lock:
+            stats = dict(self.stats)
+        stats["parsed_files"] = len(self.parsed)
+        return stats
+
+    # -----------------------  static mapping  ----------------------------
+    def map_path(self, request, name_filter=None):
+        """Map a directory, reusing the modules whose file is unchanged
+
+        Parameters
+        ----------
+        request : dict
+            'path' and the optional 'base_name', 'ignore', 'keep_misc'
+            and 'single_pass' of map_python
+
+        name_filter : NameFilter or None
+            See map_python
+
+        Returns
+        -------
+        c_package : dict
+            See boring_stuff.projects.map.map_python
+
+        fingerprint : tuple
+            Files and stamps of the parsed modules
+        """
+        from boring_stuff.parser.parser_python import parse_file
+        from boring_stuff.projects.map import map_python
+        files = []
+
+        def parse(filename, base_name=None, single_pass=False):
+            key = (filename, base_name, single_pass)
+            stamp = _stamp(filename)
+            files.append((filename, stamp))
+            with self.lock:
+                entry = self._lookup(self.parsed, key)
+            if entry is not None and entry[0] == stamp:
+                self._count("parse_hits")
+                # map_python resolves the parents in place
+                return copy.deepcopy(entry[1])
+
+            self._count("parse_misses")
+            module = parse_file(filename, base_name, single_pass)
+            with self.lock:
+                self._store(
+                    self.parsed, key, (stamp, module), self.max_parsed)
+            return copy.deepcopy(module)
+
+        c_package = map_python(
+            request["path"], base_name=request.get("base_name"),
+            ignore=request.get("ignore"),
+            keep_misc=request.get("keep_misc", True),
+            single_pass=request.get("single_pass", False),
+            name_filter=name_filter, parse=parse)
+        return c_package, tuple(files)
+
+    def op_map(self, request):
+        return self.map_path(request)[0]
+
+    def op_render(self, request):
+        """Render the class diagram, return its text or write it to output"""
+        from boring_stuff.uml.class_diagram import write_class_diagram
+        c_package, fingerprint = self.map_path(request)
+        key = (request["path"], request.get("base_name"),
+               bool(request.get("draw_depend")),
+               json.dumps(request.get("ignore")),
+               request.get("single_pass", False))
+        with self.lock:
+            entry = self._lookup(self.rendered, key)
+
+        if entry is not None and entry[0] == fingerprint:
+            self._count("render_hits")
+            text = entry[1]
+        else:
+            self._count("render_misses")
+            f_id, tmp_path = tempfile.mkstemp(suffix=".wsd")
+            os.close(f_id)
+            try:
+                write_class_diagram(
+                    c_package, tmp_path,
+                    draw_depend=bool(request.get("draw_depend")))
+                with open(tmp_path, "r") as file_in:
+                    text = file_in.read()
+            finally:
+                os.remove(tmp_path)
+            with self.lock:
+                self._store(
+                    self.rendered, key, (fingerprint, text),
+                    self.max_rendered)
+
+        output = request.get("output")
+        if not output:
+            return {"text": text}
+        with open(output, "w") as file_out:
+            file_out.write(text)
+        return {"output": output}
+
+    def op_query(self, request):
+        """Find modules and classes by name
+
+        A spec matches if its qualified name is the queried name or ends
+        with "." + name.
+
+        Returns
+        -------
+        matches : list
+            List of {"type", "name", "module"}
+        """
+        name = request["name"]
+        matches = []
+        for spec in _walk_specs(self.map_path(request)[0]):
+            candidates = [(spec, spec["name"])] + [
+                (class_spec, spec["name"] + "." + class_spec["name"])
+                for class_spec in spec.get("class_list", [])]
+            for c_spec, full_name in candidates:
+                if full_name == name or full_name.endswith("." + name):
+                    matches.append({
+                        "type": c_spec["type"], "name": full_name,
+                        "module": spec["name"]})
+        return matches
+
+    # -----------------------  inspection  --------------------------------
+    def _inspect_fingerprint(self, c_package):
+        """Files and stamps of the modules of an inspected package"""
+        files = []
+        for spec in _walk_specs(c_package):
+            filename = getattr(sys.modules.get(spec["name"]), "__file__", None)
+            if filename:
+                files.append((spec["name"], filename, _stamp(filename)))
+        return tuple(files)
+
+    def op_inspect(self, request):
+        """Map an imported package with map_module
+
+        Imports are serialized.  Modules whose file changed since the
+        last inspect are reloaded first.
+        """
+        from boring_stuff.projects.cache import _as_json
+        from boring_stuff.projects.map_with_inspect import map_module
+        key = (request["module"], request.get("access_level", 0))
+        with self.inspect_lock:
+            entry = self._lookup(self.inspected, key)
+            if entry is not None:
+                changed = [
+                    name for name, filename, stamp in entry[0]
+                    if _stamp(filename) != stamp]
+                if not changed:
+                    self._count("inspect_hits")
+                    return copy.deepcopy(entry[1])
+                for name in changed:
+                    if name in sys.modules:
+                        logger.info("Reloading %s" % name)
+                        importlib.reload(sys.modules[name])
+
+            self._count("inspect_misses")
+            c_package = _as_json(map_module(
+                importlib.import_module(request["module"]),
+                access_level=request.get("access_level", 0)))
+            self._store(
+                self.inspected, key,
+                (self._inspect_fingerprint(c_package), c_package),
+                self.max_inspected)
+            return copy.deepcopy(c_package)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Read JSON requests, one per line, and write the answers"""
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line.decode("utf-8"))
+            except ValueError as e:
+                response = {"ok": False, "error": "Bad request: %s" % e}
+            else:
+                if request.get("op") == "shutdown":
+                    response = {"ok": True, "result": "bye"}
+                    threading.Thread(target=self.server.shutdown).start()
+                else:
+                    response = self.server.service.handle(request)
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class MapServer(socketserver.ThreadingMixIn, _UnixStreamServer):
+    """Threaded Unix socket server around a MapService"""
+    daemon_threads = True
+
+    def __init__(self, socket_path=None, service=None):
+        if not hasattr(socket, "AF_UNIX"):
+            raise DaemonError("Unix sockets are not available")
+        if socket_path is None:
+            socket_path = default_socket()
+        self.service = service or MapService()
+        _private_dir(os.path.dirname(os.path.abspath(socket_path)))
+        if os.path.lexists(socket_path):
+            if not _owned(socket_path):
+                raise DaemonError(
+                    "%s belongs to another user" % socket_path)
+            if _connect(socket_path) is not None:
+                raise DaemonError(
+                    "A daemon is already listening on %s" % socket_path)
+            # stale socket of a dead daemon
+            os.remove(socket_path)
+        # created private, other users must not connect before a chmod
+        old_umask = os.umask(0o077)
+        try:
+            _UnixStreamServer.__init__(self, socket_path, _RequestHandler)
+        finally:
+            os.umask(old_umask)
+        os.chmod(socket_path, 0o600)
+
+    def server_close(self):
+        _UnixStreamServer.server_close(self)
+        try:
+            os.remove(self.server_address)
+        except OSError:
+            pass
+
+
+def serve(socket_path=None):
+    """Run the daemon until a shutdown request"""
+    server = MapServer(socket_path)
+    logger.info("Listening on %s" % server.server_address)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+# ---------------------------  client  ----------------------------------------
+_LOCAL_SERVICE = []
+"""In-process MapService used when no daemon is running"""
+
+
+def _owned(path):
+    """Whether path (not followed if a link) belongs to the user"""
+    try:
+        return os.lstat(path).st_uid == os.getuid()
+    except OSError:
+        return False
+
+
+def _private_dir(directory):
+    """Create the directory of the socket, only the user can access it
+
+    An existing directory is used if it is owned by the user and other
+    users can not write to it, e.g. $XDG_RUNTIME_DIR or the directory
+    of a test.
+
+    Raises
+    ------
+    DaemonError
+        If the directory is a link, belongs to another user or is
+        writable by others without the sticky bit.
+    """
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or (
+            st.st_mode & 0o022 and not st.st_mode & stat.S_ISVTX):
+        raise DaemonError("Unsafe socket directory %s" % directory)
+
+
+def _connect(socket_path):
+    """Connected socket, None if no daemon is listening
+
+    A socket that belongs to another user is not connected to, it may
+    have been created to receive the requests.
+    """
+    if not _owned(socket_path):
+        if os.path.lexists(socket_path):
+            logger.warning(
+                "Not connecting to %s, it belongs to another user" %
+                socket_path)
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def send(request, socket_path=None, fallback=True):
+    """Send a request to the daemon
+
+    Parameters
+    ----------
+    request : dict
+        The request with its "op"
+
+    socket_path : str or None
+        Socket of the daemon, default_socket() if None
+
+    fallback : bool
+        If true and no daemon is running, handle the request in-process
+        with a MapService kept for the life of the interpreter.
+
+    Returns
+    -------
+    response : dict
+        {"ok": True, "result": ...} or {"ok": False, "error": ...}
+    """
+    if socket_path is None:
+        socket_path = default_socket()
+    sock = _connect(socket_path)
+    if sock is None:
+        if not fallback:
+            raise DaemonError("No daemon listening on %s" % socket_path)
+        logger.debug("No daemon on %s, running in-process" % socket_path)
+        if not _LOCAL_SERVICE:
+            _LOCAL_SERVICE.append(MapService())
+        # same encoding as over the socket
+        return json.loads(json.dumps(_LOCAL_SERVICE[0].handle(request)))
+
+    with sock:
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as file_in:
+            line = file_in.readline()
+    if not line:
+        raise DaemonError("Connection closed by the daemon")
+    return json.loads(line.decode("utf-8"))
+
+
+def call(op, socket_path=None, fallback=True, **params):
+    """Send a request and return its result
+
+    Paths are made absolute since the daemon may run elsewhere.
+
+    Raises
+    ------
+    DaemonError
+        If the request failed
+    """
+    request = dict(params, op=op)
+    for key in ["path", "output"]:
+        if request.get(key):
+            request[key] = os.path.abspath(request[key])
+
+    response = send(request, socket_path, fallback)
+    if not response.get("ok"):
+        raise DaemonError(response.get("error"))
+    return response["result"]
+
+
+if __name__ == "__main__":
+    # --------------------------  parse commands  ---------------------------
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--socket", default=default_socket(), help="Socket of the daemon")
+    parser.add_argument(
+        "--no-fallback", action="store_true",
+        help="Fail instead of running in-process without a daemon")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    commands.add_parser("serve", help="Run the daemon")
+    commands.add_parser("stop", help="Stop the daemon")
+    commands.add_parser("stats", help="Cache statistics of the daemon")
+    for command in ["map", "render", "query"]:
+        c_parser = commands.add_parser(command)
+        c_parser.add_argument("path", help="Project directory")
+        if command == "render":
+            c_parser.add_argument("output", help="Class diagram to write")
+            c_parser.add_argument(
+                "--depend", action="store_true", help="Draw dependencies")
+        if command == "query":
+            c_parser.add_argument("name", help="Module or class name")
+        c_parser.add_argument(
+            "--single-pass", action="store_true",
+            help="Parse with the single pass scanner")
+    c_parser = commands.add_parser("inspect")
+    c_parser.add_argument("module", help="Module to map with map_module")
+    c_parser.add_argument(
+        "--access", default=0, type=int,
+        help="Access level to track.  (0=public only, 2=include private")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.socket)
+        sys.exit(0)
+
+    params = {}
+    if args.command in ["map", "render", "query"]:
+        params = {"path": args.path, "single_pass": args.single_pass}
+    if args.command == "render":
+        params.update(output=args.output, draw_depend=args.depend)
+    elif args.command == "query":
+        params["name"] = args.name
+    elif args.command == "inspect":
+        params = {"module": args.module, "access_level": args.access}
+
+    if args.command == "stop":
+        result = call("shutdown", args.socket, False)
+    else:
+        result = call(
+            args.command, args.socket, not args.no_fallback, **params)
+    if args.command == "render":
+        print(result.get("output"))
+    else:
+        print(json.dumps(result, indent=2))
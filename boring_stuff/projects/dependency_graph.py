@@ -0,0 +1,513 @@
+#!/usr/bin/env python
+"""Dependency Graph Analytics
+
+Analyze the 'dependencies' collected by the mappers (see
+boring_stuff.projects.map_with_inspect) instead of only drawing them.
+
+* Import cycles are the strongly connected components (Tarjan).
+* Layers rank the modules by the longest dependency chain below them,
+  layer 0 depends on nothing.
+* The transitive closure is stored as bitsets (rows of uint64) over the
+  strongly connected components, and the "blast radius" of a module is
+  the number of modules that depend on it, directly or not.
+
+The closure is computed in chunks of columns so the memory stays
+bounded on large graphs (100k nodes and more).
+
+Examples
+--------
+>>> import boring_stuff
+>>> from boring_stuff.projects.map_with_inspect import map_module
+>>> from boring_stuff.projects.dependency_graph import DependencyGraph
+>>> c_package = map_module(boring_stuff)
+>>> graph = DependencyGraph.from_spec(c_package)
+>>> cycles = graph.cycles()
+>>> blast = graph.blast_radius()
+
+Annotate the package and draw the layers and blast radius
+
+>>> graph.annotate(c_package)
+>>> from boring_stuff.uml.class_diagram import write_class_diagram
+>>> write_class_diagram(c_package, "/tmp/output.puml", draw_depend=True)
+"""
+import logging
+import numpy as np
+
+logger = logging.getLogger("boring_stuff.projects.dependency_graph")
+
+_POPCOUNT = np.array([bin(i_val).count("1") for i_val in range(256)],
+                     dtype=np.uint8)
+"""Number of bits set in each byte value"""
+
+
+def collect_dependencies(package, depend_list=None):
+    """Collect the dependency pairs of a package specification
+
+    Parameters
+    ----------
+    package : dict
+        Specification from the mappers, with 'subpackages', 'modules'
+        and 'dependencies' fields
+
+    depend_list : list or None
+        List to append to
+
+    Returns
+    -------
+    depend_list : list
+        List of [module, dependency] pairs
+    """
+    if depend_list is None:
+        depend_list = []
+    depend_list.extend(package.get("dependencies", []))
+    for child in package.get("subpackages", []) + package.get("modules", []):
+        collect_dependencies(child, depend_list)
+    return depend_list
+
+
+def _popcount_rows(bitsets):
+    """Number of bits set in each row of a 2D array of uint64"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bitsets).sum(axis=1, dtype=np.int64)
+    return _POPCOUNT[bitsets.view(np.uint8)].sum(axis=1, dtype=np.int64)
+
+
+def _ranges(starts, counts):
+    """Concatenate range(start, start + count) for all pairs"""
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    ends = np.cumsum(counts)
+    offsets = np.repeat(starts - (ends - counts), counts)
+    return np.arange(total, dtype=np.int64) + offsets
+
+
+class DependencyGraph(object):
+    """Directed graph of dependencies, edge from a module to what it uses
+
+    Attributes
+    ----------
+    nodes : list
+        Names of the nodes
+
+    index : dict
+        Map from name to node index
+
+    src, dst : numpy.ndarray
+        Edges as arrays of node indices
+    """
+    def __init__(self, edges, nodes=None):
+        self.nodes = list(nodes or [])
+        self.index = dict((name, i_node) for i_node, name in
+                          enumerate(self.nodes))
+        src = []
+        dst = []
+        for source, target in edges:
+            src.append(self._add_node(source))
+            dst.append(self._add_node(target))
+
+        self.src = np.array(src, dtype=np.int64)
+        self.dst = np.array(dst, dtype=np.int64)
+        self._components = None
+
+    @classmethod
+    def from_spec(cls, package):
+        """Build the graph from a package specification
+
+        Every mapped module is a node, even without dependencies.
+        """
+        nodes = []
+        to_visit = [package]
+        while to_visit:
+            spec = to_visit.pop()
+            nodes.append(spec["name"])
+            to_visit.extend(spec.get("subpackages", []))
+            to_visit.extend(spec.get("modules", []))
+        return cls(collect_dependencies(package), nodes)
+
+    def _add_node(self, name):
+        i_node = self.index.get(name)
+        if i_node is None:
+            i_node = len(self.nodes)
+            self.index[name] = i_node
+            self.nodes.append(name)
+        return i_node
+
+    def _csr(self, src, dst, n_nodes):
+        """Compressed sparse rows (indptr, indices) of the edges"""
+        order = np.argsort(src, kind="stable")
+        indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n_nodes), out=indptr[1:])
+        return indptr, dst[order]
+
+    # -----------------------  strongly connected components  -------------
+    @property
+    def components(self):
+        """Component index of each node (numpy.ndarray)
+
+        Components are numbered in reverse topological order, a
+        component only depends on components with a lower index.
+        """
+        if self._components is None:
+            self._components = self._tarjan()
+        return self._components
+
+    def _tarjan(self):
+        """Iterative Tarjan algorithm (no recursion limit)"""
+        n_nodes = len(self.nodes)
+        indptr, indices = self._csr(self.src, self.dst, n_nodes)
+        indptr = indptr.tolist()
+        indices = indices.tolist()
+
+        index = [-1] * n_nodes
+        low = [0] * n_nodes
+        on_stack = [False] * n_nodes
+        comp = [-1] * n_nodes
+        stack = []
+        counter = 0
+        n_comp = 0
+        for root in range(n_nodes):
+            if index[root] != -1:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [[root, indptr[root]]]
+            while work:
+                frame = work[-1]
+                node = frame[0]
+                if frame[1] < indptr[node + 1]:
+                    succ = indices[frame[1]]
+                    frame[1] += 1
+                    if index[succ] == -1:
+                        index[succ] = low[succ] = counter
+                        counter += 1
+                        stack.append(succ)
+                        on_stack[succ] = True
+                        work.append([succ, indptr[succ]])
+                    elif on_stack[succ] and index[succ] < low[node]:
+                        low[node] = index[succ]
+                    continue
+
+                work.pop()
+                if work and low[node] < low[work[-1][0]]:
+                    low[work[-1][0]] = low[node]
+                if low[node] == index[node]:
+                    # root of a component, pop it
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        comp[member] = n_comp
+                        if member == node:
+                            break
+                    n_comp += 1
+
+        return np.array(comp, dtype=np.int64)
+
+    def strongly_connected_components(self):
+        """List the components as lists of names"""
+        members = [[] for _ in range(int(self.components.max()) + 1)] \
+            if len(self.nodes) else []
+        for name, i_comp in zip(self.nodes, self.components.tolist()):
+            members[i_comp].append(name)
+        return members
+
+    def cycles(self):
+        """List the import cycles
+
+        Returns
+        -------
+        cycles : list
+            Sorted lists of names, one per component with more than one
+            node or with a self dependency.
+        """
+        self_loops = set(self.src[self.src == self.dst].tolist())
+        cycles = []
+        for members in self.strongly_connected_components():
+            if len(members) > 1 or self.index[members[0]] in self_loops:
+                cycles.append(sorted(members))
+        return cycles
+
+    # -----------------------  condensation and layers  -------------------
+    def _condensation(self):
+        """Unique edges between different components"""
+        comp = self.components
+        n_comp = int(comp.max()) + 1 if len(comp) else 0
+        c_src = comp[self.src]
+        c_dst = comp[self.dst]
+        keep = c_src != c_dst
+        keys = np.unique(c_src[keep] * n_comp + c_dst[keep])
+        return n_comp, keys // n_comp, keys % n_comp
+
+    def _component_layers(self, n_comp, c_src, c_dst):
+        """Longest path from each component down to a sink (Kahn)"""
+        pred_ptr, preds = self._csr(c_dst, c_src, n_comp)
+        out_deg = np.bincount(c_src, minlength=n_comp)
+        layers = np.full(n_comp, -1, dtype=np.int64)
+        frontier = np.flatnonzero(out_deg == 0)
+        layer = 0
+        while len(frontier):
+            layers[frontier] = layer
+            c_preds = preds[_ranges(
+                pred_ptr[frontier],
+                pred_ptr[frontier + 1] - pred_ptr[frontier])]
+            out_deg -= np.bincount(c_preds, minlength=n_comp)
+            c_preds = np.unique(c_preds)
+            frontier = c_preds[out_deg[c_preds] == 0]
+            layer += 1
+        return layers
+
+    def layers(self):
+        """Architecture level of each node
+
+        Nodes of a cycle share the same layer.
+
+        Returns
+        -------
+        layers : dict
+            Map from name to layer, 0 for nodes without dependencies
+        """
+        layers = self._component_layers(*self._condensation())
+        return dict(zip(self.nodes, layers[self.components].tolist()))
+
+    # -----------------------  transitive closure  ------------------------
+    def _closure_chunk(self, n_comp, groups, c_start, c_stop,
+                       relevant=None):
+        """Reachability of the components c_start:c_stop from all components
+
+        Parameters
+        ----------
+        n_comp : int
+            Number of components
+
+        groups : list
+            Condensed edges grouped by layer, see _layer_edges()
+
+        c_start, c_stop : int
+            Range of the target components
+
+        relevant : tuple or None
+            (low, high) range of the components that may reach the
+            target range.  Other components are left out.
+
+        Returns
+        -------
+        reach : numpy.ndarray
+            Array of uint64 with shape (high - low, n_words), bit j of
+            row i is set if component low + i reaches component
+            c_start + j.  A component reaches itself.
+        """
+        low, high = (0, n_comp) if relevant is None else relevant
+        n_words = (c_stop - c_start + 63) // 64
+        reach = np.zeros((high - low, n_words), dtype=np.uint64)
+        cols = np.arange(c_stop - c_start)
+        reach[cols + c_start - low, cols // 64] = \
+            np.left_shift(np.uint64(1), (cols % 64).astype(np.uint64))
+
+        # a component only reaches lower layers, fill layer by layer
+        for sources, targets in groups:
+            if relevant is not None:
+                keep = (targets >= low) & (targets < high)
+                sources = sources[keep] - low
+                targets = targets[keep] - low
+                if len(sources) == 0:
+                    continue
+            seg_starts = np.flatnonzero(np.r_[True, np.diff(sources) != 0])
+            reach[sources[seg_starts]] |= np.bitwise_or.reduceat(
+                reach[targets], seg_starts, axis=0)
+        return reach
+
+    def _layer_edges(self, c_src, c_dst, layers):
+        """Group the condensed edges by the layer of their source
+
+        Returns
+        -------
+        groups : list
+            (sources, targets) per layer, in increasing layer, sorted by
+            source.
+        """
+        order = np.lexsort((c_src, layers[c_src]))
+        c_src = c_src[order]
+        c_dst = c_dst[order]
+        edge_layers = layers[c_src]
+        bounds = np.flatnonzero(np.diff(edge_layers)) + 1
+        groups = []
+        for l_src, l_dst in zip(np.split(c_src, bounds),
+                                np.split(c_dst, bounds)):
+            if len(l_src):
+                groups.append((l_src, l_dst))
+        return groups
+
+    def transitive_closure(self):
+        """Reachability between the components as a bitset matrix
+
+        Needs n_comp**2 / 8 bytes, use blast_radius() or reach_counts()
+        on large graphs.
+
+        Returns
+        -------
+        reach : numpy.ndarray
+            Array of uint64 with shape (n_comp, ceil(n_comp / 64)), see
+            components for the component of each node.
+        """
+        n_comp, c_src, c_dst = self._condensation()
+        layers = self._component_layers(n_comp, c_src, c_dst)
+        groups = self._layer_edges(c_src, c_dst, layers)
+        return self._closure_chunk(n_comp, groups, 0, n_comp)
+
+    def reaches(self, source, target, reach=None):
+        """Check if source depends on target, directly or not
+
+        Parameters
+        ----------
+        source, target : str
+            Names of the nodes
+
+        reach : numpy.ndarray or None
+            Result of transitive_closure(), computed if not provided.
+        """
+        if reach is None:
+            reach = self.transitive_closure()
+        c_src = self.components[self.index[source]]
+        c_dst = self.components[self.index[target]]
+        return bool((int(reach[c_src, c_dst // 64]) >> int(c_dst % 64)) & 1)
+
+    def reach_counts(self, chunk_bits=4096):
+        """Count the transitive dependents and dependencies of each node
+
+        The closure is computed chunk_bits columns at a time so at most
+        n_comp * chunk_bits / 8 bytes are held.  Dependencies are the
+        bits set in the rows of the closure, dependents the bits set in
+        the rows of the closure of the reversed graph.
+
+        Returns
+        -------
+        n_dependents : numpy.ndarray
+            Number of other nodes that depend on each node
+
+        n_dependencies : numpy.ndarray
+            Number of other nodes each node depends on
+        """
+        n_comp, c_src, c_dst = self._condensation()
+        logger.info("reach_counts() on %d components, %d edges" % (
+            n_comp, len(c_src)))
+        sizes = np.bincount(self.components, minlength=n_comp)
+        comp = self.components
+
+        counts = []
+        for forward in [False, True]:
+            c_from, c_to = (c_src, c_dst) if forward else (c_dst, c_src)
+            layers = self._component_layers(n_comp, c_from, c_to)
+            groups = self._layer_edges(c_from, c_to, layers)
+            c_counts = np.zeros(n_comp, dtype=np.int64)
+            for c_start in range(0, n_comp, chunk_bits):
+                c_stop = min(c_start + chunk_bits, n_comp)
+                # components only depend on lower indices
+                relevant = (c_start, n_comp) if forward else (0, c_stop)
+                reach = self._closure_chunk(
+                    n_comp, groups, c_start, c_stop, relevant)
+                r_counts = c_counts[relevant[0]:relevant[1]]
+                r_counts += _popcount_rows(reach)
+
+                # a component of k nodes counts for k
+                for i_comp in np.flatnonzero(sizes[c_start:c_stop] > 1):
+                    bits = np.right_shift(
+                        reach[:, i_comp // 64], np.uint64(i_comp % 64))
+                    r_counts += (bits & np.uint64(1)).astype(np.int64) * \
+                        (sizes[c_start + i_comp] - 1)
+            counts.append(c_counts[comp] - 1)
+        return counts[0], counts[1]
+
+    def blast_radius(self, chunk_bits=4096):
+        """Number of nodes affected by a change of each node
+
+        Returns
+        -------
+        blast : dict
+            Map from name to the number of other nodes depending on it,
+            directly or not.
+        """
+        n_dependents, _ = self.reach_counts(chunk_bits)
+        return dict(zip(self.nodes, n_dependents.tolist()))
+
+    def annotate(self, package):
+        """Add the analytics to a package specification
+
+        Each module/package spec gets an 'analytics' field with its
+        'layer', 'blast_radius' and 'cycle' (index in cycles(), or
+        None).  class_diagram draws them as stereotypes.
+        """
+        layers = self.layers()
+        n_dependents, n_dependencies = self.reach_counts()
+        in_cycle = {}
+        for i_cycle, members in enumerate(self.cycles()):
+            for name in members:
+                in_cycle[name] = i_cycle
+
+        to_visit = [package]
+        while to_visit:
+            spec = to_visit.pop()
+            i_node = self.index.get(spec["name"])
+            if i_node is not None:
+                spec["analytics"] = {
+                    "layer": layers[spec["name"]],
+                    "blast_radius": int(n_dependents[i_node]),
+                    "dependencies": int(n_dependencies[i_node]),
+                    "cycle": in_cycle.get(spec["name"]),
+                }
+            to_visit.extend(spec.get("subpackages", []))
+            to_visit.extend(spec.get("modules", []))
+
+
+if __name__ == "__main__":
+    # --------------------------  parse commands  ---------------------------
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    parser.add_argument(
+        "module", nargs="?", default="",
+        help="Module to map with map_with_inspect")
+    parser.add_argument(
+        "--output", default="",
+        help="Location to generate the annotated class diagram")
+    parser.add_argument(
+        "--top", default=10, type=int,
+        help="Number of modules with the largest blast radius to list")
+    parser.add_argument(
+        "--random", default=0, type=int,
+        help="Benchmark on a random graph with N nodes instead")
+    args = parser.parse_args()
+
+    import time
+    if args.random:
+        # mostly layered, modules import older ones plus a few cycles
+        rng = np.random.RandomState(0)
+        n_edges = 5 * args.random
+        src = rng.randint(1, args.random, n_edges)
+        dst = (src * rng.random_sample(n_edges)).astype(np.int64)
+        back = rng.random_sample(n_edges) < 0.001
+        src[back], dst[back] = dst[back], src[back]
+        edges = zip(src.tolist(), dst.tolist())
+        graph = DependencyGraph(edges)
+        c_package = None
+    else:
+        import importlib
+        from boring_stuff.projects.map_with_inspect import map_module
+        c_package = map_module(importlib.import_module(args.module))
+        graph = DependencyGraph.from_spec(c_package)
+
+    start = time.time()
+    cycles = graph.cycles()
+    layers = graph.layers()
+    blast = graph.blast_radius()
+    print("%d nodes, %d edges in %.2f s" % (
+        len(graph.nodes), len(graph.src), time.time() - start))
+    print("%d cycles, %d layers" % (
+        len(cycles), max(layers.values()) + 1 if layers else 0))
+    for name in sorted(blast, key=blast.get, reverse=True)[:args.top]:
+        print("%8d  %s" % (blast[name], name))
+
+    if args.output and c_package is not None:
+        from boring_stuff.uml.class_diagram import write_class_diagram
+        graph.annotate(c_package)
+        write_class_diagram(c_package, output=args.output, draw_depend=True)
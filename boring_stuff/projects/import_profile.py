@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+"""Import cost profiling
+
+Structured version of ``python -X importtime``.  While an
+ImportProfiler is active, every module loaded through the import
+system is timed and, optionally, the memory it allocates is traced.
+map_module attaches the result to each module spec as 'import_cost'
+and class_diagram can color the packages by their import time.
+
+Only modules imported while the profiler is active are measured, a
+module already in sys.modules costs nothing to map.
+
+Examples
+--------
+>>> import importlib
+>>> from boring_stuff.projects.import_profile import ImportProfiler
+>>> from boring_stuff.projects.map_with_inspect import map_module
+>>> profiler = ImportProfiler(trace_memory=True)
+>>> with profiler:
+...     mod = importlib.import_module("boring_stuff")
+>>> c_package = map_module(mod, import_workers=1, import_profile=profiler)
+>>> print(profiler.format_report(top=10))
+"""
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+
+logger = logging.getLogger("boring_stuff.projects.import_profile")
+
+REPORT_KEYS = ["time", "self_time", "memory", "self_memory"]
+"""Fields of an import cost record, 'time' and 'memory' include the
+modules imported by the module, 'self_*' exclude them"""
+
+
+class _ProfiledLoader(object):
+    """Loader proxy timing exec_module of the wrapped loader"""
+    def __init__(self, loader, profiler):
+        self.loader = loader
+        self.profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        # restore the real loader, other code may check its type
+        module.__loader__ = self.loader
+        if getattr(module, "__spec__", None) is not None:
+            module.__spec__.loader = self.loader
+        self.profiler._run(module.__name__, self.loader.exec_module, module)
+
+
+class _ProfilingFinder(object):
+    """Meta path finder wrapping the loaders found by the other finders"""
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, "find_spec", None)
+            if finder is self or find_spec is None:
+                continue
+            spec = find_spec(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _ProfiledLoader(spec.loader, self.profiler)
+        return spec
+
+
+class ImportProfiler(object):
+    """Record the import time and memory of each module
+
+    Used as a context manager, it can be entered several times.
+    Imports running in other threads (preimport_submodules) are
+    tracked separately.
+
+    Attributes
+    ----------
+    trace_memory : bool
+        If true, trace the allocations with tracemalloc.  This slows
+        the imports down noticeably.
+
+    records : dict
+        Map from module name to a dict with the REPORT_KEYS.  Memory
+        fields are None without trace_memory.
+    """
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.records = {}
+        self._finder = _ProfilingFinder(self)
+        self._local = threading.local()
+        self._depth = 0
+        self._started_tracing = False
+
+    def __enter__(self):
+        self._depth += 1
+        if self._depth == 1:
+            if self.trace_memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            sys.meta_path.insert(0, self._finder)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._depth -= 1
+        if self._depth == 0:
+            if self._finder in sys.meta_path:
+                sys.meta_path.remove(self._finder)
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+        return False
+
+    def _run(self, name, func, *args):
+        """Call func (an exec_module) and record its cost under name"""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        # [children time, children memory] of the frame
+        frame = [0.0, 0]
+        stack.append(frame)
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        start_memory = tracemalloc.get_traced_memory()[0] if tracing else 0
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            memory = None
+            if tracing:
+                memory = tracemalloc.get_traced_memory()[0] - start_memory
+            stack.pop()
+            if stack:
+                stack[-1][0] += elapsed
+                stack[-1][1] += memory or 0
+
+            self.records[name] = {
+                "time": elapsed,
+                "self_time": elapsed - frame[0],
+                "memory": memory,
+                "self_memory": None if memory is None else memory - frame[1],
+            }
+            logger.debug("import %s: %.1f ms" % (name, 1e3 * elapsed))
+
+    def report(self, sort_by="self_time", top=None):
+        """Records sorted by decreasing cost
+
+        Parameters
+        ----------
+        sort_by : str
+            One of REPORT_KEYS
+
+        top : int or None
+            Number of records to keep, all if None
+
+        Returns
+        -------
+        rows : list
+            List of (name, record)
+        """
+        if sort_by not in REPORT_KEYS:
+            raise ValueError("sort_by should be one of %s" % REPORT_KEYS)
+        rows = sorted(self.records.items(),
+                      key=lambda row: row[1][sort_by] or 0, reverse=True)
+        return rows[:top] if top is not None else rows
+
+    def format_report(self, sort_by="self_time", top=None):
+        """Report as a table, times in ms and memory in kB"""
+        lines = ["%10s %10s %10s %10s  %s" % (
+            "time(ms)", "self(ms)", "mem(kB)", "self(kB)", "module")]
+        for name, record in self.report(sort_by, top):
+            lines.append("%10.1f %10.1f %10s %10s  %s" % (
+                1e3 * record["time"], 1e3 * record["self_time"],
+                _kilobytes(record["memory"]),
+                _kilobytes(record["self_memory"]), name))
+        return "\n".join(lines)
+
+    def annotate(self, package):
+        """Attach the records to a package specification
+
+        Each module/package spec imported while profiling gets an
+        'import_cost' field with its record.
+        """
+        to_visit = [package]
+        while to_visit:
+            spec = to_visit.pop()
+            record = self.records.get(spec.get("name"))
+            if record is not None:
+                spec["import_cost"] = dict(record)
+            to_visit.extend(spec.get("subpackages", []))
+            to_visit.extend(spec.get("modules", []))
+
+
+def _kilobytes(memory):
+    if memory is None:
+        return "-"
+    return "%.1f" % (memory / 1024.0)
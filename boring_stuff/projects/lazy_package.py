@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+"""Package tree mapped on demand
+
+map_with_inspect.map_module maps every submodule, class and function
+up front.  A LazyPackage only inspects a node when one of its fields is
+read and keeps the result, so a tool looking up one class (an editor
+hover, a diagram of a single module) only pays for the modules on the
+way to it.
+
+materialize() returns the dictionary of map_module, mapping whatever
+was not accessed yet.
+
+Examples
+--------
+>>> import boring_stuff
+>>> from boring_stuff.projects.lazy_package import LazyPackage
+>>> tree = LazyPackage(boring_stuff)
+>>> [c_sub.name for c_sub in tree.subpackages]
+>>> setter = tree.find("boring_stuff.class_helper.setter.Setter")
+>>> c_package = tree.materialize()
+"""
+import logging
+from boring_stuff.parser.inheritance import resolve_parents
+from boring_stuff.projects import map_with_inspect as MWI
+
+logger = logging.getLogger("boring_stuff.projects.lazy_package")
+
+
+class LazyPackage(object):
+    """Node of a package tree, inspected on first access
+
+    Parameters
+    ----------
+    mod : module
+        The module or package of the node
+
+    access_level : int
+        If 0, only track public
+        If 1, track up to protected
+        If 2, track private
+
+    name_filter : NameFilter or None
+        Submodules rejected by the filter are not part of the tree
+        (see boring_stuff.projects.name_filter).  The root of the
+        filter defaults to mod.
+
+    lean : bool
+        If true, the types of variables and attributes are strings
+        (see map_with_inspect.type_name).
+
+    Attributes
+    ----------
+    name : str
+        Qualified name of the module
+    """
+    def __init__(self, mod, access_level=0, name_filter=None, lean=False):
+        if name_filter is not None and name_filter.root is None:
+            name_filter = name_filter.bind(mod.__name__)
+        self.mod = mod
+        self.name = mod.__name__
+        self.access_level = access_level
+        self.name_filter = name_filter
+        self.lean = lean
+
+        # memoized results
+        self._members = None
+        self._children = None
+        self._class_specs = {}
+        self._class_list = None
+        self._methods = None
+
+    def __repr__(self):
+        return "LazyPackage(%s)" % self.name
+
+    @property
+    def members(self):
+        """Members of the module, see map_with_inspect.classify_members"""
+        if self._members is None:
+            logger.debug("Inspecting %s" % self.name)
+            self._members = MWI.classify_members(
+                self.mod, self.access_level, self.lean)
+        return self._members
+
+    @property
+    def type(self):
+        """'package' if the module only holds submodules, else 'module'"""
+        return "package" if MWI.is_pure_package(self.members) else "module"
+
+    @property
+    def children(self):
+        """Nodes of the submodules, not inspected yet"""
+        if self._children is None:
+            children = []
+            for c_name, c_mod in self.members["modules"].items():
+                if self.name_filter is not None and \
+                        not self.name_filter.allows(
+                            c_name, "__path__" in vars(c_mod)):
+                    logger.debug("Filtered out %s" % c_name)
+                    continue
+                children.append(LazyPackage(
+                    c_mod, self.access_level, self.name_filter, self.lean))
+            self._children = children
+        return self._children
+
+    @property
+    def subpackages(self):
+        """Nodes of the submodules that are pure packages"""
+        return [child for child in self.children if child.type == "package"]
+
+    @property
+    def modules(self):
+        """Nodes of the other submodules"""
+        return [child for child in self.children if child.type == "module"]
+
+    @property
+    def class_names(self):
+        """Names of the classes defined in the module, none is mapped"""
+        return list(self.members["classes"])
+
+    def get_class(self, name):
+        """Map one class of the module
+
+        Returns
+        -------
+        class_spec : dict or None
+            See map_with_inspect.map_class, None if the module has no
+            such class or it can not be mapped.
+        """
+        if name not in self._class_specs:
+            cls = self.members["classes"].get(name)
+            class_spec = None
+            if cls is not None:
+                try:
+                    class_spec = MWI.map_class(
+                        cls, self.access_level, self.lean)
+                except Exception as e:
+                    logger.error("Exception caught in get_class: %s" % str(e))
+            self._class_specs[name] = class_spec
+        return self._class_specs[name]
+
+    @property
+    def class_list(self):
+        """Specs of all the classes of the module"""
+        if self._class_list is None:
+            self._class_list = [
+                class_spec for class_spec in map(self.get_class,
+                                                 self.class_names)
+                if class_spec is not None]
+        return self._class_list
+
+    @property
+    def methods(self):
+        """Specs of the functions of the module"""
+        if self._methods is None:
+            self._methods = [
+                MWI.map_function(func)
+                for func in self.members["functions"].values()]
+        return self._methods
+
+    @property
+    def variables(self):
+        """Specs of the variables of the module"""
+        return self.members["variables"]
+
+    @property
+    def dependencies(self):
+        """[name, imported] pairs of the module"""
+        return self.members["dependencies"]
+
+    def find(self, name):
+        """Look up a module, class or function by qualified name
+
+        Only the modules along the name are inspected.
+
+        Parameters
+        ----------
+        name : str
+            Qualified name, such as "pkg.mod", "pkg.mod.Class" or
+            "pkg.mod.function"
+
+        Returns
+        -------
+        node : LazyPackage, dict or None
+            The node of a module, the spec of a class or function, or
+            None if it is not in the tree.
+        """
+        if name == self.name:
+            return self
+        if name[:len(self.name) + 1] != self.name + ".":
+            return None
+
+        for child in self.children:
+            if name == child.name or \
+                    name[:len(child.name) + 1] == child.name + ".":
+                return child.find(name)
+
+        rest = name[len(self.name) + 1:]
+        if rest in self.members["classes"]:
+            return self.get_class(rest)
+        if rest in self.members["functions"]:
+            # methods follow the order of the functions
+            return self.methods[list(self.members["functions"]).index(rest)]
+        return None
+
+    def materialize(self):
+        """The whole subtree as map_with_inspect.map_module returns it
+
+        Returns
+        -------
+        c_package : dict
+            The dictionary describing the package.
+        """
+        c_package = self._materialize()
+        resolve_parents(c_package)
+        return c_package
+
+    def _materialize(self):
+        """The whole subtree for materialize, parents not resolved"""
+        if self.type == "package":
+            c_package = {
+                "type": "package",
+                "name": self.name,
+                "subpackages": [],
+                "modules": [],
+                "misc": [],
+                "dependencies": list(self.dependencies)
+            }
+        else:
+            c_package = {
+                "type": "module",
+                "name": self.name,
+                "subpackages": [],
+                "modules": [],
+                "class_list": list(self.class_list),
+                "methods": list(self.methods),
+                "variables": list(self.variables),
+                "dependencies": list(self.dependencies)
+            }
+
+        for child in self.children:
+            try:
+                tmp_mod = child._materialize()
+                if tmp_mod["type"] == "package":
+                    c_package["subpackages"].append(tmp_mod)
+                else:
+                    c_package["modules"].append(tmp_mod)
+            except Exception as e:
+                logger.error(
+                    "Caught exception(%s) in materialize(%s)" %
+                    (str(e), child.name))
+        return c_package
+
+
+if __name__ == "__main__":
+    # --------------------------  parse commands  ---------------------------
+    from argparse import ArgumentParser
+    import importlib
+    import json
+    parser = ArgumentParser()
+    parser.add_argument(
+        "name",
+        help="Qualified name of a module, class or function to describe")
+    parser.add_argument(
+        "--top", default=None,
+        help="Package to import and walk from (default: first part of name)")
+    parser.add_argument(
+        "--access", default=0, type=int,
+        help="Access level to track.  (0=public only, 2=include private")
+    args = parser.parse_args()
+
+    top = args.top or args.name.split(".")[0]
+    tree = LazyPackage(
+        importlib.import_module(top), access_level=args.access, lean=True)
+    node = tree.find(args.name)
+    if isinstance(node, LazyPackage):
+        node = node.materialize()
+    print(json.dumps(node, indent=2))
@@ -1,9 +1,128 @@
 #!/usr/bin/env python
 from collections import OrderedDict
+import logging
 import os
+import re
+from boring_stuff.parser import parser_bytecode
+from boring_stuff.parser.inheritance import resolve_parents
 from boring_stuff.parser.parser_python import parse_file
-IGNORE_DIRS = ["__pycache__"]
-def map_python(in_dir, base_name=None):
+
+logger = logging.getLogger("boring_stuff.projects.map")
+
+IGNORE_DIRS = [
+    "__pycache__", ".*/", "node_modules", "*.egg-info", "*.dist-info",
+]
+"""Default ignore rules (gitignore-style patterns)
+
+Hidden directories (.git, .tox, .venv, ...), byte-code caches,
+node_modules, egg-info and dist-info are skipped.  Virtualenvs are
+recognized by their pyvenv.cfg (see is_virtualenv), not by their name:
+a subpackage may well be called ``venv``.
+"""
+
+
+def compile_ignore(patterns):
+    """Compile gitignore-style patterns
+
+    Supported syntax
+
+    * ``name`` or ``*.ext`` matches the name at any depth
+    * ``dir/`` only matches directories
+    * ``a/b`` or ``/a`` is anchored to the top of the scanned directory
+    * ``**`` matches across directories
+    * ``!pattern`` re-includes something ignored by an earlier pattern
+
+    Parameters
+    ----------
+    patterns : list
+        List of pattern strings.
+
+    Returns
+    -------
+    rules : list
+        List of tuples (regex, negate, dir_only) used by is_ignored.
+    """
+    rules = []
+    for pattern in patterns or []:
+        pattern = pattern.strip()
+        if not pattern or pattern[0] == "#":
+            continue
+
+        negate = pattern[0] == "!"
+        if negate:
+            pattern = pattern[1:]
+
+        dir_only = pattern[-1] == "/"
+        pattern = pattern.rstrip("/")
+
+        # without an inner "/" the pattern matches at any depth
+        anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+
+        regex = ""
+        i_char = 0
+        while i_char < len(pattern):
+            c_char = pattern[i_char]
+            if pattern[i_char:i_char + 3] == "**/":
+                regex += "(?:.*/)?"
+                i_char += 3
+                continue
+            elif pattern[i_char:i_char + 2] == "**":
+                regex += ".*"
+                i_char += 2
+                continue
+            elif c_char == "*":
+                regex += "[^/]*"
+            elif c_char == "?":
+                regex += "[^/]"
+            else:
+                regex += re.escape(c_char)
+            i_char += 1
+
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+        rules.append((re.compile(regex + "$"), negate, dir_only))
+    return rules
+
+
+def is_ignored(rules, rel_path, is_dir=False):
+    """Check a path against compiled ignore rules
+
+    The last matching rule wins, like in a .gitignore file.
+
+    Parameters
+    ----------
+    rules : list
+        Rules from compile_ignore
+
+    rel_path : str
+        Path relative to the scanned directory, "/" separated
+
+    is_dir : bool
+        True if rel_path is a directory
+
+    Returns
+    -------
+    ignored : bool
+        True if the path should be skipped.
+    """
+    ignored = False
+    for regex, negate, dir_only in rules:
+        if dir_only and not is_dir:
+            continue
+        if regex.match(rel_path):
+            ignored = not negate
+    return ignored
+
+
+def is_virtualenv(path):
+    """True if the directory is a virtualenv (contains a pyvenv.cfg)"""
+    return os.path.isfile(os.path.join(path, "pyvenv.cfg"))
+
+
+def map_python(in_dir, base_name=None, ignore=None, keep_misc=True,
+               single_pass=False, budget=None, name_filter=None, parse=None,
+               bytecode=False):
     """Map a python package
 
     Recursively scan directories and map classes / functions
@@ -15,6 +134,45 @@ def map_python(in_dir, base_name=None):
 
     base_name : str or None
         If not provided, use the directory as the base name.
+
+    ignore : list or None
+        Gitignore-style patterns of files/directories to skip, relative
+        to in_dir.  Defaults to IGNORE_DIRS.  Passing a list replaces
+        the defaults, use ``IGNORE_DIRS + [...]`` to extend them.
+
+    keep_misc : bool
+        If true, record the paths of non-python files in 'misc'.
+
+    single_pass : bool
+        If true, parse modules with the single pass scanner.
+        See boring_stuff.parser.parser_python.parse_file
+
+    budget : Budget or None
+        Wall clock / memory limits (see boring_stuff.projects.budget).
+        Once exceeded, the scan stops and every package with unmapped
+        entries is marked 'truncated'.
+
+    name_filter : NameFilter or None
+        Include/exclude patterns and depth limit on the qualified names
+        (see boring_stuff.projects.name_filter).  Rejected directories
+        are not scanned and rejected files are not opened.
+
+    parse : callable or None
+        Called as parse(filename, base_name, single_pass=single_pass)
+        for each module, defaults to parse_file.  Used to cache the
+        parsed modules (see boring_stuff.projects.daemon).
+
+    bytecode : bool
+        If true, read the modules from their bytecode when possible
+        (see boring_stuff.parser.parser_bytecode): a fresh __pycache__
+        file is used instead of the source and .pyc files without a
+        source (compileall -b deployments) are mapped as modules.
+
+    Returns
+    -------
+    c_package : dict
+        The dictionary describing the package.  The classes have their
+        'parent_ids' (see boring_stuff.parser.inheritance).
     """
     # -----------------------  initialize variables  ------------------------
     c_dir = os.path.abspath(in_dir)
@@ -22,6 +180,50 @@ def map_python(in_dir, base_name=None):
     if base_name is None:
         base_name = base
 
+    if name_filter is not None and name_filter.root is None:
+        name_filter = name_filter.bind(base_name.replace("/", "."))
+
+    options = {
+        "rules": compile_ignore(IGNORE_DIRS if ignore is None else ignore),
+        "keep_misc": keep_misc,
+        "single_pass": single_pass,
+        "budget": budget,
+        "name_filter": name_filter,
+        "parse": parse,
+        "bytecode": bytecode,
+    }
+    if parse is None:
+        options["parse"] = parser_bytecode.parse_file if bytecode else \
+            parse_file
+    st = os.stat(c_dir)
+    visited = set([(st.st_dev, st.st_ino)])
+    c_package = _map_dir(c_dir, base_name, "", options, visited)
+    resolve_parents(c_package)
+    return c_package
+
+
+def _map_dir(c_dir, base_name, rel_dir, options, visited):
+    """Map a single directory for map_python
+
+    Parameters
+    ----------
+    c_dir : str
+        Absolute path of the directory
+
+    base_name : str
+        Package name of the directory
+
+    rel_dir : str
+        Path of c_dir relative to the top directory ("" at the top)
+
+    options : dict
+        Settings from map_python ('rules', 'keep_misc', ...)
+
+    visited : set
+        (st_dev, st_ino) of directories already mapped.  Used to
+        break symlink loops.
+        .. note:: This parameter is updated by this function
+    """
     c_package = OrderedDict([
         ["type", "package"],
         ["name", base_name.replace("/", ".")],
@@ -29,45 +231,174 @@ def map_python(in_dir, base_name=None):
         ["modules", []],
         ["misc", []],
     ])
-    files = os.listdir(c_dir)
+
+    # scandir caches the file type, no extra stat per entry
+    try:
+        with os.scandir(c_dir) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except OSError as e:
+        logger.warning("Unable to scan %s: %s" % (c_dir, str(e)))
+        return c_package
 
     # ------------------  map current and subdirectories  -------------------
+    names = set(entry.name for entry in entries) if options["bytecode"] \
+        else ()
+    rules = options["rules"]
+    budget = options["budget"]
+    name_filter = options["name_filter"]
+    for entry in entries:
+        if budget is not None:
+            reason = budget.exceeded()
+            if reason:
+                logger.warning("Truncating %s: %s" % (c_dir, reason))
+                c_package["truncated"] = reason
+                break
+
+        rel_path = rel_dir + entry.name
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            # broken symlink or permission issue
+            is_dir = False
 
-    for tmp_file in files:
-        c_file = c_dir + "/" + tmp_file
-        if os.path.isdir(c_file):
+        if is_ignored(rules, rel_path, is_dir):
+            continue
+
+        if is_dir:
             # -----------------------  directory  ---------------------------
-            # if in IGNORE_DIRS, skip
-            if tmp_file in IGNORE_DIRS:
+            if name_filter is not None and not name_filter.allows(
+                    c_package["name"] + "." + entry.name):
+                continue
+            if is_virtualenv(entry.path):
+                logger.debug("Skipping virtualenv %s" % entry.path)
+                continue
+
+            try:
+                st = entry.stat()
+            except OSError as e:
+                logger.warning("Unable to stat %s: %s" % (entry.path, str(e)))
+                continue
+
+            key = (st.st_dev, st.st_ino)
+            if key in visited:
+                logger.warning(
+                    "Skipping %s, directory already mapped (symlink loop?)"
+                    % entry.path)
                 continue
+            visited.add(key)
 
             # recursively run
-            c_package["subpackages"].append(
-                map_python(c_file, base_name=base_name+"."+tmp_file)
-            )
-        else:
-            # files
-            if c_file[-3:] == ".py":
-                # python module
+            subpackage = _map_dir(
+                entry.path, base_name + "." + entry.name,
+                rel_path + "/", options, visited)
+            c_package["subpackages"].append(subpackage)
+            if subpackage.get("truncated"):
+                c_package["truncated"] = subpackage["truncated"]
+                break
+
+        elif entry.name[-3:] == ".py":
+            # python module
+            if name_filter is not None and not name_filter.allows(
+                    c_package["name"] + "." + entry.name[:-3], False):
+                continue
+            c_package["modules"].append(options["parse"](
+                entry.path, base_name, single_pass=options["single_pass"]))
+
+        elif entry.name[-4:] == ".pyc" and entry.name[:-1] not in names and \
+                options["bytecode"]:
+            # compiled module without source
+            if name_filter is not None and not name_filter.allows(
+                    c_package["name"] + "." + entry.name[:-4], False):
+                continue
+            try:
                 c_package["modules"].append(
-                    parse_file(c_file, base_name))
-            else:
-                c_package["misc"].append(c_file)
+                    parser_bytecode.parse_pyc(entry.path, base_name))
+            except (ValueError, EOFError) as e:
+                logger.warning("Unable to map %s: %s" % (entry.path, str(e)))
+
+        elif options["keep_misc"]:
+            c_package["misc"].append(entry.path)
 
     return c_package
 
+
 if __name__ == "__main__":
     # --------------------------  parse commands  ---------------------------
     from argparse import ArgumentParser
     parser = ArgumentParser()
     parser.add_argument("project_dir", help="Project directory")
-    parser.add_argument("output", default="/tmp/class_diagram.wsd",
+    parser.add_argument(
+        "output", default="/tmp/class_diagram.wsd",
         help="Location to generate the class diagram")
+    parser.add_argument(
+        "--ignore", action="append", default=None,
+        help="Gitignore-style pattern to skip (repeatable)")
+    parser.add_argument(
+        "--single-pass", action="store_true",
+        help="Parse with the single pass scanner")
+    parser.add_argument(
+        "--depend", action="store_true",
+        help="Draw the dependencies found in the import statements")
+    parser.add_argument(
+        "--bytecode", action="store_true",
+        help="Map from the compiled .pyc files when possible")
+    parser.add_argument(
+        "--workers", default=1, type=int,
+        help="Processes parsing each module larger than 16 MB")
+    parser.add_argument(
+        "--wall-time", default=None, type=float,
+        help="Stop mapping after this many seconds")
+    parser.add_argument(
+        "--max-rss", default=None, type=int,
+        help="Stop mapping above this resident memory (MB)")
+    parser.add_argument(
+        "--include", action="append", default=None,
+        help="Only map names matching this glob (repeatable, re: for regex)")
+    parser.add_argument(
+        "--exclude", action="append", default=None,
+        help="Skip names matching this glob (repeatable, re: for regex)")
+    parser.add_argument(
+        "--max-depth", default=None, type=int,
+        help="Maximum depth of subpackages/modules below the project")
+    parser.add_argument(
+        "--collapse-depth", default=None, type=int,
+        help="Draw the subpackages below this depth as summary nodes")
+    parser.add_argument(
+        "--max-members", default=None, type=int,
+        help="Draw at most N members per class")
+    parser.add_argument(
+        "--hide-isolated", action="store_true",
+        help="Do not draw the classes without inheritance edges")
+    parser.add_argument(
+        "--node-budget", default=None, type=int,
+        help="Collapse the diagram to at most N packages and classes")
     args = parser.parse_args()
 
+    budget = None
+    if args.wall_time or args.max_rss:
+        from boring_stuff.projects.budget import Budget
+        budget = Budget(
+            wall_time=args.wall_time,
+            max_rss=args.max_rss * 2**20 if args.max_rss else None)
+
+    name_filter = None
+    if args.include or args.exclude or args.max_depth is not None:
+        from boring_stuff.projects.name_filter import NameFilter
+        name_filter = NameFilter(args.include, args.exclude, args.max_depth)
 
-    tmp = map_python(args.project_dir)
+    parse = None
+    if args.workers != 1 and not args.bytecode:
+        from functools import partial
+        parse = partial(parse_file, workers=args.workers)
 
+    ignore = IGNORE_DIRS + args.ignore if args.ignore else None
+    tmp = map_python(
+        args.project_dir, ignore=ignore, single_pass=args.single_pass,
+        budget=budget, name_filter=name_filter, parse=parse,
+        bytecode=args.bytecode)
 
     from boring_stuff.uml.class_diagram import write_class_diagram
-    write_class_diagram(tmp, output=args.output)
+    write_class_diagram(
+        tmp, output=args.output, draw_depend=args.depend,
+        collapse_depth=args.collapse_depth, max_members=args.max_members,
+        hide_isolated=args.hide_isolated, node_budget=args.node_budget)
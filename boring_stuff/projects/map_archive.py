@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+"""Map packages inside archives
+
+Same result as boring_stuff.projects.map.map_python on the extracted
+archive, but the members are read into memory and parsed without
+extracting anything to disk.  Wheels, eggs and zip files are read
+through their central directory, sdists (tar.gz, tar.bz2, tar.xz) as a
+stream.  Either way each archive is read in one sequential pass.
+
+The 'misc' paths are the archive path followed by the member path
+(e.g. "dist/pkg-1.0.whl/pkg/data.txt").
+
+Examples
+--------
+>>> from boring_stuff.projects.map_archive import map_archive
+>>> c_package = map_archive("dist/py_boring_stuff-0.2.1-py3-none-any.whl")
+>>> c_package = map_archive("dist/py-boring-stuff-0.2.1.tar.gz",
+...                         root="py-boring-stuff-0.2.1/boring_stuff")
+"""
+from collections import OrderedDict
+import logging
+import posixpath
+import re
+import tarfile
+import zipfile
+from boring_stuff.parser.inheritance import resolve_parents
+from boring_stuff.parser.parser_python import parse_buffer, \
+    parse_buffer_single_pass
+from boring_stuff.projects.map import IGNORE_DIRS, compile_ignore, is_ignored
+
+logger = logging.getLogger("boring_stuff.projects.map_archive")
+
+ARCHIVE_SUFFIXES = [
+    ".whl", ".egg", ".zip", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz", ".tar",
+]
+"""Extensions of the supported archives"""
+
+
+def iter_members(filename):
+    """Iterate over the members of an archive in file order
+
+    Parameters
+    ----------
+    filename : str
+        Path of a zip (wheel, egg) or tar archive
+
+    Yields
+    ------
+    member : tuple
+        (path, is_dir, read) where read() returns the content of a file
+        member.  read has to be called before the next member.
+    """
+    if zipfile.is_zipfile(filename):
+        with zipfile.ZipFile(filename) as zip_in:
+            infos = sorted(zip_in.infolist(), key=lambda i: i.header_offset)
+            for info in infos:
+                yield (info.filename.rstrip("/"), info.is_dir(),
+                       lambda info=info: zip_in.read(info))
+        return
+
+    # stream mode, no seek back to the members
+    with tarfile.open(filename, mode="r|*") as tar_in:
+        for member in tar_in:
+            if member.isdir():
+                yield member.name.rstrip("/"), True, None
+            elif member.isfile():
+                yield (member.name, False,
+                       lambda member=member: tar_in.extractfile(member).read())
+            else:
+                logger.debug("Skipping %s in %s (not a regular file)" % (
+                    member.name, filename))
+
+
+def archive_name(filename):
+    """Distribution name of an archive ("six" for six-1.17.0-py3.whl)"""
+    name = posixpath.basename(filename)
+    for suffix in ARCHIVE_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return re.split(r"-(?=\d)", name)[0]
+
+
+def find_root(paths):
+    """Guess the directory of the package in an archive
+
+    Parameters
+    ----------
+    paths : list
+        Paths of the files in the archive
+
+    Returns
+    -------
+    root : str
+        The shallowest directory with an __init__.py, if there is only
+        one, otherwise "" (the whole archive).
+    """
+    packages = set(posixpath.dirname(path) for path in paths
+                   if posixpath.basename(path) == "__init__.py")
+    tops = [package for package in packages if package and
+            posixpath.dirname(package) not in packages]
+    if not tops:
+        return ""
+    depth = min(top.count("/") for top in tops)
+    tops = [top for top in tops if top.count("/") == depth]
+    return tops[0] if len(tops) == 1 else ""
+
+
+def _ignored(rules, rel_path, is_dir):
+    """Check rel_path and its parent directories against the rules"""
+    parts = rel_path.split("/")
+    for i_part in range(1, len(parts)):
+        if is_ignored(rules, "/".join(parts[:i_part]), True):
+            return True
+    return is_ignored(rules, rel_path, is_dir)
+
+
+def _allowed(name_filter, package_name, rel_path, is_dir):
+    """Check the packages along rel_path and the member itself"""
+    parts = rel_path.split("/")
+    name = package_name
+    for part in parts[:-1]:
+        name += "." + part
+        if not name_filter.allows(name):
+            return False
+    if is_dir:
+        return name_filter.allows(name + "." + parts[-1])
+    return name_filter.allows(name + "." + parts[-1][:-3], False)
+
+
+def map_archive(filename, root=None, base_name=None, ignore=None,
+                keep_misc=True, single_pass=False, name_filter=None):
+    """Map a python package inside an archive
+
+    Parameters
+    ----------
+    filename : str
+        Path of a wheel, egg, zip or (compressed) tar archive
+
+    root : str or None
+        Directory inside the archive to map, like in_dir of map_python.
+        If None, use find_root.  The root is known before reading a zip
+        archive, so its members are parsed as they are read.  For a tar
+        archive without root, the python sources are held until the end
+        of the pass.
+
+    base_name : str or None
+        If not provided, use the root directory as the base name.
+
+    ignore, keep_misc, single_pass, name_filter
+        See boring_stuff.projects.map.map_python
+
+    Returns
+    -------
+    c_package : dict
+        The dictionary describing the package, see map_python.
+    """
+    parse = parse_buffer_single_pass if single_pass else parse_buffer
+    rules = compile_ignore(IGNORE_DIRS if ignore is None else ignore)
+    if root is None and zipfile.is_zipfile(filename):
+        with zipfile.ZipFile(filename) as zip_in:
+            root = find_root(zip_in.namelist())
+
+    # -------------------------  sequential pass  ---------------------------
+    # (rel_path, is_dir, source or parsed module) of the members
+    members = []
+    for path, is_dir, read in iter_members(filename):
+        if root is None:
+            rel_path = path
+        elif path == root:
+            continue
+        elif root and path[:len(root) + 1] != root + "/":
+            continue
+        else:
+            rel_path = path[len(root) + 1:] if root else path
+
+        content = None
+        if not is_dir and rel_path[-3:] == ".py":
+            content = read()
+            if root is not None:
+                content = _parse_member(
+                    parse, content, rel_path, root, base_name, filename,
+                    rules, name_filter)
+        members.append((rel_path, is_dir, content))
+
+    if root is None:
+        # tar archive, now the names are known
+        root = find_root([path for path, is_dir, _ in members if not is_dir])
+        c_members = []
+        for path, is_dir, content in members:
+            if root and path[:len(root) + 1] != root + "/":
+                continue
+            rel_path = path[len(root) + 1:] if root else path
+            if content is not None:
+                content = _parse_member(
+                    parse, content, rel_path, root, base_name, filename,
+                    rules, name_filter)
+            c_members.append((rel_path, is_dir, content))
+        members = c_members
+
+    if base_name is None:
+        base_name = posixpath.basename(root) if root else \
+            archive_name(filename)
+
+    # -------------------------  assemble the tree  -------------------------
+    # directory -> [subdirectories, modules, misc]
+    tree = {"": [set(), [], []]}
+
+    def add_dir(rel_dir):
+        if rel_dir not in tree:
+            tree[rel_dir] = [set(), [], []]
+            parent = posixpath.dirname(rel_dir)
+            add_dir(parent)
+            tree[parent][0].add(posixpath.basename(rel_dir))
+
+    package_name = base_name.replace("/", ".")
+    for rel_path, is_dir, content in members:
+        if _ignored(rules, rel_path, is_dir):
+            continue
+        if name_filter is not None:
+            if is_dir or rel_path[-3:] == ".py":
+                allowed = _allowed(name_filter, package_name, rel_path, is_dir)
+            else:
+                # like map_python, only the directories of misc files
+                rel_dir = posixpath.dirname(rel_path)
+                allowed = not rel_dir or _allowed(
+                    name_filter, package_name, rel_dir, True)
+            if not allowed:
+                continue
+
+        if is_dir:
+            add_dir(rel_path)
+            continue
+
+        rel_dir = posixpath.dirname(rel_path)
+        add_dir(rel_dir)
+        if rel_path[-3:] == ".py":
+            tree[rel_dir][1].append((posixpath.basename(rel_path), content))
+        elif keep_misc:
+            tree[rel_dir][2].append(posixpath.basename(rel_path))
+
+    def build(rel_dir, c_base_name):
+        subdirs, modules, misc = tree[rel_dir]
+        prefix = filename + "/" + (root + "/" if root else "") + \
+            (rel_dir + "/" if rel_dir else "")
+        return OrderedDict([
+            ["type", "package"],
+            ["name", c_base_name.replace("/", ".")],
+            ["subpackages", [
+                build(posixpath.join(rel_dir, name), c_base_name + "." + name)
+                for name in sorted(subdirs)]],
+            ["modules", [module for _, module in sorted(
+                modules, key=lambda pair: pair[0])]],
+            ["misc", [prefix + name for name in sorted(misc)]],
+        ])
+    c_package = build("", base_name)
+    resolve_parents(c_package)
+    return c_package
+
+
+def _parse_member(parse, content, rel_path, root, base_name, filename,
+                  rules, name_filter):
+    """Parse a python member, None if it is ignored or filtered"""
+    if base_name is None:
+        base_name = posixpath.basename(root) if root else \
+            archive_name(filename)
+    if _ignored(rules, rel_path, False):
+        return None
+    if name_filter is not None and not _allowed(
+            name_filter, base_name.replace("/", "."), rel_path, False):
+        return None
+
+    rel_dir = posixpath.dirname(rel_path)
+    package = base_name + ("." + rel_dir.replace("/", ".") if rel_dir else "")
+    mod_name = package + "." + posixpath.basename(rel_path)[:-3]
+    return parse(content, mod_name)
+
+
+if __name__ == "__main__":
+    # --------------------------  parse commands  ---------------------------
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    parser.add_argument("archive", help="Wheel, egg, zip or tar archive")
+    parser.add_argument(
+        "output", default="/tmp/class_diagram.wsd",
+        help="Location to generate the class diagram")
+    parser.add_argument(
+        "--root", default=None,
+        help="Directory of the package inside the archive")
+    parser.add_argument(
+        "--single-pass", action="store_true",
+        help="Parse with the single pass scanner")
+    parser.add_argument(
+        "--depend", action="store_true",
+        help="Draw the dependencies found in the import statements")
+    args = parser.parse_args()
+
+    tmp = map_archive(
+        args.archive, root=args.root, single_pass=args.single_pass)
+
+    from boring_stuff.uml.class_diagram import write_class_diagram
+    write_class_diagram(tmp, output=args.output, draw_depend=args.depend)
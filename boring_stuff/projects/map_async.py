@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+"""Asynchronous Project Mapping
+
+Same result as boring_stuff.projects.map.map_python, but directory
+listings and file reads are overlapped with bounded concurrency.  This
+helps when the project lives on a high latency filesystem (NFS, FUSE)
+where map_python waits on one open/read at a time.
+
+Examples
+--------
+>>> import asyncio
+>>> from boring_stuff.projects.map_async import map_python_async
+>>> c_package = asyncio.run(map_python_async("boring_stuff"))
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import logging
+import os
+from boring_stuff.parser.inheritance import resolve_parents
+from boring_stuff.parser.parser_python import module_name, parse_buffer, \
+    parse_buffer_single_pass
+from boring_stuff.projects.map import IGNORE_DIRS, compile_ignore, \
+    is_ignored, is_virtualenv
+
+logger = logging.getLogger("boring_stuff.projects.map_async")
+
+
+def _scan_dir(c_dir):
+    """List a directory (blocking, runs in the I/O pool)
+
+    Returns
+    -------
+    entries : list
+        Sorted list of (name, path, is_dir, key) where key is the
+        (st_dev, st_ino) of directories, None otherwise.  Virtualenvs
+        are left out (see boring_stuff.projects.map.is_virtualenv).
+    """
+    entries = []
+    with os.scandir(c_dir) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            key = None
+            if is_dir:
+                if is_virtualenv(entry.path):
+                    continue
+                try:
+                    st = entry.stat()
+                    key = (st.st_dev, st.st_ino)
+                except OSError as e:
+                    logger.warning(
+                        "Unable to stat %s: %s" % (entry.path, str(e)))
+                    continue
+            entries.append((entry.name, entry.path, is_dir, key))
+    entries.sort()
+    return entries
+
+
+def _read_file(filename):
+    """Read a file (blocking, runs in the I/O pool)"""
+    with open(filename, "rb") as file_in:
+        return file_in.read()
+
+
+async def map_python_async(in_dir, base_name=None, ignore=None,
+                           keep_misc=True, single_pass=False,
+                           concurrency=64, parse_executor=None,
+                           name_filter=None):
+    """Map a python package asynchronously
+
+    Parameters
+    ----------
+    in_dir : str
+        The input directory to scan
+
+    base_name : str or None
+        If not provided, use the directory as the base name.
+
+    ignore : list or None
+        Gitignore-style patterns to skip.  Defaults to IGNORE_DIRS.
+
+    keep_misc : bool
+        If true, record the paths of non-python files in 'misc'.
+
+    single_pass : bool
+        If true, parse modules with the single pass scanner.
+
+    concurrency : int
+        Maximum number of directory listings and file reads in flight.
+
+    parse_executor : concurrent.futures.Executor or None
+        Executor for the regex parsing.  A ProcessPoolExecutor spreads
+        the parsing over several cores.  If None, the I/O threads are
+        used.
+
+    name_filter : NameFilter or None
+        Include/exclude patterns and depth limit on the qualified names.
+
+    Returns
+    -------
+    c_package : dict
+        The dictionary describing the package, see map_python.
+    """
+    c_dir = os.path.abspath(in_dir)
+    if base_name is None:
+        base_name = c_dir[c_dir.rfind("/") + 1:]
+
+    if name_filter is not None and name_filter.root is None:
+        name_filter = name_filter.bind(base_name.replace("/", "."))
+
+    loop = asyncio.get_running_loop()
+    io_pool = ThreadPoolExecutor(max_workers=concurrency)
+    st = os.stat(c_dir)
+    state = {
+        "rules": compile_ignore(IGNORE_DIRS if ignore is None else ignore),
+        "keep_misc": keep_misc,
+        "parse": parse_buffer_single_pass if single_pass else parse_buffer,
+        "loop": loop,
+        "io_pool": io_pool,
+        "parse_pool": parse_executor or io_pool,
+        "semaphore": asyncio.Semaphore(concurrency),
+        "visited": set([(st.st_dev, st.st_ino)]),
+        "name_filter": name_filter,
+    }
+    try:
+        c_package = await _map_dir_async(c_dir, base_name, "", state)
+        resolve_parents(c_package)
+        return c_package
+    finally:
+        io_pool.shutdown(wait=False)
+
+
+async def _map_dir_async(c_dir, base_name, rel_dir, state):
+    """Map a single directory for map_python_async"""
+    c_package = OrderedDict([
+        ["type", "package"],
+        ["name", base_name.replace("/", ".")],
+        ["subpackages", []],
+        ["modules", []],
+        ["misc", []],
+    ])
+
+    async with state["semaphore"]:
+        try:
+            entries = await state["loop"].run_in_executor(
+                state["io_pool"], _scan_dir, c_dir)
+        except OSError as e:
+            logger.warning("Unable to scan %s: %s" % (c_dir, str(e)))
+            return c_package
+
+    name_filter = state["name_filter"]
+    sub_tasks = []
+    mod_tasks = []
+    for name, path, is_dir, key in entries:
+        rel_path = rel_dir + name
+        if is_ignored(state["rules"], rel_path, is_dir):
+            continue
+
+        if is_dir:
+            if name_filter is not None and not name_filter.allows(
+                    c_package["name"] + "." + name):
+                continue
+
+            # checked in the event loop, no race between tasks
+            if key in state["visited"]:
+                logger.warning(
+                    "Skipping %s, directory already mapped (symlink loop?)"
+                    % path)
+                continue
+            state["visited"].add(key)
+            sub_tasks.append(_map_dir_async(
+                path, base_name + "." + name, rel_path + "/", state))
+
+        elif name[-3:] == ".py":
+            if name_filter is not None and not name_filter.allows(
+                    c_package["name"] + "." + name[:-3], False):
+                continue
+            mod_tasks.append(_parse_async(path, base_name, state))
+
+        elif state["keep_misc"]:
+            c_package["misc"].append(path)
+
+    # gather keeps the order of the tasks
+    c_package["subpackages"] = list(await asyncio.gather(*sub_tasks))
+    c_package["modules"] = list(await asyncio.gather(*mod_tasks))
+    return c_package
+
+
+async def _parse_async(filename, base_name, state):
+    """Read a module in the I/O pool and parse it in the parse pool"""
+    async with state["semaphore"]:
+        buf = await state["loop"].run_in_executor(
+            state["io_pool"], _read_file, filename)
+
+    return await state["loop"].run_in_executor(
+        state["parse_pool"], state["parse"], buf,
+        module_name(filename, base_name))
+
+
+if __name__ == "__main__":
+    # --------------------------  parse commands  ---------------------------
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    parser.add_argument("project_dir", help="Project directory")
+    parser.add_argument(
+        "output", default="/tmp/class_diagram.wsd",
+        help="Location to generate the class diagram")
+    parser.add_argument(
+        "--concurrency", default=64, type=int,
+        help="Maximum number of reads in flight")
+    parser.add_argument(
+        "--single-pass", action="store_true",
+        help="Parse with the single pass scanner")
+    args = parser.parse_args()
+
+    tmp = asyncio.run(map_python_async(
+        args.project_dir, concurrency=args.concurrency,
+        single_pass=args.single_pass))
+
+    from boring_stuff.uml.class_diagram import write_class_diagram
+    write_class_diagram(tmp, output=args.output)
@@ -0,0 +1,527 @@
+#!/usr/bin/env python
+"""Checkpointed mapping of all the distributions of an environment
+
+map_environment maps every distribution installed in a site-packages
+directory, each in its own worker process: a distribution that
+crashes the interpreter (or hangs, see 'timeout') only fails itself.
+The result of each distribution is written to a CheckpointStore as
+soon as it is mapped, so an interrupted run started again with the
+same store resumes with the distributions not mapped yet.  Once all
+are done, build_index summarizes the store and merge_packages joins
+the maps in one package specification.
+
+The top-level packages of a distribution come from its top_level.txt,
+or else from the files listed in its RECORD.  They are mapped
+statically by default (map_python, nothing is imported); the
+'inspect' method imports them and uses map_module.
+
+Examples
+--------
+>>> from boring_stuff.projects import map_environment as ME
+>>> import sysconfig
+>>> site_dir = sysconfig.get_paths()["purelib"]
+>>> records = ME.map_environment(site_dir, "/tmp/env_map", workers=4)
+>>> store = ME.CheckpointStore("/tmp/env_map")
+>>> index = ME.build_index(store, "/tmp/env_map/index.json")
+>>> c_package = ME.merge_packages(store)
+"""
+from collections import OrderedDict
+import importlib
+import json
+import logging
+import multiprocessing
+from multiprocessing.connection import wait
+import os
+import re
+import sys
+import tempfile
+import time
+
+logger = logging.getLogger("boring_stuff.projects.map_environment")
+
+METHODS = ["static", "inspect"]
+"""How the packages of a distribution are mapped"""
+
+
+def normalize_name(name):
+    """Normalized name of a distribution (PEP 503)"""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def top_level_names(dist):
+    """Names of the top-level packages and modules of a distribution
+
+    Parameters
+    ----------
+    dist : importlib.metadata.Distribution
+        The installed distribution
+
+    Returns
+    -------
+    names : list
+        Sorted names, dotted for a namespace package listed as
+        "google/protobuf" in top_level.txt
+    """
+    text = dist.read_text("top_level.txt")
+    if text:
+        return sorted(set(
+            line.strip().replace("/", ".") for line in text.splitlines()
+            if line.strip()))
+
+    names = set()
+    for path in dist.files or []:
+        parts = path.parts
+        if not parts or parts[0] in ("..", "__pycache__") or \
+                os.path.splitext(parts[0])[1] in (
+                    ".dist-info", ".egg-info", ".data", ".pth"):
+            continue
+        if len(parts) > 1:
+            names.add(parts[0])
+        elif parts[0][-3:] == ".py" or \
+                os.path.splitext(parts[0])[1] in (".so", ".pyd"):
+            # mod.py or mod.cpython-311-x86_64-linux-gnu.so
+            names.add(parts[0].split(".")[0])
+    return sorted(names)
+
+
+def list_distributions(site_dir):
+    """Distributions installed in a directory
+
+    Parameters
+    ----------
+    site_dir : str
+        A site-packages directory
+
+    Returns
+    -------
+    dists : list
+        'name' (normalized), 'distribution' (as published), 'version'
+        and 'top_level' of each distribution, sorted by name.  A
+        distribution installed twice is listed once.
+    """
+    from importlib import metadata
+    dists = OrderedDict()
+    for dist in metadata.distributions(path=[site_dir]):
+        published = dist.metadata["Name"]
+        if not published:
+            logger.warning("Distribution without a name in %s" % site_dir)
+            continue
+        name = normalize_name(published)
+        if name in dists:
+            continue
+        dists[name] = {
+            "name": name,
+            "distribution": published,
+            "version": dist.version,
+            "top_level": top_level_names(dist),
+        }
+    return [dists[name] for name in sorted(dists)]
+
+
+class CheckpointStore(object):
+    """Directory with the record of each mapped distribution
+
+    A record is written atomically to "<name>-<version>.json", so a
+    record on disk is always complete and an upgraded distribution is
+    mapped again.  Only the record of the last version saved is kept.
+
+    Attributes
+    ----------
+    directory : str
+        Location of the records
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def path(self, dist):
+        """File of the record of a distribution"""
+        return os.path.join(self.directory, "%s-%s.json" % (
+            dist["name"], dist["version"]))
+
+    def has(self, dist):
+        """True if the distribution was mapped (or failed)"""
+        return os.path.isfile(self.path(dist))
+
+    def load(self, dist):
+        """Record of a distribution, None if missing"""
+        try:
+            with open(self.path(dist), "r") as file_in:
+                return json.load(file_in, object_pairs_hook=OrderedDict)
+        except (OSError, ValueError):
+            return None
+
+    def discard(self, dist):
+        """Remove the record of a distribution, if any"""
+        if self.has(dist):
+            os.remove(self.path(dist))
+
+    def save(self, record):
+        """Write the record of a distribution, remove its other versions"""
+        path = self.path(record)
+        f_id, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(f_id, "w") as file_out:
+                json.dump(record, file_out)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        # "<name>-" is also the prefix of other names ("foo-bar")
+        prefix = record["name"] + "-"
+        for file_name in self._file_names():
+            other = os.path.join(self.directory, file_name)
+            if file_name[:len(prefix)] != prefix or other == path:
+                continue
+            old = self._read(file_name)
+            if old is not None and old.get("name") == record["name"]:
+                logger.debug("Removing %s" % file_name)
+                os.remove(other)
+
+    def prune(self, dists):
+        """Remove the records of the distributions not in dists
+
+        Parameters
+        ----------
+        dists : list
+            The installed distributions, see list_distributions
+        """
+        kept = set(os.path.basename(self.path(dist)) for dist in dists)
+        for file_name in self._file_names():
+            if file_name not in kept:
+                logger.info("Removing %s, not installed" % file_name)
+                os.remove(os.path.join(self.directory, file_name))
+
+    def _file_names(self):
+        """File names of the records, sorted"""
+        return [file_name for file_name in sorted(os.listdir(self.directory))
+                if file_name[-5:] == ".json" and file_name != "index.json"]
+
+    def _read(self, file_name):
+        """Record stored in a file, None if it can not be read"""
+        try:
+            with open(os.path.join(self.directory, file_name), "r") as \
+                    file_in:
+                return json.load(file_in, object_pairs_hook=OrderedDict)
+        except (OSError, ValueError) as e:
+            logger.warning("Unable to read %s: %s" % (file_name, str(e)))
+            return None
+
+    def records(self):
+        """All the records, sorted by file name
+
+        The files that can not be read are skipped, map_environment
+        maps their distribution again.
+        """
+        records = []
+        for file_name in self._file_names():
+            record = self._read(file_name)
+            if record is not None:
+                records.append(record)
+        return records
+
+
+def map_distribution(dist, site_dir, method="static"):
+    """Map the top-level packages of a distribution
+
+    Parameters
+    ----------
+    dist : dict
+        Distribution from list_distributions
+
+    site_dir : str
+        The site-packages directory of the distribution
+
+    method : str
+        "static" parses the sources, "inspect" imports the packages
+        (site_dir is put first in sys.path)
+
+    Returns
+    -------
+    record : dict
+        The fields of dist, 'status' ("ok" or "failed"), 'error',
+        'seconds', 'packages' (package specifications) and the counts
+        'modules' and 'classes'
+    """
+    from boring_stuff.uml.class_diagram import subtree_counts
+    record = OrderedDict(dist)
+    record["status"] = "ok"
+    record["error"] = None
+    start = time.time()
+    packages = []
+    try:
+        for top in dist["top_level"]:
+            packages.append(_map_top_level(top, site_dir, method))
+    except Exception as e:
+        logger.error("Mapping %s failed: %s" % (dist["name"], str(e)))
+        record["status"] = "failed"
+        record["error"] = "%s: %s" % (type(e).__name__, e)
+    record["seconds"] = time.time() - start
+    counts = [subtree_counts(package) for package in packages]
+    record["modules"] = sum(count[0] for count in counts)
+    record["classes"] = sum(count[1] for count in counts)
+    record["packages"] = packages
+    return record
+
+
+def _map_top_level(top, site_dir, method):
+    """Package specification of a top-level package or module"""
+    path = os.path.join(site_dir, *top.split("."))
+    if method == "inspect":
+        from boring_stuff.projects.map_with_inspect import map_module
+        if site_dir not in sys.path:
+            sys.path.insert(0, site_dir)
+        # lean: variable types as strings, the record is saved as JSON
+        return map_module(importlib.import_module(top), lean=True)
+
+    if os.path.isdir(path):
+        from boring_stuff.projects.map import map_python
+        return map_python(path, base_name=top, single_pass=True)
+    if os.path.isfile(path + ".py"):
+        from boring_stuff.parser.parser_python import parse_file
+        return parse_file(path + ".py", single_pass=True)
+    # compiled extension or missing files
+    return OrderedDict([
+        ["type", "module"],
+        ["name", top],
+        ["skipped", "no source"],
+    ])
+
+
+def _run_worker(dist, site_dir, method, directory):
+    """Map a distribution and save its record, in a worker process"""
+    CheckpointStore(directory).save(
+        map_distribution(dist, site_dir, method))
+
+
+def _failed_record(dist, error, seconds):
+    record = OrderedDict(dist)
+    record.update([
+        ["status", "failed"], ["error", error], ["seconds", seconds],
+        ["modules", 0], ["classes", 0], ["packages", []]])
+    return record
+
+
+def map_environment(site_dir, checkpoint_dir, workers=1, method="static",
+                    timeout=None, names=None, retry_failed=False):
+    """Map the distributions of a site-packages directory
+
+    Parameters
+    ----------
+    site_dir : str
+        The site-packages directory
+
+    checkpoint_dir : str
+        Directory of the CheckpointStore.  The distributions already in
+        the store are not mapped again.  Without names, the records of
+        the distributions no longer installed are removed.
+
+    workers : int
+        Number of worker processes running at once.  Each distribution
+        is mapped in a new process.
+
+    method : str
+        "static" or "inspect", see map_distribution
+
+    timeout : float or None
+        Seconds after which a worker is killed and its distribution
+        failed
+
+    names : list or None
+        If provided, map only these distributions (any spelling of the
+        names)
+
+    retry_failed : bool
+        If true, map again the distributions that failed in a previous
+        run
+
+    Returns
+    -------
+    records : list
+        Status records of the distributions mapped by this call: the
+        fields of the stored record without 'packages'
+    """
+    if method not in METHODS:
+        raise ValueError("method should be one of %s" % METHODS)
+    store = CheckpointStore(checkpoint_dir)
+    dists = list_distributions(site_dir)
+    if names is not None:
+        wanted = set(normalize_name(name) for name in names)
+        dists = [dist for dist in dists if dist["name"] in wanted]
+
+    if names is None:
+        store.prune(dists)
+
+    pending = []
+    for dist in dists:
+        # missing or unreadable records are mapped (again)
+        record = store.load(dist)
+        if record is not None and (
+                not retry_failed or record["status"] == "ok"):
+            continue
+        pending.append(dist)
+    logger.info("%d distributions, %d left to map" % (
+        len(dists), len(pending)))
+
+    records = []
+    running = {}
+    while pending or running:
+        while pending and len(running) < max(workers, 1):
+            dist = pending.pop(0)
+            store.discard(dist)
+            process = multiprocessing.Process(
+                target=_run_worker,
+                args=(dist, site_dir, method, checkpoint_dir))
+            process.start()
+            running[process.sentinel] = (process, dist, time.time())
+
+        wait(list(running), timeout=1.0 if timeout else None)
+        for sentinel, (process, dist, start) in list(running.items()):
+            seconds = time.time() - start
+            error = None
+            if process.exitcode is None:
+                if timeout is None or seconds < timeout:
+                    continue
+                logger.warning("Killing the worker of %s after %.1f s" % (
+                    dist["name"], seconds))
+                process.kill()
+                error = "worker timed out after %.1f s" % seconds
+            process.join()
+            del running[sentinel]
+
+            record = store.load(dist)
+            if record is None:
+                # crashed or killed before saving
+                record = _failed_record(
+                    dist, error or "worker exited with code %d" %
+                    process.exitcode, seconds)
+                store.save(record)
+            del record["packages"]
+            records.append(record)
+            logger.info("%s %s: %s (%d/%d)" % (
+                dist["name"], dist["version"], record["status"],
+                len(records), len(records) + len(running) + len(pending)))
+    return records
+
+
+def build_index(store, output=None):
+    """Summary of all the records of a store
+
+    Parameters
+    ----------
+    store : CheckpointStore
+        The store of map_environment
+
+    output : str or None
+        If provided, write the index to this JSON file
+
+    Returns
+    -------
+    index : dict
+        'distributions': the records without 'packages', 'owners': the
+        distribution of each top-level name and 'failed': the names of
+        the failed distributions
+    """
+    index = OrderedDict([
+        ["distributions", []],
+        ["owners", OrderedDict()],
+        ["failed", []],
+    ])
+    for record in store.records():
+        packages = record.pop("packages", [])
+        index["distributions"].append(record)
+        if record["status"] != "ok":
+            index["failed"].append(record["name"])
+        for package in packages:
+            index["owners"].setdefault(package["name"], record["name"])
+    if output:
+        with open(output, "w") as file_out:
+            json.dump(index, file_out, indent=1)
+    return index
+
+
+def merge_packages(store, name="site-packages"):
+    """One package specification with the maps of all the records
+
+    The top-level packages are the subpackages of the merged package
+    and the top-level modules its modules, sorted by name.  A name
+    provided by several distributions is kept once.
+    """
+    merged = OrderedDict([
+        ["type", "package"],
+        ["name", name],
+        ["subpackages", []],
+        ["modules", []],
+        ["misc", []],
+    ])
+    seen = set()
+    for record in store.records():
+        for package in record.get("packages", []):
+            if package["name"] in seen:
+                logger.debug("%s of %s is already mapped" % (
+                    package["name"], record["name"]))
+                continue
+            seen.add(package["name"])
+            key = "subpackages" if package["type"] == "package" else \
+                "modules"
+            merged[key].append(package)
+    merged["subpackages"].sort(key=lambda spec: spec["name"])
+    merged["modules"].sort(key=lambda spec: spec["name"])
+    return merged
+
+
+if __name__ == "__main__":
+    # --------------------------  parse commands  ---------------------------
+    from argparse import ArgumentParser
+    import sysconfig
+    parser = ArgumentParser()
+    parser.add_argument(
+        "checkpoint_dir", help="Directory of the per-distribution records")
+    parser.add_argument(
+        "--site-dir", default=sysconfig.get_paths()["purelib"],
+        help="site-packages directory to map")
+    parser.add_argument(
+        "--workers", default=1, type=int,
+        help="Number of worker processes (-1=one per core)")
+    parser.add_argument(
+        "--method", default="static", choices=METHODS,
+        help="static: parse the sources, inspect: import the packages")
+    parser.add_argument(
+        "--timeout", default=None, type=float,
+        help="Seconds before a worker is killed")
+    parser.add_argument(
+        "--only", nargs="*", default=None,
+        help="Names of the distributions to map")
+    parser.add_argument(
+        "--retry-failed", action="store_true",
+        help="Map again the distributions that failed")
+    parser.add_argument(
+        "--index", default="",
+        help="Write the index of the store to this file")
+    parser.add_argument(
+        "--output", default="",
+        help="Location to generate the merged class diagram")
+    args = parser.parse_args()
+
+    start = time.time()
+    records = map_environment(
+        args.site_dir, args.checkpoint_dir,
+        workers=(os.cpu_count() or 1) if args.workers < 0 else args.workers,
+        method=args.method, timeout=args.timeout, names=args.only,
+        retry_failed=args.retry_failed)
+    n_failed = len([record for record in records
+                    if record["status"] != "ok"])
+    print("%d distributions mapped, %d failed, %.1f s" % (
+        len(records), n_failed, time.time() - start))
+
+    store = CheckpointStore(args.checkpoint_dir)
+    if args.index:
+        build_index(store, args.index)
+    if args.output:
+        from boring_stuff.uml.renderers import render
+        render(merge_packages(store), args.output)
@@ -0,0 +1,384 @@
+#!/usr/bin/env python
+"""Incremental mapping of the files changed since a git commit
+
+A pull request usually touches a handful of files.  Instead of mapping
+the whole tree with boring_stuff.projects.map.map_python, update_map
+asks the local git repository (the git command line, no network)
+which files differ between a base commit and the working tree,
+parses only those and splices them into a map of the base saved
+with save_map.  The time is proportional to the number of changed
+files, not to the size of the tree.
+
+update_map also returns a delta: a package specification holding only
+the changed modules, to draw what a change touches.  Removed modules
+are in the delta as 'skipped' nodes.
+
+Untracked files (not ignored by git) count as added.
+
+Examples
+--------
+On the base commit (e.g. main in CI), map once and save
+
+>>> from boring_stuff.projects.map import map_python
+>>> from boring_stuff.projects import map_git
+>>> c_package = map_python("boring_stuff")
+>>> map_git.save_map(c_package, "/tmp/base_map.json",
+...                  commit=map_git.resolve_commit("boring_stuff"))
+
+On the working tree of the pull request
+
+>>> c_package, commit = map_git.load_map("/tmp/base_map.json")
+>>> c_package, delta = map_git.update_map(c_package, "boring_stuff", commit)
+>>> from boring_stuff.uml.class_diagram import write_class_diagram
+>>> write_class_diagram(delta, "/tmp/delta.wsd")
+"""
+from collections import OrderedDict
+import json
+import logging
+import os
+import subprocess
+from boring_stuff.parser.inheritance import resolve_parents
+from boring_stuff.projects.map import IGNORE_DIRS, compile_ignore, is_ignored
+
+logger = logging.getLogger("boring_stuff.projects.map_git")
+
+
+class GitError(Exception):
+    """Raised when a git command fails"""
+    pass
+
+
+def run_git(repo_dir, args):
+    """Run a git command in repo_dir
+
+    Parameters
+    ----------
+    repo_dir : str
+        Directory inside the repository
+
+    args : list
+        Arguments of git, like ["rev-parse", "HEAD"]
+
+    Returns
+    -------
+    output : str
+        Standard output of the command
+
+    Raises
+    ------
+    GitError
+        If git is missing or the command fails
+    """
+    try:
+        proc = subprocess.run(
+            ["git", "-C", repo_dir] + args, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE)
+    except OSError as e:
+        raise GitError("Unable to run git: %s" % str(e))
+    if proc.returncode != 0:
+        raise GitError("git %s failed: %s" % (
+            " ".join(args), os.fsdecode(proc.stderr).strip()))
+    return os.fsdecode(proc.stdout)
+
+
+def resolve_commit(repo_dir, ref="HEAD"):
+    """Commit id (SHA) of a ref, like HEAD, main or origin/main~2"""
+    return run_git(
+        repo_dir, ["rev-parse", "--verify", ref + "^{commit}"]).strip()
+
+
+def changed_files(in_dir, base_ref):
+    """Files of in_dir changed between base_ref and the working tree
+
+    Parameters
+    ----------
+    in_dir : str
+        Directory inside a git repository
+
+    base_ref : str
+        Commit, branch or tag to compare to
+
+    Returns
+    -------
+    changes : list
+        (status, path) with status "A" (added), "M" (modified) or "D"
+        (deleted) and path relative to in_dir, "/" separated.  A
+        renamed file is deleted then added.
+    """
+    c_dir = os.path.realpath(in_dir)
+    top = os.path.realpath(
+        run_git(c_dir, ["rev-parse", "--show-toplevel"]).strip())
+    prefix = os.path.relpath(c_dir, top).replace(os.sep, "/")
+    prefix = "" if prefix == "." else prefix + "/"
+
+    changes = []
+    fields = run_git(
+        top, ["diff", "--name-status", "-z", "-M", "--no-ext-diff", base_ref,
+              "--", prefix or "."]).split("\0")
+    i_field = 0
+    while i_field < len(fields) - 1:
+        status = fields[i_field][0]
+        if status in "RC":
+            old_path, path = fields[i_field + 1:i_field + 3]
+            i_field += 3
+            if status == "R":
+                changes.append(("D", old_path))
+            changes.append(("A", path))
+            continue
+        path = fields[i_field + 1]
+        i_field += 2
+        changes.append(("M" if status == "T" else status, path))
+
+    for path in run_git(
+            top, ["ls-files", "--others", "--exclude-standard", "-z", "--",
+                  prefix or "."]).split("\0"):
+        if path:
+            changes.append(("A", path))
+
+    return [(status, path[len(prefix):]) for status, path in changes
+            if path[:len(prefix)] == prefix and status in "AMD"]
+
+
+def save_map(c_package, filename, commit=None):
+    """Save a map (from map_python) and the commit it was made on
+
+    Parameters
+    ----------
+    c_package : dict
+        Package specification
+
+    filename : str
+        JSON file to write
+
+    commit : str or None
+        Commit of the mapped tree, see resolve_commit
+    """
+    with open(filename, "w") as file_out:
+        json.dump({"commit": commit, "package": c_package}, file_out)
+
+
+def load_map(filename):
+    """Load a map saved by save_map
+
+    Returns
+    -------
+    c_package : dict
+        Package specification, ordered like map_python
+
+    commit : str or None
+        Commit of the map
+    """
+    with open(filename, "r") as file_in:
+        saved = json.load(file_in, object_pairs_hook=OrderedDict)
+    return saved["package"], saved.get("commit")
+
+
+def _new_package(name):
+    return OrderedDict([
+        ["type", "package"],
+        ["name", name],
+        ["subpackages", []],
+        ["modules", []],
+        ["misc", []],
+    ])
+
+
+def _insert(specs, spec):
+    """Insert or replace spec by name, keeping specs sorted by name"""
+    for i_spec, c_spec in enumerate(specs):
+        if c_spec["name"] == spec["name"]:
+            specs[i_spec] = spec
+            return
+        if c_spec["name"] > spec["name"]:
+            specs.insert(i_spec, spec)
+            return
+    specs.append(spec)
+
+
+def _find_package(c_package, dirs, create):
+    """Subpackage of c_package for the directories dirs
+
+    Returns
+    -------
+    packages : list
+        Packages from c_package down to the subpackage, shorter if a
+        directory is not mapped and create is false
+    """
+    packages = [c_package]
+    for name in dirs:
+        sub_name = packages[-1]["name"] + "." + name
+        for subpackage in packages[-1]["subpackages"]:
+            if subpackage["name"] == sub_name:
+                break
+        else:
+            if not create:
+                return packages
+            subpackage = _new_package(sub_name)
+            _insert(packages[-1]["subpackages"], subpackage)
+        packages.append(subpackage)
+    return packages
+
+
+def _skip(rules, name_filter, package_name, rel_path):
+    """True if map_python would not map rel_path"""
+    parts = rel_path.split("/")
+    name = package_name
+    for i_part in range(len(parts) - 1):
+        name += "." + parts[i_part]
+        if is_ignored(rules, "/".join(parts[:i_part + 1]), True):
+            return True
+        if name_filter is not None and not name_filter.allows(name):
+            return True
+    if is_ignored(rules, rel_path, False):
+        return True
+    if name_filter is not None and parts[-1][-3:] == ".py":
+        return not name_filter.allows(name + "." + parts[-1][:-3], False)
+    return False
+
+
+def update_map(c_package, in_dir, base_ref, ignore=None, keep_misc=True,
+               single_pass=False, name_filter=None, parse=None):
+    """Update the map of base_ref with the changes of the working tree
+
+    Parameters
+    ----------
+    c_package : dict
+        Map of in_dir at base_ref, see load_map.  It is updated in
+        place.
+
+    in_dir : str
+        The mapped directory, inside a git repository
+
+    base_ref : str
+        Commit of c_package, see changed_files
+
+    ignore, keep_misc, single_pass, name_filter, parse
+        See boring_stuff.projects.map.map_python, should be the ones
+        used to map the base.
+
+    Returns
+    -------
+    c_package : dict
+        The updated map
+
+    delta : dict
+        Package specification with the same tree, limited to the
+        changed modules.  Deleted modules are 'skipped'.
+    """
+    if parse is None:
+        from boring_stuff.parser.parser_python import parse_file
+        parse = parse_file
+    c_dir = os.path.abspath(in_dir)
+    rules = compile_ignore(IGNORE_DIRS if ignore is None else ignore)
+    if name_filter is not None and name_filter.root is None:
+        name_filter = name_filter.bind(c_package["name"])
+
+    delta = _new_package(c_package["name"])
+    changes = changed_files(c_dir, base_ref)
+    logger.info("%d files changed since %s" % (len(changes), base_ref))
+    for status, rel_path in changes:
+        if _skip(rules, name_filter, c_package["name"], rel_path):
+            continue
+        dirs = rel_path.split("/")[:-1]
+        file_name = rel_path.split("/")[-1]
+        path = os.path.join(c_dir, *rel_path.split("/"))
+        exists = status != "D" and os.path.isfile(path)
+        packages = _find_package(c_package, dirs, exists)
+        package_name = ".".join([c_package["name"]] + dirs)
+
+        if file_name[-3:] == ".py":
+            mod_name = package_name + "." + file_name[:-3]
+            if exists:
+                logger.debug("Parsing %s" % path)
+                module = parse(path, package_name, single_pass=single_pass)
+            else:
+                module = OrderedDict([
+                    ["type", "module"],
+                    ["name", mod_name],
+                    ["skipped", "removed"],
+                ])
+            _insert(_find_package(delta, dirs, True)[-1]["modules"], module)
+
+        if len(packages) <= len(dirs):
+            # directory not mapped (or already dropped)
+            continue
+        package = packages[-1]
+
+        if file_name[-3:] == ".py":
+            package["modules"] = [
+                c_module for c_module in package["modules"]
+                if c_module["name"] != mod_name]
+            if exists:
+                _insert(package["modules"], module)
+
+        elif keep_misc:
+            package["misc"] = [misc for misc in package["misc"]
+                               if misc != path]
+            if exists:
+                package["misc"].append(path)
+                package["misc"].sort()
+
+        if not exists:
+            # drop the directories removed with the file
+            for i_dir in range(len(dirs), 0, -1):
+                if os.path.isdir(os.path.join(c_dir, *dirs[:i_dir])):
+                    break
+                packages[i_dir - 1]["subpackages"].remove(packages[i_dir])
+
+    # a changed module can change the parents of the others
+    if changes:
+        resolve_parents(c_package)
+    return c_package, delta
+
+
+if __name__ == "__main__":
+    # --------------------------  parse commands  ---------------------------
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    parser.add_argument(
+        "action", choices=["save", "update"],
+        help="save: map the tree and save it, update: apply the changes "
+        "since the saved commit")
+    parser.add_argument("project_dir", help="Project directory")
+    parser.add_argument("map_file", help="Saved map (JSON)")
+    parser.add_argument(
+        "--base", default=None,
+        help="Base ref (save: default HEAD, update: default saved commit)")
+    parser.add_argument(
+        "--output", default="",
+        help="Diagram of the updated map (update only)")
+    parser.add_argument(
+        "--delta", default="",
+        help="Diagram of the changed modules (update only)")
+    parser.add_argument(
+        "--save-updated", default="",
+        help="Save the updated map to this file (update only)")
+    parser.add_argument(
+        "--single-pass", action="store_true",
+        help="Parse with the single pass scanner")
+    parser.add_argument(
+        "--depend", action="store_true",
+        help="Draw the dependencies found in the import statements")
+    args = parser.parse_args()
+
+    if args.action == "save":
+        from boring_stuff.projects.map import map_python
+        save_map(
+            map_python(args.project_dir, single_pass=args.single_pass),
+            args.map_file,
+            commit=resolve_commit(args.project_dir, args.base or "HEAD"))
+    else:
+        from boring_stuff.uml.renderers import render
+        c_package, commit = load_map(args.map_file)
+        base = args.base or commit
+        if base is None:
+            parser.error("No commit saved in %s, give --base" % args.map_file)
+        c_package, delta = update_map(
+            c_package, args.project_dir, base, single_pass=args.single_pass)
+        if args.save_updated:
+            # map of the working tree, not of a commit
+            save_map(c_package, args.save_updated)
+        if args.output:
+            render(c_package, args.output, draw_depend=args.depend)
+        if args.delta:
+            render(delta, args.delta, draw_depend=args.depend)
@@ -0,0 +1,527 @@
+#!/usr/bin/env python
+"""History of project maps in a SQLite database
+
+MapHistory stores the maps of map_python and map_module as rows
+instead of nested dicts, one snapshot per (project, release).  A
+question about the history is then one SQL query on indexed columns,
+without loading any tree:
+
+* first_appearance: the first release defining a function or method
+* subclasses: the classes extending a class in a release
+
+Tables
+------
+snapshots
+    id, project, release and created (time, orders the releases)
+modules
+    packages and modules of a snapshot: id, snapshot_id, parent_id
+    (enclosing package), name, kind ("package" or "module") and
+    skipped
+classes
+    id, snapshot_id, module_id, name and qualname (module name +
+    "." + name)
+bases
+    class_id, snapshot_id, position, base (as written) and
+    base_qualname (resolved with boring_stuff.parser.inheritance,
+    NULL outside the project)
+functions
+    id, snapshot_id, module_id, class_id (NULL for a module function),
+    name, kind ("function", "method", "staticmethod" or "classmethod")
+    and access
+params
+    function_id, position, name and kind ("param", "var" for *args or
+    "varkw" for **kwargs)
+dependencies
+    snapshot_id, module_id and dependency (imported module)
+
+Examples
+--------
+>>> from boring_stuff.projects.map import map_python
+>>> from boring_stuff.projects.map_history import MapHistory
+>>> history = MapHistory("/tmp/maps.sqlite")
+>>> history.save(map_python("boring_stuff"), "boring_stuff", "0.2")
+>>> history.first_appearance("boring_stuff", "write_svg")
+>>> history.subclasses("boring_stuff", "0.2", "object")
+
+Any other question is a query on the tables
+
+>>> history.query(
+...     "SELECT s.release, COUNT(*) FROM classes c JOIN snapshots s "
+...     "ON s.id = c.snapshot_id GROUP BY s.id")
+"""
+from collections import OrderedDict
+import logging
+import sqlite3
+import time
+from boring_stuff.parser.inheritance import ClassIndex
+
+logger = logging.getLogger("boring_stuff.projects.map_history")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    release TEXT NOT NULL,
+    created REAL NOT NULL,
+    UNIQUE (project, release)
+);
+CREATE TABLE IF NOT EXISTS modules (
+    id INTEGER PRIMARY KEY,
+    snapshot_id INTEGER NOT NULL,
+    parent_id INTEGER,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    skipped TEXT
+);
+CREATE TABLE IF NOT EXISTS classes (
+    id INTEGER PRIMARY KEY,
+    snapshot_id INTEGER NOT NULL,
+    module_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    qualname TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bases (
+    class_id INTEGER NOT NULL,
+    snapshot_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    base TEXT NOT NULL,
+    base_qualname TEXT
+);
+CREATE TABLE IF NOT EXISTS functions (
+    id INTEGER PRIMARY KEY,
+    snapshot_id INTEGER NOT NULL,
+    module_id INTEGER NOT NULL,
+    class_id INTEGER,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    access TEXT
+);
+CREATE TABLE IF NOT EXISTS params (
+    function_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dependencies (
+    snapshot_id INTEGER NOT NULL,
+    module_id INTEGER NOT NULL,
+    dependency TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS modules_snapshot ON modules (snapshot_id, name);
+CREATE INDEX IF NOT EXISTS modules_name ON modules (name);
+CREATE INDEX IF NOT EXISTS classes_snapshot ON classes (snapshot_id, qualname);
+CREATE INDEX IF NOT EXISTS classes_name ON classes (name, snapshot_id);
+CREATE INDEX IF NOT EXISTS bases_class ON bases (class_id);
+CREATE INDEX IF NOT EXISTS bases_qualname ON bases (
+    snapshot_id, base_qualname, class_id);
+CREATE INDEX IF NOT EXISTS bases_base ON bases (
+    snapshot_id, base, class_id);
+CREATE INDEX IF NOT EXISTS functions_name ON functions (name, snapshot_id);
+CREATE INDEX IF NOT EXISTS functions_snapshot ON functions (snapshot_id);
+CREATE INDEX IF NOT EXISTS params_function ON params (function_id);
+CREATE INDEX IF NOT EXISTS dependencies_snapshot ON dependencies (
+    snapshot_id, dependency);
+CREATE INDEX IF NOT EXISTS dependencies_name ON dependencies (dependency);
+"""
+"""Tables and indexes, see the module documentation"""
+
+_FUNCTION_KINDS = [
+    ("methods", "method"),
+    ("staticmethods", "staticmethod"),
+    ("classmethods", "classmethod"),
+]
+"""Lists of a class spec and the kind of their functions"""
+
+
+class MapHistory(object):
+    """Snapshots of project maps in a SQLite database
+
+    Parameters
+    ----------
+    filename : str
+        Database file, created if missing (":memory:" for a temporary
+        one)
+
+    Attributes
+    ----------
+    connection : sqlite3.Connection
+        Connection in autocommit mode, save and delete open their own
+        transaction
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename, isolation_level=None)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        """Close the connection"""
+        self.connection.close()
+
+    def query(self, sql, params=()):
+        """Rows of a SQL query on the tables"""
+        return self.connection.execute(sql, params).fetchall()
+
+    def snapshot_id(self, project, release):
+        """Id of a snapshot, None if missing"""
+        row = self.connection.execute(
+            "SELECT id FROM snapshots WHERE project = ? AND release = ?",
+            (project, release)).fetchone()
+        return None if row is None else row[0]
+
+    def releases(self, project):
+        """(release, created) of the snapshots of a project, oldest first"""
+        return self.query(
+            "SELECT release, created FROM snapshots WHERE project = ? "
+            "ORDER BY created, id", (project,))
+
+    def save(self, c_package, project, release, created=None):
+        """Store the map of a release, replacing a previous one
+
+        Parameters
+        ----------
+        c_package : dict
+            Package specification from map_python or map_module
+
+        project : str
+            Name of the project
+
+        release : str
+            Name of the release (version, tag or commit)
+
+        created : float or None
+            Time of the release, orders the releases.  Default now.
+
+        Returns
+        -------
+        snapshot_id : int
+            Id of the new snapshot
+        """
+        start = time.time()
+        index = ClassIndex(c_package)
+        cursor = self.connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            self._delete(cursor, project, release)
+            cursor.execute(
+                "INSERT INTO snapshots (project, release, created) "
+                "VALUES (?, ?, ?)",
+                (project, release, time.time() if created is None
+                 else created))
+            snapshot_id = cursor.lastrowid
+            rows = self._rows(c_package, snapshot_id, index, cursor)
+            for table, columns in [
+                    ("modules", 6), ("classes", 5), ("bases", 5),
+                    ("functions", 7), ("params", 4), ("dependencies", 3)]:
+                cursor.executemany(
+                    "INSERT INTO %s VALUES (%s)" % (
+                        table, ", ".join(["?"] * columns)), rows[table])
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        logger.info("Saved %s %s: %d modules, %d classes, %d functions "
+                    "in %.3f s" % (
+                        project, release, len(rows["modules"]),
+                        len(rows["classes"]), len(rows["functions"]),
+                        time.time() - start))
+        return snapshot_id
+
+    def _rows(self, c_package, snapshot_id, index, cursor):
+        """Rows of each table for a package, with new ids"""
+        next_id = {}
+        for table in ["modules", "classes", "functions"]:
+            next_id[table] = cursor.execute(
+                "SELECT COALESCE(MAX(id), 0) + 1 FROM %s" % table
+            ).fetchone()[0]
+        rows = dict((table, []) for table in [
+            "modules", "classes", "bases", "functions", "params",
+            "dependencies"])
+
+        def add_function(func_spec, module_id, class_id, kind):
+            function_id = next_id["functions"]
+            next_id["functions"] += 1
+            rows["functions"].append((
+                function_id, snapshot_id, module_id, class_id,
+                func_spec["name"], kind, func_spec.get("access")))
+            params = [(name, "param") for name in func_spec.get("params")
+                      or []]
+            for key, p_kind in [("var_params", "var"),
+                                ("varkw_params", "varkw")]:
+                if func_spec.get(key):
+                    params.append((func_spec[key], p_kind))
+            for position, (name, p_kind) in enumerate(params):
+                rows["params"].append((function_id, position, name, p_kind))
+
+        # depth first, children in order so the ids keep the order
+        to_visit = [(c_package, None)]
+        while to_visit:
+            spec, parent_id = to_visit.pop()
+            module_id = next_id["modules"]
+            next_id["modules"] += 1
+            rows["modules"].append((
+                module_id, snapshot_id, parent_id, spec["name"],
+                "package" if spec.get("type") == "package" else "module",
+                spec.get("skipped")))
+            to_visit.extend(reversed([
+                (child, module_id) for child in
+                spec.get("subpackages", []) + spec.get("modules", [])]))
+
+            for _, dependency in spec.get("dependencies", []):
+                rows["dependencies"].append(
+                    (snapshot_id, module_id, dependency))
+            for func_spec in spec.get("methods", []):
+                add_function(func_spec, module_id, None, "function")
+
+            for class_spec in spec.get("class_list", []):
+                class_id = next_id["classes"]
+                next_id["classes"] += 1
+                rows["classes"].append((
+                    class_id, snapshot_id, module_id, class_spec["name"],
+                    spec["name"] + "." + class_spec["name"]))
+
+                parent_list = class_spec.get("parent") or []
+                parent_ids = class_spec.get("parent_ids")
+                if parent_ids is None:
+                    parent_ids = index.parent_ids(spec["name"], class_spec)
+                for position, (base, base_id) in enumerate(zip(
+                        parent_list,
+                        parent_ids or [None] * len(parent_list))):
+                    rows["bases"].append(
+                        (class_id, snapshot_id, position, base, base_id))
+
+                for key, kind in _FUNCTION_KINDS:
+                    for func_spec in class_spec.get(key, []):
+                        add_function(func_spec, module_id, class_id, kind)
+        return rows
+
+    def delete(self, project, release):
+        """Remove the snapshot of a release"""
+        cursor = self.connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            self._delete(cursor, project, release)
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+
+    def _delete(self, cursor, project, release):
+        snapshot_id = self.snapshot_id(project, release)
+        if snapshot_id is None:
+            return
+        cursor.execute(
+            "DELETE FROM params WHERE function_id IN "
+            "(SELECT id FROM functions WHERE snapshot_id = ?)",
+            (snapshot_id,))
+        for table in ["bases", "functions", "classes", "dependencies",
+                      "modules"]:
+            cursor.execute(
+                "DELETE FROM %s WHERE snapshot_id = ?" % table,
+                (snapshot_id,))
+        cursor.execute("DELETE FROM snapshots WHERE id = ?", (snapshot_id,))
+
+    def first_appearance(self, project, name, class_name=None):
+        """First release of a project defining a function or method
+
+        Parameters
+        ----------
+        project : str
+            Name of the project
+
+        name : str
+            Name of the function or method
+
+        class_name : str or None
+            If provided, only the methods of the classes with this name
+
+        Returns
+        -------
+        release : str or None
+            The oldest release, None if never defined
+        """
+        if class_name is None:
+            row = self.connection.execute(
+                "SELECT s.release FROM functions f "
+                "JOIN snapshots s ON s.id = f.snapshot_id "
+                "WHERE f.name = ? AND s.project = ? "
+                "ORDER BY s.created, s.id LIMIT 1", (name, project)
+            ).fetchone()
+        else:
+            row = self.connection.execute(
+                "SELECT s.release FROM functions f "
+                "JOIN classes c ON c.id = f.class_id "
+                "JOIN snapshots s ON s.id = f.snapshot_id "
+                "WHERE f.name = ? AND c.name = ? AND s.project = ? "
+                "ORDER BY s.created, s.id LIMIT 1",
+                (name, class_name, project)).fetchone()
+        return None if row is None else row[0]
+
+    def subclasses(self, project, release, base):
+        """Classes of a release extending a class
+
+        Parameters
+        ----------
+        project, release : str
+            The snapshot
+
+        base : str
+            Qualified name of the class (as resolved, see
+            boring_stuff.parser.inheritance) or the base as written
+            in the class statements, like "ValueError"
+
+        Returns
+        -------
+        qualnames : list
+            Qualified names of the direct subclasses, sorted
+        """
+        return [row[0] for row in self.connection.execute(
+            "SELECT qualname FROM classes WHERE id IN ("
+            "SELECT class_id FROM bases WHERE snapshot_id = :snapshot "
+            "AND base_qualname = :base UNION "
+            "SELECT class_id FROM bases WHERE snapshot_id = :snapshot "
+            "AND base = :base) ORDER BY qualname", {
+                "snapshot": self.snapshot_id(project, release),
+                "base": base})]
+
+    def load(self, project, release):
+        """Package specification of a snapshot
+
+        The packages, modules, classes (with their bases as a list),
+        functions and dependencies are restored.  The variables,
+        attributes and the fields not stored are not.
+
+        Returns
+        -------
+        c_package : dict or None
+            The map, None if the snapshot is missing
+        """
+        snapshot_id = self.snapshot_id(project, release)
+        if snapshot_id is None:
+            return None
+        specs = OrderedDict()
+        root = None
+        for module_id, parent_id, name, kind, skipped in self.query(
+                "SELECT id, parent_id, name, kind, skipped FROM modules "
+                "WHERE snapshot_id = ? ORDER BY id", (snapshot_id,)):
+            spec = OrderedDict([["type", kind], ["name", name]])
+            if skipped is not None:
+                spec["skipped"] = skipped
+            elif kind == "package":
+                spec.update([["subpackages", []], ["modules", []],
+                             ["misc", []]])
+            else:
+                spec.update([["class_list", []], ["methods", []],
+                             ["dependencies", []]])
+            specs[module_id] = spec
+            if parent_id is None:
+                root = spec
+                continue
+            parent = specs[parent_id]
+            if "modules" not in parent:
+                # module with submodules, map_module of a package whose
+                # __init__ defines members
+                parent["subpackages"] = []
+                parent["modules"] = []
+            parent["subpackages" if kind == "package" else "modules"].append(
+                spec)
+
+        for module_id, dependency in self.query(
+                "SELECT module_id, dependency FROM dependencies "
+                "WHERE snapshot_id = ? ORDER BY rowid", (snapshot_id,)):
+            spec = specs[module_id]
+            spec.setdefault("dependencies", []).append(
+                [spec["name"], dependency])
+
+        classes = {}
+        for class_id, module_id, name in self.query(
+                "SELECT id, module_id, name FROM classes "
+                "WHERE snapshot_id = ? ORDER BY id", (snapshot_id,)):
+            classes[class_id] = OrderedDict([
+                ["type", "class"], ["name", name], ["parent", None],
+                ["attributes", []], ["methods", []],
+                ["classmethods", []], ["staticmethods", []]])
+            specs[module_id].setdefault("class_list", []).append(
+                classes[class_id])
+        for class_id, base in self.query(
+                "SELECT class_id, base FROM bases "
+                "WHERE snapshot_id = ? ORDER BY class_id, position",
+                (snapshot_id,)):
+            if classes[class_id]["parent"] is None:
+                classes[class_id]["parent"] = []
+            classes[class_id]["parent"].append(base)
+
+        functions = {}
+        for function_id, module_id, class_id, name, kind, access in \
+                self.query(
+                    "SELECT id, module_id, class_id, name, kind, access "
+                    "FROM functions WHERE snapshot_id = ? ORDER BY id",
+                    (snapshot_id,)):
+            func_spec = OrderedDict([
+                ["type", "function"], ["name", name], ["access", access],
+                ["params", []]])
+            functions[function_id] = func_spec
+            if class_id is None:
+                specs[module_id].setdefault("methods", []).append(func_spec)
+            else:
+                classes[class_id][kind + "s"].append(func_spec)
+        for function_id, name, kind in self.query(
+                "SELECT p.function_id, p.name, p.kind FROM params p "
+                "JOIN functions f ON f.id = p.function_id "
+                "WHERE f.snapshot_id = ? ORDER BY p.function_id, p.position",
+                (snapshot_id,)):
+            if kind == "param":
+                functions[function_id]["params"].append(name)
+            else:
+                functions[function_id][kind + "_params"] = name
+        return root
+
+
+if __name__ == "__main__":
+    # --------------------------  parse commands  ---------------------------
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    parser.add_argument("database", help="SQLite file of the history")
+    parser.add_argument("project", help="Name of the project")
+    parser.add_argument(
+        "--save", default="",
+        help="Map this directory (or module to inspect) as --release")
+    parser.add_argument(
+        "--release", default="",
+        help="Release to save, or to query with --subclasses")
+    parser.add_argument(
+        "--single-pass", action="store_true",
+        help="Parse with the single pass scanner")
+    parser.add_argument(
+        "--first", default="",
+        help="First release defining this function or method")
+    parser.add_argument(
+        "--subclasses", default="",
+        help="Classes of --release extending this class")
+    args = parser.parse_args()
+
+    history = MapHistory(args.database)
+    if args.save:
+        import os
+        if not args.release:
+            parser.error("--save needs a --release")
+        if os.path.isdir(args.save):
+            from boring_stuff.projects.map import map_python
+            c_package = map_python(args.save, single_pass=args.single_pass)
+        else:
+            import importlib
+            from boring_stuff.projects.map_with_inspect import map_module
+            c_package = map_module(importlib.import_module(args.save))
+        history.save(c_package, args.project, args.release)
+
+    if args.first:
+        print(history.first_appearance(args.project, args.first))
+    if args.subclasses:
+        for qualname in history.subclasses(
+                args.project, args.release, args.subclasses):
+            print(qualname)
+    if not (args.save or args.first or args.subclasses):
+        for release, created in history.releases(args.project):
+            print("%s  %s" % (
+                time.strftime("%Y-%m-%d %H:%M", time.localtime(created)),
+                release))
+    history.close()
@@ -1,9 +1,14 @@
 #!/usr/bin/env python
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import importlib
 import inspect
 import logging
+import os
+import pkgutil
 import sys
+from boring_stuff.parser.inheritance import resolve_parents
+from boring_stuff.projects.budget import BudgetExceeded, skipped_node
 
 logger = logging.getLogger("boring_stuff.projects.map_with_inspect")
 
@@ -24,7 +29,202 @@ def get_access(name):
         return "PUBLIC"
 
 
-def map_module(mod, access_level=0):
+def type_name(value):
+    """Name of the type of value, as an interned string
+
+    Same text as str(type(value)), which is how class_diagram writes
+    the type, but without a reference to the type object.  Many
+    variables share a handful of types, interning stores each name once.
+    """
+    return sys.intern(str(type(value)))
+
+
+class ModuleUnloader(object):
+    """Evict mapped modules from sys.modules
+
+    Passed to map_module, each submodule is removed once its subtree
+    is mapped, so the modules and everything they reference can be
+    freed.  Only the modules imported after the unloader was created
+    are evicted, the ones already in use by the process are kept.
+
+    Attributes
+    ----------
+    preloaded : set
+        Names of the modules imported before the unloader
+
+    unloaded : int
+        Number of modules evicted
+    """
+    def __init__(self):
+        self.preloaded = set(sys.modules)
+        self.unloaded = 0
+
+    def unload(self, name):
+        """Evict the module name and its submodules
+
+        The module is also removed from the attributes of its parent
+        package, which would keep it alive otherwise.
+        """
+        prefix = name + "."
+        names = [c_name for c_name in list(sys.modules)
+                 if (c_name == name or c_name[:len(prefix)] == prefix) and
+                 c_name not in self.preloaded]
+        for c_name in names:
+            mod = sys.modules.pop(c_name, None)
+            parent = sys.modules.get(c_name.rpartition(".")[0])
+            child = c_name.rpartition(".")[2]
+            if mod is not None and parent is not None and \
+                    vars(parent).get(child) is mod:
+                delattr(parent, child)
+        self.unloaded += len(names)
+        if names:
+            logger.debug("Unloaded %d modules of %s" % (len(names), name))
+
+
+def default_import_workers():
+    """Number of import threads worth using on this interpreter
+
+    With the GIL, importing is mostly bound by unmarshalling and
+    executing module bodies, which threads can not overlap, so a
+    single (serial) worker is used.  Free-threaded builds use one
+    thread per core.
+
+    Returns
+    -------
+    workers : int
+        Number of threads for preimport_submodules
+    """
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    if is_gil_enabled is not None and not is_gil_enabled():
+        return os.cpu_count() or 1
+    return 1
+
+
+def preimport_submodules(mod, workers=-1, budget=None, name_filter=None):
+    """Import all submodules of a package with a thread pool
+
+    Submodules are listed with pkgutil (without importing them) and
+    imported concurrently.  A subpackage is listed as soon as it has
+    been imported, so independent branches overlap.  Module level
+    locks of the import system make concurrent imports of distinct
+    modules safe; an import that fails in a thread (e.g. a deadlock
+    between modules importing each other) is retried serially.
+
+    .. note:: Imported submodules become attributes of their parent
+        package, so map_module also maps submodules that the package
+        itself does not import.
+
+    Parameters
+    ----------
+    mod : module
+        The package whose submodules are imported.
+
+    workers : int
+        Number of threads.  A negative value uses
+        default_import_workers().  With 1 the imports run serially in
+        the calling thread.
+
+    budget : Budget or None
+        If provided, stop once the budget is exceeded and time out
+        each import.  The imports then run serially so a hung import
+        can be abandoned.
+
+    name_filter : NameFilter or None
+        If provided, submodules rejected by the filter (and their
+        subtrees) are not imported.
+
+    Returns
+    -------
+    names : list
+        Names of the submodules imported.
+    """
+    if not hasattr(mod, "__path__"):
+        return []
+    if workers < 0:
+        workers = default_import_workers()
+
+    def list_children(pkg):
+        children = []
+        try:
+            for info in pkgutil.iter_modules(
+                    pkg.__path__, pkg.__name__ + "."):
+                if info.name.split(".")[-1] == "__main__":
+                    continue
+                if name_filter is not None and \
+                        not name_filter.allows(info.name, info.ispkg):
+                    continue
+                children.append(info.name)
+        except Exception as e:
+            logger.warning(
+                "Unable to list submodules of %s: %s" % (pkg.__name__, str(e)))
+        return children
+
+    names = []
+    retry = []
+    if workers <= 1 or budget is not None:
+        # ----------------------  serial fallback  -------------------------
+        pending = list_children(mod)
+        while pending:
+            name = pending.pop(0)
+            try:
+                if budget is None:
+                    sub_mod = importlib.import_module(name)
+                else:
+                    reason = budget.exceeded()
+                    if reason:
+                        logger.warning(
+                            "Stop pre-importing at %s: %s" % (name, reason))
+                        break
+                    sub_mod = budget.run(importlib.import_module, name)
+            except Exception as e:
+                logger.warning("Unable to import %s: %s" % (name, str(e)))
+                continue
+            names.append(name)
+            if hasattr(sub_mod, "__path__"):
+                pending.extend(list_children(sub_mod))
+        return names
+
+    # -------------------------  thread pool  -------------------------------
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for name in list_children(mod):
+            futures[pool.submit(importlib.import_module, name)] = name
+
+        while futures:
+            done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures.pop(future)
+                try:
+                    sub_mod = future.result()
+                except Exception as e:
+                    logger.debug("Threaded import of %s failed with %s" %
+                                 (name, str(e)))
+                    retry.append(name)
+                    continue
+
+                names.append(name)
+                if hasattr(sub_mod, "__path__"):
+                    for child in list_children(sub_mod):
+                        futures[pool.submit(
+                            importlib.import_module, child)] = child
+
+    # retry failures serially, also catches deadlocks between threads
+    for name in retry:
+        try:
+            sub_mod = importlib.import_module(name)
+        except Exception as e:
+            logger.warning("Unable to import %s: %s" % (name, str(e)))
+            continue
+        names.append(name)
+        if hasattr(sub_mod, "__path__"):
+            names.extend(preimport_submodules(
+                sub_mod, 1, name_filter=name_filter))
+    return names
+
+
+def map_module(mod, access_level=0, import_workers=0, budget=None,
+               name_filter=None, import_profile=None, lean=False,
+               unload=None):
     """Map a module
 
     Use inspect to map the following:
@@ -47,16 +247,129 @@ def map_module(mod, access_level=0):
         If 1, track up to protected
         If 2, track private
 
+    import_workers : int
+        If not 0, import all submodules first with
+        preimport_submodules(mod, import_workers) so the imports
+        overlap, then run the (serial) inspect pass.  -1 picks the
+        number of threads for the interpreter.
+
+    budget : Budget or None
+        Limits of the run (see boring_stuff.projects.budget).  Modules
+        are not mapped once it is exceeded, they are added with a
+        'skipped' reason and their parents are marked 'truncated'.
+
+    name_filter : NameFilter or None
+        Include/exclude patterns and depth limit on the qualified names
+        (see boring_stuff.projects.name_filter).  Rejected submodules
+        are neither pre-imported nor mapped.  The root of the filter
+        defaults to mod.
+
+    import_profile : ImportProfiler or None
+        If provided, the imports made while mapping are profiled (see
+        boring_stuff.projects.import_profile) and every spec of a
+        module imported under the profiler gets an 'import_cost'.
+
+    lean : bool
+        If true, the 'type' of variables and attributes is stored as a
+        string (see type_name) instead of the type object, and the
+        submodules are released as soon as they are mapped.  The
+        specification then holds no reference to the inspected objects.
+
+    unload : ModuleUnloader or None
+        If provided, every submodule is evicted from sys.modules once
+        its subtree is mapped.  With lean, memory stays roughly flat
+        while walking many packages.  Submodules pre-imported with
+        import_workers are all loaded before the first is evicted.
+
     Returns
     -------
     c_package : dict
-        The dictionary describing the package.
+        The dictionary describing the package.  The classes have their
+        'parent_ids' (see boring_stuff.parser.inheritance).
+    """
+    c_package = _map_module(
+        mod, access_level, import_workers, budget, name_filter,
+        import_profile, lean, unload)
+    resolve_parents(c_package)
+    return c_package
+
+
+def _map_module(mod, access_level=0, import_workers=0, budget=None,
+                name_filter=None, import_profile=None, lean=False,
+                unload=None):
+    """Map a module and its submodules for map_module
+
+    The parents are not resolved, map_module resolves them once for
+    the whole package.
     """
     # ----------------------  initialize variables  -------------------------
     # extract name of the current module
     name = mod.__name__
     logger.info("Running map_module(%s)" % name)
 
+    if name_filter is not None and name_filter.root is None:
+        name_filter = name_filter.bind(name)
+
+    if import_profile is not None:
+        with import_profile:
+            c_package = _map_module(
+                mod, access_level, import_workers, budget, name_filter,
+                lean=lean, unload=unload)
+        import_profile.annotate(c_package)
+        return c_package
+
+    if import_workers:
+        preimport_submodules(mod, import_workers, budget, name_filter)
+
+    if budget is None:
+        c_package, module_dict = inspect_module(mod, access_level, lean)
+    else:
+        try:
+            # getmembers may trigger lazy imports, time it out as well
+            c_package, module_dict = budget.run(
+                inspect_module, mod, access_level, lean)
+        except BudgetExceeded as e:
+            logger.warning("Skipping %s: %s" % (name, str(e)))
+            # vars() does not trigger a lazy module __getattr__
+            return skipped_node(
+                name, str(e),
+                "package" if "__path__" in vars(mod) else "module")
+
+    try:
+        add_modules(
+            c_package, module_dict, access_level, budget, name_filter,
+            lean, unload)
+    except Exception as e:
+        logger.error("Exception caught in map_module(): %s" % str(e))
+
+    return c_package
+
+
+def classify_members(mod, access_level=0, lean=False):
+    """Sort the members of a module, without mapping them
+
+    Parameters
+    ----------
+    mod : module
+        The module to be examined.
+
+    access_level : int
+        If 0, only track public
+        If 1, track up to protected
+        If 2, track private
+
+    lean : bool
+        If true, store the type of the variables as strings.
+
+    Returns
+    -------
+    members : dict
+        'modules' ({name: submodule}), 'classes' and 'functions'
+        ({name: object} defined in mod), 'variables' (list of
+        variable specs) and 'dependencies' (list of [name, imported])
+    """
+    name = mod.__name__
+
     # initialize variables
     module_dict = {}
     class_dict = {}
@@ -115,20 +428,61 @@ def map_module(mod, access_level=0):
                 c_access = get_access(member[0])
                 variable_list.append({
                     "name": member[0],
-                    "type": type(member[1]),
+                    "type": type_name(member[1]) if lean else
+                    type(member[1]),
                     "access": c_access
                 })
         except Exception as e:
-            logger.error("Exception in map_module() caught %s" % str(e))
+            logger.error("Exception in inspect_module() caught %s" % str(e))
+
+    return {
+        "modules": module_dict,
+        "classes": class_dict,
+        "functions": func_dict,
+        "variables": variable_list,
+        "dependencies": dependency_list,
+    }
+
+
+def is_pure_package(members):
+    """True if the members (from classify_members) are only submodules"""
+    return len(members["modules"]) > 0 and not any([
+        members["classes"], members["functions"], members["variables"]])
+
+
+def inspect_module(mod, access_level=0, lean=False):
+    """Inspect a single module
+
+    Same as map_module without descending into the submodules.
+
+    Parameters
+    ----------
+    mod : module
+        The module to be examined.
+
+    access_level : int
+        If 0, only track public
+        If 1, track up to protected
+        If 2, track private
+
+    lean : bool
+        If true, store the type of the variables as strings.
+
+    Returns
+    -------
+    c_package : dict
+        The dictionary describing the module.  'modules' and
+        'subpackages' are left empty.
 
-    has_m = len(module_dict) > 0
-    has_c = len(class_dict) > 0
-    has_f = len(func_dict) > 0
-    has_v = len(variable_list) > 0
+    module_dict : dict
+        The submodules found, {name: module}
+    """
+    name = mod.__name__
+    members = classify_members(mod, access_level, lean)
 
     c_package = {}
     try:
-        if has_m and not(any([has_c, has_f, has_v])):
+        if is_pure_package(members):
             # pure package
             c_package = {
                 "type": "package",
@@ -136,9 +490,8 @@ def map_module(mod, access_level=0):
                 "subpackages": [],
                 "modules": [],
                 "misc": [],
-                "dependencies": dependency_list
+                "dependencies": members["dependencies"]
             }
-            add_modules(c_package, module_dict, access_level)
 
         else:
             # module with some form of variable/function/class
@@ -149,23 +502,24 @@ def map_module(mod, access_level=0):
                 "modules": [],
                 "class_list": [],
                 "methods": [],
-                "variables": variable_list,
-                "dependencies": dependency_list
+                "variables": members["variables"],
+                "dependencies": members["dependencies"]
             }
-            add_modules(c_package, module_dict, access_level)
-            add_classes(c_package, class_dict, access_level)
+            add_classes(c_package, members["classes"], access_level, lean)
 
+            func_dict = members["functions"]
             for c_method in func_dict:
                 c_package["methods"].append(
                     map_function(func_dict[c_method])
                 )
     except Exception as e:
-        logger.error("Exception caught in map_module(): %s" % str(e))
+        logger.error("Exception caught in inspect_module(): %s" % str(e))
 
-    return c_package
+    return c_package, members["modules"]
 
 
-def add_modules(c_package, mod_dict, access_level=0):
+def add_modules(c_package, mod_dict, access_level=0, budget=None,
+                name_filter=None, lean=False, unload=None):
     """Add modules to c_package
 
     This uses map_module to dive deeper into detected moddules.
@@ -184,15 +538,56 @@ def add_modules(c_package, mod_dict, access_level=0):
         If 1, track up to protected
         If 2, track private
 
+    budget : Budget or None
+        If exceeded, the remaining modules are added as skipped
+        nodes and c_package is marked 'truncated'.
+
+    name_filter : NameFilter or None
+        Modules rejected by the filter are left out.
+
+    lean : bool
+        If true, the modules are removed from mod_dict as they are
+        mapped, and see map_module.
+        .. note:: mod_dict is emptied
+
+    unload : ModuleUnloader or None
+        Evicts each module once mapped, see map_module.
+
     See Also
     --------
     map_module :
         Function to map a module.
     """
-    for c_mod in mod_dict:
+    reason = None
+    for c_mod in list(mod_dict):
         try:
-            logger.debug("Add %s from %s" % (c_mod, c_package["name"]))
-            tmp_mod = map_module(mod_dict[c_mod], access_level)
+            if name_filter is not None and not name_filter.allows(
+                    c_mod, "__path__" in vars(mod_dict[c_mod])):
+                logger.debug("Filtered out %s" % c_mod)
+                continue
+
+            if budget is not None and reason is None:
+                reason = budget.exceeded()
+                if reason:
+                    logger.warning(
+                        "Truncating %s: %s" % (c_package["name"], reason))
+                    c_package["truncated"] = reason
+
+            if reason:
+                tmp_mod = skipped_node(
+                    c_mod, reason,
+                    "package" if "__path__" in vars(mod_dict[c_mod])
+                    else "module")
+            else:
+                logger.debug("Add %s from %s" % (c_mod, c_package["name"]))
+                tmp_mod = _map_module(
+                    mod_dict[c_mod], access_level, budget=budget,
+                    name_filter=name_filter, lean=lean, unload=unload)
+
+            if tmp_mod.get("skipped") or tmp_mod.get("truncated"):
+                c_package.setdefault(
+                    "truncated", tmp_mod.get("skipped") or
+                    tmp_mod.get("truncated"))
             if tmp_mod["type"] == "package":
                 c_package["subpackages"].append(tmp_mod)
             else:
@@ -202,9 +597,15 @@ def add_modules(c_package, mod_dict, access_level=0):
             logger.error(
                 "Caught exception(%s) in add_modules(%s)" %
                 (str(e), str(c_mod)))
+        finally:
+            # filtered out modules too
+            if lean:
+                del mod_dict[c_mod]
+            if unload is not None:
+                unload.unload(c_mod)
 
 
-def add_classes(c_package, class_dict, access_level=0):
+def add_classes(c_package, class_dict, access_level=0, lean=False):
     """Add details about classes
 
     This function dives deeper into the package to
@@ -223,6 +624,9 @@ def add_classes(c_package, class_dict, access_level=0):
         If 1, track up to protected
         If 2, track private
 
+    lean : bool
+        If true, store the type of the attributes as strings.
+
     See Also
     ---------
     map_module :
@@ -234,7 +638,7 @@ def add_classes(c_package, class_dict, access_level=0):
     for c_class in class_dict:
         try:
             c_package["class_list"].append(
-                map_class(class_dict[c_class], access_level)
+                map_class(class_dict[c_class], access_level, lean)
             )
         except Exception as e:
             logger.error("Exception caught in add_classes: %s" % str(e))
@@ -266,7 +670,35 @@ def get_parent(cls):
     return parent
 
 
-def map_class_python3(cls, access_level=0):
+def get_parent_qualnames(cls):
+    """Get the qualified names of the parents of the class
+
+    Parameters
+    ----------
+    cls : class
+        The class being analyzed
+
+    Returns
+    -------
+    qualnames : None, list
+        module + "." + qualified name of each base, in the order of
+        get_parent.  None if the class has no parent.
+    """
+    try:
+        if len(cls.__bases__) == 0:
+            qualnames = None
+        else:
+            qualnames = [
+                i.__module__ + "." + getattr(i, "__qualname__", i.__name__)
+                for i in cls.__bases__]
+
+    except Exception as e:
+        qualnames = None
+        logger.error("Error caught in get_parent_qualnames(), %s" % str(e))
+    return qualnames
+
+
+def map_class_python3(cls, access_level=0, lean=False):
     """Map class with Python3
 
     Parameters
@@ -279,6 +711,9 @@ def map_class_python3(cls, access_level=0):
         If 1, track up to protected
         If 2, track private
 
+    lean : bool
+        If true, store the type of the attributes as strings.
+
     Returns
     -------
     class_spec : dict
@@ -289,6 +724,7 @@ def map_class_python3(cls, access_level=0):
         "type": "class",
         "name": cls.__name__,
         "parent": get_parent(cls),
+        "parent_qualnames": get_parent_qualnames(cls),
         "attributes": [],
         "classmethods": [],
         "staticmethods": [],
@@ -340,7 +776,8 @@ def map_class_python3(cls, access_level=0):
             else:
                 cls_spec["attributes"].append({
                     "name": member[0],
-                    "type": type(member[1]),
+                    "type": type_name(member[1]) if lean else
+                    type(member[1]),
                     "access": c_access,
                 })
         except Exception as e:
@@ -351,7 +788,7 @@ def map_class_python3(cls, access_level=0):
     return cls_spec
 
 
-def map_class_python2(cls, access_level=0):
+def map_class_python2(cls, access_level=0, lean=False):
     """Map class with Python2
 
     Parameters
@@ -364,6 +801,9 @@ def map_class_python2(cls, access_level=0):
         If 1, track up to protected
         If 2, track private
 
+    lean : bool
+        If true, store the type of the attributes as strings.
+
     Returns
     -------
     class_spec : dict
@@ -374,6 +814,7 @@ def map_class_python2(cls, access_level=0):
         "type": "class",
         "name": cls.__name__,
         "parent": get_parent(cls),
+        "parent_qualnames": get_parent_qualnames(cls),
         "attributes": [],
         "classmethods": [],
         "staticmethods": [],
@@ -420,7 +861,8 @@ def map_class_python2(cls, access_level=0):
             else:
                 cls_spec["attributes"].append({
                     "name": member[0],
-                    "type": type(member[1]),
+                    "type": type_name(member[1]) if lean else
+                    type(member[1]),
                     "access": c_access,
                 })
         except Exception as e:
@@ -433,7 +875,7 @@ def map_class_python2(cls, access_level=0):
     return cls_spec
 
 
-def map_class(cls, access_level=0):
+def map_class(cls, access_level=0, lean=False):
     """Map a class
 
     Scans the class for methods and functions.  Track the parent class if
@@ -449,6 +891,9 @@ def map_class(cls, access_level=0):
         If 1, track up to protected
         If 2, track private
 
+    lean : bool
+        If true, store the type of the attributes as strings.
+
     Returns
     -------
     class_spec : dict
@@ -456,9 +901,9 @@ def map_class(cls, access_level=0):
         staticmethods, and classmethods
     """
     if sys.version_info.major == 3:
-        return map_class_python3(cls, access_level)
+        return map_class_python3(cls, access_level, lean)
     else:
-        return map_class_python2(cls, access_level)
+        return map_class_python2(cls, access_level, lean)
 
 
 def map_function(fnc):
@@ -533,6 +978,58 @@ if __name__ == "__main__":
         "--access", default=0, type=int,
         help="Access level to track.  (0=public only, 2=include private"
     )
+    parser.add_argument(
+        "--import-workers", default=0, type=int,
+        help="Import all submodules first with N threads (-1=auto)")
+    parser.add_argument(
+        "--cache", default="",
+        help="Directory of the persistent map cache")
+    parser.add_argument(
+        "--cache-size", default=256, type=int,
+        help="Size limit of the cache in MB")
+    parser.add_argument(
+        "--wall-time", default=None, type=float,
+        help="Stop mapping after this many seconds")
+    parser.add_argument(
+        "--max-rss", default=None, type=int,
+        help="Stop mapping above this resident memory (MB)")
+    parser.add_argument(
+        "--module-timeout", default=None, type=float,
+        help="Skip a module whose import/inspect takes longer (seconds)")
+    parser.add_argument(
+        "--include", action="append", default=None,
+        help="Only map names matching this glob (repeatable, re: for regex)")
+    parser.add_argument(
+        "--exclude", action="append", default=None,
+        help="Skip names matching this glob (repeatable, re: for regex)")
+    parser.add_argument(
+        "--max-depth", default=None, type=int,
+        help="Maximum depth of submodules below the module")
+    parser.add_argument(
+        "--profile-imports", default=0, type=int,
+        help="Profile the imports, report the N most expensive modules and "
+        "color the diagram by import time")
+    parser.add_argument(
+        "--trace-memory", action="store_true",
+        help="Also trace the memory allocated by the imports (slower)")
+    parser.add_argument(
+        "--lean", action="store_true",
+        help="Keep no reference to the inspected objects (types as names)")
+    parser.add_argument(
+        "--unload", action="store_true",
+        help="Evict each submodule from sys.modules once mapped")
+    parser.add_argument(
+        "--collapse-depth", default=None, type=int,
+        help="Draw the submodules below this depth as summary nodes")
+    parser.add_argument(
+        "--max-members", default=None, type=int,
+        help="Draw at most N members per class")
+    parser.add_argument(
+        "--hide-isolated", action="store_true",
+        help="Do not draw the classes without inheritance edges")
+    parser.add_argument(
+        "--node-budget", default=None, type=int,
+        help="Collapse the diagram to at most N packages and classes")
     args = parser.parse_args()
 
     # set log level
@@ -541,11 +1038,69 @@ if __name__ == "__main__":
     if args.log:
         logger.parent.addHandler(logging.FileHandler(args.log, "a"))
 
-    c_package = map_module(
-        importlib.import_module(args.module),
-        access_level=args.access,
-    )
+    from boring_stuff.projects.name_filter import NameFilter
+    name_filter = None
+    if args.include or args.exclude or args.max_depth is not None:
+        name_filter = NameFilter(args.include, args.exclude, args.max_depth)
+
+    if args.cache:
+        from boring_stuff.projects.cache import MapCache, map_module_cached
+        cache = MapCache(args.cache, max_bytes=args.cache_size * 2**20)
+        c_package = map_module_cached(
+            args.module, cache, access_level=args.access,
+            name_filter=name_filter)
+        logger.info("Cache hits: %d, misses: %d" % (cache.hits, cache.misses))
+    else:
+        from boring_stuff.projects.budget import Budget
+        budget = None
+        if args.wall_time or args.max_rss or args.module_timeout:
+            budget = Budget(
+                wall_time=args.wall_time,
+                max_rss=args.max_rss * 2**20 if args.max_rss else None,
+                module_timeout=args.module_timeout)
+
+        # created before the import, so the submodules count as new
+        unload = ModuleUnloader() if args.unload else None
+
+        profiler = None
+        if args.profile_imports:
+            from boring_stuff.projects.import_profile import ImportProfiler
+            profiler = ImportProfiler(trace_memory=args.trace_memory)
+
+        def import_top():
+            if profiler is None:
+                return importlib.import_module(args.module)
+            with profiler:
+                return importlib.import_module(args.module)
+
+        try:
+            if budget is None:
+                mod = import_top()
+            else:
+                mod = budget.run(import_top)
+        except BudgetExceeded as e:
+            logger.error("Unable to import %s: %s" % (args.module, str(e)))
+            c_package = skipped_node(args.module, str(e), "package")
+        else:
+            c_package = map_module(
+                mod,
+                access_level=args.access,
+                import_workers=args.import_workers,
+                budget=budget,
+                name_filter=name_filter,
+                import_profile=profiler,
+                lean=args.lean,
+                unload=unload,
+            )
+            if unload is not None:
+                logger.info("Unloaded %d modules" % unload.unloaded)
+            if profiler is not None:
+                print(profiler.format_report(top=args.profile_imports))
 
     # ---------------------  draw class diagram  ----------------------------
     from boring_stuff.uml.class_diagram import write_class_diagram
-    write_class_diagram(c_package, output=args.output, draw_depend=args.depend)
+    write_class_diagram(
+        c_package, output=args.output, draw_depend=args.depend,
+        draw_import_cost=bool(args.profile_imports) and not args.cache,
+        collapse_depth=args.collapse_depth, max_members=args.max_members,
+        hide_isolated=args.hide_isolated, node_budget=args.node_budget)
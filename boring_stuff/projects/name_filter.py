@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""Filters on qualified module names
+
+A NameFilter is passed to the mappers (map_module, map_python, ...) to
+prune the package tree before it is mapped.  Subtrees rejected by the
+filter are never imported (map_with_inspect) or read (map).
+
+Patterns are globs on qualified names, "*" matches within one level,
+"**" across levels.  Like in .gitignore, a pattern without "." matches
+at any depth ("tests" matches "pkg.sub.tests").  Prefix a pattern with
+"re:" to use a regular expression instead.  A pattern matching a
+package also matches everything below it.
+
+Examples
+--------
+Only map the core subpackage, without its tests
+
+>>> from boring_stuff.projects.name_filter import NameFilter
+>>> name_filter = NameFilter(
+...     include=["pkg.core"], exclude=["tests", "*_pb2"], max_depth=3)
+>>> name_filter.allows("pkg")
+True
+>>> name_filter.allows("pkg.vendor")
+False
+"""
+import re
+
+
+def compile_pattern(pattern):
+    """Compile a glob (or "re:" regex) pattern on qualified names
+
+    Parameters
+    ----------
+    pattern : str
+        The pattern
+
+    Returns
+    -------
+    regex : compiled regular expression
+        Expression matching the whole name
+
+    prefix : str or None
+        Literal start of the glob before any wildcard, None for a
+        regex or a pattern matching at any depth.  Equal to pattern if
+        there is no wildcard.
+    """
+    if pattern[:3] == "re:":
+        return re.compile("(?:%s)$" % pattern[3:]), None
+
+    regex = ""
+    i_char = 0
+    while i_char < len(pattern):
+        if pattern[i_char:i_char + 2] == "**":
+            regex += ".*"
+            i_char += 2
+            continue
+        elif pattern[i_char] == "*":
+            regex += "[^.]*"
+        elif pattern[i_char] == "?":
+            regex += "[^.]"
+        else:
+            regex += re.escape(pattern[i_char])
+        i_char += 1
+
+    if "." not in pattern:
+        return re.compile("(?:.*\\.)?" + regex + "$"), None
+
+    prefix = re.split(r"[\*\?]", pattern, 1)[0]
+    return re.compile(regex + "$"), prefix
+
+
+def _ancestors(name):
+    """List name and the names of its parents, shortest first"""
+    parts = name.split(".")
+    return [".".join(parts[:i_part]) for i_part in range(1, len(parts) + 1)]
+
+
+class NameFilter(object):
+    """Include/exclude patterns and depth limit on qualified names
+
+    Attributes
+    ----------
+    include : list
+        Patterns of names to map.  Empty means everything.
+
+    exclude : list
+        Patterns of names to skip, checked after include.
+
+    max_depth : int or None
+        Maximum depth below the root, the root has depth 0.
+
+    root : str or None
+        Name of the top of the mapped tree.  Set by the mapper on the
+        first call if not provided.
+    """
+    def __init__(self, include=None, exclude=None, max_depth=None, root=None):
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.max_depth = max_depth
+        self.root = root
+        self._include = [compile_pattern(p) for p in self.include]
+        self._exclude = [compile_pattern(p)[0] for p in self.exclude]
+
+    def bind(self, root):
+        """Copy of the filter with the root set"""
+        return NameFilter(self.include, self.exclude, self.max_depth, root)
+
+    def depth(self, name):
+        """Depth of name below the root"""
+        if self.root is None:
+            return name.count(".")
+        return name.count(".") - self.root.count(".")
+
+    def excluded(self, name):
+        """True if name or one of its parents matches an exclude"""
+        for c_name in _ancestors(name):
+            for regex in self._exclude:
+                if regex.match(c_name):
+                    return True
+        return False
+
+    def included(self, name):
+        """True if name or one of its parents matches an include"""
+        if not self._include:
+            return True
+        for c_name in _ancestors(name):
+            for regex, _ in self._include:
+                if regex.match(c_name):
+                    return True
+        return False
+
+    def may_contain(self, name):
+        """True if an included name could be below name"""
+        if not self._include:
+            return True
+        for pattern, (_, prefix) in zip(self.include, self._include):
+            if prefix is None:
+                # can not tell for a regex or a pattern at any depth
+                return True
+            if prefix.startswith(name + "."):
+                return True
+            if prefix != pattern and name.startswith(prefix):
+                # past the literal part, the wildcard may match deeper
+                return True
+        return False
+
+    def allows(self, name, is_package=True):
+        """Check if a node should be mapped
+
+        Parameters
+        ----------
+        name : str
+            Qualified name of the module or package
+
+        is_package : bool
+            Packages are also allowed when they lead to an included
+            name, modules have to be included themselves.
+
+        Returns
+        -------
+        allowed : bool
+            False if the node and its subtree should be skipped.
+        """
+        if self.max_depth is not None and self.depth(name) > self.max_depth:
+            return False
+        if self.excluded(name):
+            return False
+        if self.included(name):
+            return True
+        return is_package and self.may_contain(name)
@@ -18,6 +18,12 @@ Now draw with class diagram (Plantuml format)
 
 >>> from boring_stuff.uml.class_diagram import write_class_diagram
 >>> write_class_diagram(package_dict, "/tmp/output.puml")
+
+Large packages can be drawn with less detail, here the level is picked
+to draw at most 300 nodes and 10 members per class
+
+>>> write_class_diagram(package_dict, "/tmp/output.puml",
+...                     max_members=10, node_budget=300)
 """
 # import libraries
 import time
@@ -56,6 +62,9 @@ MODIFIERS = {
 TAB = "    "
 """Tab"""
 
+CYCLE_COLOR = "#FFCCCC"
+"""Background of the modules in an import cycle"""
+
 
 def creator_note(out_file):
     """Add note to PlantUML file
@@ -75,7 +84,7 @@ def creator_note(out_file):
     out_file.write("end note\n\n")
 
 
-def write_package(package, file_out, n_tab=0, tracker={}):
+def write_package(package, file_out, n_tab=0, tracker={}, depth=0):
     """Write the package
 
     Parameters
@@ -92,10 +101,23 @@ def write_package(package, file_out, n_tab=0, tracker={}):
 
     tracker : dict
         Dictionary to track values across all modules
+
+    depth : int
+        Depth of the spec in the mapped tree (the top package is at
+        depth 0), compared to the tracker's 'collapse_depth'.  n_tab
+        only sets the indentation.
     """
     logger.info("write_package(%s)" % package.get("name"))
+    if package.get("skipped"):
+        write_skipped(package, file_out, n_tab)
+        return
+
+    if is_collapsed(depth, tracker):
+        write_summary(package, file_out, n_tab, tracker)
+        return
+
     if package["type"] == "module":
-        write_module(package, file_out, n_tab, tracker=tracker)
+        write_module(package, file_out, n_tab, tracker=tracker, depth=depth)
         return
 
     # append dependencies
@@ -107,24 +129,27 @@ def write_package(package, file_out, n_tab=0, tracker={}):
     # opening of package
     file_out.write(
         TAB * n_tab +
-        "package %s {\n" % package.get("name")
+        "package %s%s {\n" % (
+            package.get("name"), analytics_tag(package, tracker))
     )
 
     modules = package.get("modules")
     if modules:
         for module in modules:
-            write_module(module, file_out, n_tab + 1, tracker=tracker)
+            write_module(module, file_out, n_tab + 1, tracker=tracker,
+                         depth=depth + 1)
 
     subpackages = package.get("subpackages")
     if subpackages:
         for subpackage in subpackages:
-            write_package(subpackage, file_out, n_tab + 1, tracker=tracker)
+            write_package(subpackage, file_out, n_tab + 1, tracker=tracker,
+                          depth=depth + 1)
 
     # close of package
     file_out.write(TAB * n_tab + "}\n")
 
 
-def write_module(module, file_out, n_tab=0, tracker={}):
+def write_module(module, file_out, n_tab=0, tracker={}, depth=0):
     """Write the module as a package in the class diagram
 
     Parameters
@@ -140,8 +165,20 @@ def write_module(module, file_out, n_tab=0, tracker={}):
 
     tracker : dict
         Tracker for global settings
+
+    depth : int
+        Depth of the spec in the mapped tree (the top package is at
+        depth 0), compared to the tracker's 'collapse_depth'.  n_tab
+        only sets the indentation.
     """
     logger.info("write_module(%s)" % module.get("name"))
+    if module.get("skipped"):
+        write_skipped(module, file_out, n_tab)
+        return
+
+    if is_collapsed(depth, tracker):
+        write_summary(module, file_out, n_tab, tracker)
+        return
 
     # append dependencies
     dependency_list = module.get("dependencies", [])
@@ -157,18 +194,26 @@ def write_module(module, file_out, n_tab=0, tracker={}):
     if len(class_list) == 0 and len(func_list) == 0 and len(var_list) == 0:
         return
 
+    if tracker.get("hide_isolated"):
+        class_list = [
+            class_spec for class_spec in class_list
+            if not is_isolated(class_spec, tracker["extended"])]
+
     # write module
-    file_out.write("\n%spackage %s {\n" % (n_tab * TAB, module.get("name")))
+    file_out.write("\n%spackage %s%s {\n" % (
+        n_tab * TAB, module.get("name"), analytics_tag(module, tracker)))
 
     modules = module.get("modules")
     if modules:
         for c_module in modules:
-            write_module(c_module, file_out, n_tab + 1, tracker=tracker)
+            write_module(c_module, file_out, n_tab + 1, tracker=tracker,
+                         depth=depth + 1)
 
     subpackages = module.get("subpackages")
     if subpackages:
         for subpackage in subpackages:
-            write_package(subpackage, file_out, n_tab + 1, tracker=tracker)
+            write_package(subpackage, file_out, n_tab + 1, tracker=tracker,
+                          depth=depth + 1)
 
     if len(var_list) > 0 or len(func_list) > 0:
         # write a class to describe the variables and functions
@@ -177,6 +222,9 @@ def write_module(module, file_out, n_tab=0, tracker={}):
             ((n_tab + 1) * TAB, module.get("name") + ".module")
         )
 
+        (var_list, func_list), n_hidden = limit_members(
+            [var_list, func_list], tracker.get("max_members"))
+
         # write variables
         for var_spec in var_list:
             write_variable(var_spec, file_out, n_tab + 2)
@@ -185,30 +233,42 @@ def write_module(module, file_out, n_tab=0, tracker={}):
         for func_spec in func_list:
             write_function(func_spec, file_out, n_tab + 2)
 
+        if n_hidden:
+            write_more(n_hidden, file_out, n_tab + 2)
+
         # finish this class
         file_out.write((n_tab + 1) * TAB + "}\n")
 
     # ------------------  write classes  ----------------------------
     list_ext = []
+    prefix = module.get("name") + "."
     for class_spec in class_list:
-        write_class(class_spec, file_out, n_tab + 1)
+        write_class(
+            class_spec, file_out, n_tab + 1, tracker.get("max_members"))
 
         # check parent and perhap update list_ext
-        parent_list = class_spec.get("parent")
-        if parent_list:
-            if np.isscalar(parent_list):
-                # single item
-                list_ext.append("{}{}{}".format(
-                    parent_list,
-                    CONNECTION.get("EXTENSION"),
-                    class_spec.get("name")))
-            else:
-                # if list
-                for parent in parent_list:
-                    list_ext.append("{}{}{}".format(
-                        parent,
-                        CONNECTION.get("EXTENSION"),
-                        class_spec.get("name")))
+        parent_list = class_spec.get("parent") or []
+        if np.isscalar(parent_list):
+            # single item
+            parent_list = [parent_list]
+        # resolved by the mappers (see boring_stuff.parser.inheritance),
+        # the parents of other specs are drawn as written
+        parent_ids = class_spec.get("parent_ids")
+        for parent, parent_id in zip(
+                parent_list, parent_ids or [None] * len(parent_list)):
+            if parent_id is not None and parent_id[:len(prefix)] != prefix:
+                # class of another module, drawn with the qualified
+                # names once all the packages are written
+                tracker.setdefault("extensions", []).append(
+                    [parent_id, prefix + class_spec.get("name")])
+                continue
+            if parent_id is not None:
+                # class of this module
+                parent = parent_id[len(prefix):]
+            list_ext.append("{}{}{}".format(
+                parent,
+                CONNECTION.get("EXTENSION"),
+                class_spec.get("name")))
 
     # draw links between extensions
     for ext in list_ext:
@@ -217,7 +277,379 @@ def write_module(module, file_out, n_tab=0, tracker={}):
     file_out.write(n_tab * TAB + "}\n")
 
 
-def write_class(class_spec, file_out, n_tab=0):
+def analytics_style(spec, tracker={}):
+    """Stereotypes and color of an annotated module/package
+
+    See boring_stuff.projects.dependency_graph.DependencyGraph.annotate
+    and boring_stuff.projects.import_profile.ImportProfiler.annotate.
+    Modules in an import cycle are drawn in CYCLE_COLOR.  If the tracker
+    has a 'max_import_time', modules are colored by their import time
+    instead, from white to red.
+
+    Parameters
+    ----------
+    spec : dict
+        Module or package specification
+
+    tracker : dict
+        Tracker for global settings
+
+    Returns
+    -------
+    stereotypes : list
+        Text of the stereotypes, empty if not annotated
+
+    color : str or None
+        Background color as "#RRGGBB"
+    """
+    stereotypes = []
+    color = None
+    analytics = spec.get("analytics")
+    if analytics:
+        stereotypes.append("layer %d, blast radius %d" % (
+            analytics["layer"], analytics["blast_radius"]))
+        if analytics.get("cycle") is not None:
+            color = CYCLE_COLOR
+
+    import_cost = spec.get("import_cost")
+    max_time = tracker.get("max_import_time")
+    if import_cost and max_time:
+        stereotypes.append("import %.1f ms" % (1e3 * import_cost["self_time"]))
+        level = int(255 * (1 - min(import_cost["self_time"] / max_time, 1)))
+        color = "#FF%02X%02X" % (level, level)
+    return stereotypes, color
+
+
+def analytics_tag(spec, tracker={}):
+    """Text of analytics_style to write after the name of a package
+
+    Returns
+    -------
+    tag : str
+        Stereotypes and color, empty if not annotated
+    """
+    stereotypes, color = analytics_style(spec, tracker)
+    tag = "".join(" <<%s>>" % stereotype for stereotype in stereotypes)
+    if color is not None:
+        tag += " " + color
+    return tag
+
+
+def max_import_time(package):
+    """Largest import self time in a package specification"""
+    max_time = 0.0
+    to_visit = [package]
+    while to_visit:
+        spec = to_visit.pop()
+        import_cost = spec.get("import_cost")
+        if import_cost:
+            max_time = max(max_time, import_cost["self_time"])
+        to_visit.extend(spec.get("subpackages", []))
+        to_visit.extend(spec.get("modules", []))
+    return max_time
+
+
+def write_skipped(spec, file_out, n_tab=0):
+    """Write a module/package that was skipped by the mapper
+
+    The node is drawn as an empty package with a <<skipped>>
+    stereotype so partial diagrams show what is missing.
+
+    Parameters
+    ----------
+    spec : dict
+        Module or package specification with a 'skipped' reason
+
+    file_out : file handle
+        Output file handle
+
+    n_tab : int
+        Number of tabs to indent
+    """
+    logger.debug("write_skipped(%s): %s" % (spec.get("name"), spec["skipped"]))
+    file_out.write("\n%spackage %s <<skipped>> {\n%s}\n" % (
+        n_tab * TAB, spec.get("name"), n_tab * TAB))
+
+
+def write_summary(spec, file_out, n_tab=0, tracker={}):
+    """Write a collapsed module/package as a single node
+
+    The node is an empty package with the counts of its subtree as
+    stereotype.  Its dependencies are drawn from the summary node.
+
+    Parameters
+    ----------
+    spec : dict
+        Module or package specification
+
+    file_out : file handle
+        Output file handle
+
+    n_tab : int
+        Number of tabs to indent
+
+    tracker : dict
+        Tracker for global settings
+
+    depth : int
+        Depth of the spec in the mapped tree (the top package is at
+        depth 0), compared to the tracker's 'collapse_depth'.  n_tab
+        only sets the indentation.
+    """
+    if spec["type"] == "module" and not has_members(spec):
+        # like write_module, empty modules are not drawn
+        return
+    tracker.setdefault("collapsed", []).append(spec.get("name"))
+    tracker.setdefault("dependencies", []).extend(subtree_dependencies(spec))
+
+    file_out.write("\n%spackage %s <<%s>>%s {\n%s}\n" % (
+        n_tab * TAB, spec.get("name"), summary_label(spec),
+        analytics_tag(spec, tracker), n_tab * TAB))
+
+
+def summary_label(spec):
+    """Counts of a collapsed module/package, like '2 modules, 3 classes'"""
+    return "collapsed: %d modules, %d classes, %d functions" % \
+        subtree_counts(spec)
+
+
+def subtree_dependencies(spec):
+    """Dependencies of a module/package and all its descendants"""
+    depend_list = []
+    to_visit = [spec]
+    while to_visit:
+        c_spec = to_visit.pop()
+        depend_list.extend(c_spec.get("dependencies", []))
+        to_visit.extend(c_spec.get("subpackages", []))
+        to_visit.extend(c_spec.get("modules", []))
+    return depend_list
+
+
+def write_more(n_hidden, file_out, n_tab=1):
+    """Write the separator standing for the members left out"""
+    file_out.write("%s.. +%d more ..\n" % (n_tab * TAB, n_hidden))
+
+
+def limit_members(groups, max_members=None):
+    """Keep the first max_members members of a class
+
+    Parameters
+    ----------
+    groups : list
+        Lists of members in the order they are written (attributes,
+        methods, ...)
+
+    max_members : int or None
+        Number of members to keep in total, None keeps them all
+
+    Returns
+    -------
+    groups : list
+        The lists, truncated
+
+    n_hidden : int
+        Number of members left out
+    """
+    if max_members is None:
+        return groups, 0
+    kept = []
+    n_left = max_members
+    n_hidden = 0
+    for group in groups:
+        kept.append(group[:n_left])
+        n_hidden += len(group) - len(kept[-1])
+        n_left -= len(kept[-1])
+    return kept, n_hidden
+
+
+def has_members(module):
+    """True if the module has classes, functions or variables to draw"""
+    return bool(module.get("class_list") or module.get("methods") or
+                module.get("variables"))
+
+
+def is_collapsed(depth, tracker):
+    """True if a spec at this depth is drawn as a summary node"""
+    collapse_depth = tracker.get("collapse_depth")
+    return collapse_depth is not None and depth > collapse_depth
+
+
+def subtree_counts(spec):
+    """Number of modules, classes and functions in a spec and below
+
+    Returns
+    -------
+    counts : tuple
+        (n_modules, n_classes, n_functions), spec itself is counted
+        if it is a module.
+    """
+    n_modules = 0
+    n_classes = 0
+    n_functions = 0
+    to_visit = [spec]
+    while to_visit:
+        c_spec = to_visit.pop()
+        if c_spec.get("type") == "module":
+            n_modules += 1
+        n_classes += len(c_spec.get("class_list", []))
+        n_functions += len(c_spec.get("methods", []))
+        to_visit.extend(c_spec.get("subpackages", []))
+        to_visit.extend(c_spec.get("modules", []))
+    return n_modules, n_classes, n_functions
+
+
+def extended_names(package):
+    """Names of the classes extended by a class of the package
+
+    Both the name as written in 'parent' and its last part are
+    included.  'object' is left out, every class extends it.
+    """
+    names = set()
+    to_visit = [package]
+    while to_visit:
+        spec = to_visit.pop()
+        for class_spec in spec.get("class_list", []):
+            parent_list = class_spec.get("parent") or []
+            if np.isscalar(parent_list):
+                parent_list = [parent_list]
+            for parent in parent_list:
+                names.add(parent)
+                names.add(parent.split(".")[-1])
+        to_visit.extend(spec.get("subpackages", []))
+        to_visit.extend(spec.get("modules", []))
+    names.discard("object")
+    return names
+
+
+def is_isolated(class_spec, extended):
+    """True if the class has no edge in the diagram
+
+    Parameters
+    ----------
+    class_spec : dict
+        The class specification
+
+    extended : set
+        Names of the extended classes, see extended_names
+    """
+    parent_list = class_spec.get("parent") or []
+    if np.isscalar(parent_list):
+        parent_list = [parent_list]
+    if [parent for parent in parent_list if parent != "object"]:
+        return False
+    return class_spec.get("name") not in extended
+
+
+def count_nodes(package, collapse_depth=None, hide_isolated=False):
+    """Number of nodes (packages and classes) of a diagram
+
+    Parameters
+    ----------
+    package : dict
+        Package specification
+
+    collapse_depth : int or None
+        See write_class_diagram
+
+    hide_isolated : bool
+        See write_class_diagram
+
+    Returns
+    -------
+    n_nodes : int
+        Number of nodes write_class_diagram would draw
+    """
+    expanded, collapsed = _depth_profile(package, hide_isolated)
+    if collapse_depth is None or collapse_depth >= len(expanded) - 1:
+        return sum(expanded)
+    return sum(expanded[:collapse_depth + 1]) + collapsed[collapse_depth + 1]
+
+
+def fit_depth(package, node_budget, hide_isolated=False):
+    """Deepest level of detail drawing at most node_budget nodes
+
+    Parameters
+    ----------
+    package : dict
+        Package specification
+
+    node_budget : int
+        Maximum number of nodes (packages and classes)
+
+    hide_isolated : bool
+        See write_class_diagram
+
+    Returns
+    -------
+    collapse_depth : int or None
+        None if the whole diagram fits, else the depth below which
+        packages are collapsed.  0 if nothing fits.
+    """
+    expanded, collapsed = _depth_profile(package, hide_isolated)
+    if sum(expanded) <= node_budget:
+        return None
+    n_nodes = 0
+    for depth in range(len(expanded) - 1):
+        n_nodes += expanded[depth]
+        if n_nodes + collapsed[depth + 1] > node_budget:
+            if depth == 0:
+                logger.warning(
+                    "%d nodes at the top of %s, over the budget of %d" % (
+                        n_nodes + collapsed[1], package.get("name"),
+                        node_budget))
+                return 0
+            return depth - 1
+    return len(expanded) - 2
+
+
+def _depth_profile(package, hide_isolated=False):
+    """Node counts by depth
+
+    Returns
+    -------
+    expanded : list
+        Number of nodes drawn by the specs at each depth when drawn in
+        full
+
+    collapsed : list
+        Number of nodes drawn at each depth when collapsed
+    """
+    extended = extended_names(package) if hide_isolated else None
+    expanded = []
+    collapsed = []
+    to_visit = [(package, 0)]
+    while to_visit:
+        spec, depth = to_visit.pop()
+        if depth == len(expanded):
+            expanded.append(0)
+            collapsed.append(0)
+
+        if spec.get("skipped"):
+            expanded[depth] += 1
+            collapsed[depth] += 1
+            continue
+
+        if spec["type"] == "package":
+            expanded[depth] += 1
+        elif has_members(spec):
+            class_list = spec.get("class_list", [])
+            if hide_isolated:
+                class_list = [
+                    class_spec for class_spec in class_list
+                    if not is_isolated(class_spec, extended)]
+            expanded[depth] += 1 + len(class_list) + bool(
+                spec.get("methods") or spec.get("variables"))
+        else:
+            # empty module, not drawn
+            continue
+        collapsed[depth] += 1
+
+        for child in spec.get("subpackages", []) + spec.get("modules", []):
+            to_visit.append((child, depth + 1))
+    return expanded, collapsed
+
+
+def write_class(class_spec, file_out, n_tab=0, max_members=None):
     """Write the class object
 
     Examples
@@ -238,11 +670,18 @@ def write_class(class_spec, file_out, n_tab=0):
 
     n_tab : int
         Number of tabs to indent
+
+    max_members : int or None
+        If provided, write at most this many attributes and methods,
+        followed by a "+N more" separator.
     """
     file_out.write("\n%sclass %s {\n" % (n_tab*TAB, class_spec.get("name")))
+    (att_list, methods, s_funcs, c_funcs), n_hidden = limit_members([
+        class_spec.get("attributes", []), class_spec.get("methods", []),
+        class_spec.get("staticmethods", []),
+        class_spec.get("classmethods", [])], max_members)
 
     # write attributes/properties of the class
-    att_list = class_spec.get("attributes", [])
     for att in att_list:
         write_variable(att, file_out, n_tab + 1)
         logger.debug(
@@ -250,11 +689,10 @@ def write_class(class_spec, file_out, n_tab=0):
             (att["name"], class_spec["name"]))
 
     # -----------------------  write method signatures  ---------------------
-    for method in class_spec.get("methods", []):
+    for method in methods:
         write_function(method, file_out, n_tab + 1)
 
     # -----------------------  write static function  -----------------------
-    s_funcs = class_spec.get("staticmethods", [])
     if s_funcs:
         file_out.write((n_tab + 1) * TAB + "-- static methods --\n")
         for func in s_funcs:
@@ -263,7 +701,6 @@ def write_class(class_spec, file_out, n_tab=0):
                 "writing staticmethod: %s" % str(func["name"]))
 
     # -----------------------  write class function  ------------------------
-    c_funcs = class_spec.get("classmethods", [])
     if c_funcs:
 
         file_out.write((n_tab + 1) * TAB + "-- class methods --\n")
@@ -272,6 +709,9 @@ def write_class(class_spec, file_out, n_tab=0):
             logger.debug(
                 "writing classmethod: %s" % str(func["name"]))
 
+    if n_hidden:
+        write_more(n_hidden, file_out, n_tab + 1)
+
     file_out.write(n_tab * TAB + "}\n")  # write complete class
 
 
@@ -290,10 +730,15 @@ def write_function(method_spec, file_out, n_tab=1):
     n_tab : int
         Number of tabs to indent
     """
+    file_out.write(TAB*n_tab + format_function(method_spec) + "\n")
+
+
+def format_function(method_spec):
+    """Text of a function signature, like '+ void run(self, value)'"""
     # list the parameters with comma separation
     param_str = ", ".join(method_spec.get("params", []))
 
-    file_out.write(TAB*n_tab + "{} {} {}({})\n".format(
+    return "{} {} {}({})".format(
         # public(+), protected(#), private(-)
         ACCESS[method_spec.get("access").upper()],
 
@@ -305,7 +750,6 @@ def write_function(method_spec, file_out, n_tab=1):
 
         # parameter
         param_str)
-    )
 
 
 def write_variable(var_spec, file_out, n_tab):
@@ -323,19 +767,27 @@ def write_variable(var_spec, file_out, n_tab):
         Number of tabs
     """
     if var_spec:
-        file_out.write(TAB*n_tab + "{} {}:{}\n".format(
-            # public(+), protected(#), private(-)
-            ACCESS[var_spec.get("access").upper()],
+        file_out.write(TAB*n_tab + format_variable(var_spec) + "\n")
 
-            # name of the method
-            var_spec.get("name"),
 
-            # parameter
-            var_spec.get("type")
-        ))
+def format_variable(var_spec):
+    """Text of a variable, like '+ name:<class 'str'>'"""
+    return "{} {}:{}".format(
+        # public(+), protected(#), private(-)
+        ACCESS[var_spec.get("access").upper()],
+
+        # name of the method
+        var_spec.get("name"),
+
+        # parameter
+        var_spec.get("type")
+    )
 
 
-def write_class_diagram(package, output="/tmp/gen.wsd", draw_depend=False):
+def write_class_diagram(package, output="/tmp/gen.wsd", draw_depend=False,
+                        draw_import_cost=False, collapse_depth=None,
+                        max_members=None, hide_isolated=False,
+                        node_budget=None):
     """Write a class diagram
 
     Draw the class diagram provided the description from
@@ -351,6 +803,28 @@ def write_class_diagram(package, output="/tmp/gen.wsd", draw_depend=False):
 
     draw_depend : bool
         If true, draw dependencies
+
+    draw_import_cost : bool
+        If true, color the modules profiled by map_module (see
+        boring_stuff.projects.import_profile) by their import time.
+
+    collapse_depth : int or None
+        If provided, the modules/packages nested deeper than this
+        (the package itself is at depth 0) are each drawn as one
+        summary node with the counts of their subtree.
+
+    max_members : int or None
+        If provided, draw at most this many members per class, the
+        others are counted in a "+N more" separator.
+
+    hide_isolated : bool
+        If true, leave out the classes that neither extend a class
+        (other than object) nor are extended.
+
+    node_budget : int or None
+        If provided, pick the deepest collapse_depth drawing at most
+        this many packages and classes (see fit_depth).  An explicit
+        collapse_depth is only lowered to fit.
     """
     logger.info("write_class_diagram to %s" % output)
 
@@ -363,17 +837,116 @@ def write_class_diagram(package, output="/tmp/gen.wsd", draw_depend=False):
         creator_note(file_out)
 
         # -------------------  write module  --------------------------------
-        tracker = {
-            "dependencies": []
-        }
+        tracker = make_tracker(
+            package, draw_import_cost, collapse_depth, max_members,
+            hide_isolated, node_budget)
         write_package(package, file_out, tracker=tracker)
+        write_extensions(collapse_dependencies(
+            tracker.get("extensions", []), tracker.get("collapsed", [])),
+            file_out)
         if draw_depend:
-            write_dependencies(tracker["dependencies"], file_out)
+            write_dependencies(collapse_dependencies(
+                tracker["dependencies"], tracker.get("collapsed", [])),
+                file_out)
 
         # finalize UML
         file_out.write("@enduml\n")
 
 
+def make_tracker(package, draw_import_cost=False, collapse_depth=None,
+                 max_members=None, hide_isolated=False, node_budget=None):
+    """Global settings of a diagram, shared by the writers
+
+    Parameters are the ones of write_class_diagram.
+
+    Returns
+    -------
+    tracker : dict
+        'dependencies' and 'extensions' (filled while writing),
+        'collapse_depth' (after fitting the node budget),
+        'max_members', 'hide_isolated' and if needed 'max_import_time'
+        and 'extended'.
+    """
+    tracker = {
+        "dependencies": [],
+        "extensions": [],
+    }
+    if draw_import_cost:
+        tracker["max_import_time"] = max_import_time(package)
+
+    # level of detail
+    if node_budget is not None:
+        fitted = fit_depth(package, node_budget, hide_isolated)
+        if fitted is not None and (
+                collapse_depth is None or fitted < collapse_depth):
+            logger.info("Collapsing below depth %d to fit %d nodes" % (
+                fitted, node_budget))
+            collapse_depth = fitted
+    tracker["collapse_depth"] = collapse_depth
+    tracker["max_members"] = max_members
+    tracker["hide_isolated"] = hide_isolated
+    if hide_isolated:
+        tracker["extended"] = extended_names(package)
+    return tracker
+
+
+def collapse_dependencies(depend_list, collapsed):
+    """Redirect the dependencies of collapsed modules to their summary
+
+    Parameters
+    ----------
+    depend_list : list
+        List of [module, dependency]
+
+    collapsed : list
+        Names of the collapsed modules/packages
+
+    Returns
+    -------
+    depend_list : list
+        The dependencies between drawn nodes, without duplicates and
+        without the ones inside a collapsed node.
+    """
+    if not collapsed:
+        return depend_list
+    collapsed = set(collapsed)
+
+    def drawn_name(name):
+        parts = name.split(".")
+        for i_part in range(1, len(parts) + 1):
+            if ".".join(parts[:i_part]) in collapsed:
+                return ".".join(parts[:i_part])
+        return name
+
+    c_list = []
+    seen = set()
+    for module, dependency in depend_list:
+        pair = (drawn_name(module), drawn_name(dependency))
+        if pair[0] != pair[1] and pair not in seen:
+            seen.add(pair)
+            c_list.append(list(pair))
+    return c_list
+
+
+def write_extensions(ext_list, file_out, n_tab=1):
+    """Write the extensions between classes of different modules
+
+    Parameters
+    ----------
+    ext_list : list
+        List of [parent, class], qualified names
+
+    file_out : file
+        Output file
+
+    n_tab : int
+        Number of tabs to prepend
+    """
+    for parent, class_name in ext_list:
+        file_out.write("{}{}{}{}\n".format(
+            n_tab * TAB, parent, CONNECTION["EXTENSION"], class_name))
+
+
 def write_dependencies(depend_list, file_out, n_tab=1):
     """Write dependencies
 
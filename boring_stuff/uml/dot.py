@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+"""Class diagram in Graphviz DOT format
+
+Same diagram as boring_stuff.uml.class_diagram, written for Graphviz
+(dot -Tsvg) from the graph of boring_stuff.uml.graph.build_graph.
+Packages and modules are clusters, classes are record nodes and the
+parents are drawn above their children.
+
+Examples
+--------
+>>> from boring_stuff.projects.map import map_python
+>>> from boring_stuff.uml.dot import write_dot
+>>> c_package = map_python("boring_stuff")
+>>> write_dot(c_package, "/tmp/output.dot", draw_depend=True)
+
+Then, outside of python
+
+    dot -Tsvg /tmp/output.dot -o /tmp/output.svg
+"""
+import logging
+from boring_stuff.uml.graph import build_graph
+
+logger = logging.getLogger("boring_stuff.uml.dot")
+
+TAB = "    "
+"""Tab"""
+
+EDGE_STYLE = {
+    "extends": "arrowhead=empty",
+    "depends": "arrowhead=vee, style=dashed",
+}
+"""Attributes of the edges by kind"""
+
+NODE_STYLE = {
+    "class": "",
+    "module": "",
+    "collapsed": "style=filled, fillcolor=\"#EEEEEE\"",
+    "skipped": "style=dashed",
+    "external": "shape=box, style=dotted",
+}
+"""Attributes of the nodes by kind"""
+
+
+def quote(text):
+    """Text as a quoted DOT string, backslash escapes are kept"""
+    return '"%s"' % str(text).replace('"', '\\"')
+
+
+def record_escape(text):
+    """Escape the characters with a meaning in record labels"""
+    text = str(text).replace("\\", "\\\\")
+    for char in "{}|<>":
+        text = text.replace(char, "\\" + char)
+    return text
+
+
+def record_label(node):
+    """Label of a record node: header, then one member per line"""
+    header = "".join(
+        record_escape("<<%s>>" % stereotype) + "\\n"
+        for stereotype in node["stereotypes"]) + record_escape(node["label"])
+    if node["kind"] != "class" and not node["members"]:
+        return "{%s}" % header
+    lines = [record_escape(member) for member in node["members"]]
+    if node["more"]:
+        lines.append("+%d more" % node["more"])
+    return "{%s|%s}" % (header, "".join(line + "\\l" for line in lines))
+
+
+def write_node(node, file_out, n_tab=1):
+    """Write a node statement"""
+    attributes = ["label=%s" % quote(record_label(node))]
+    if NODE_STYLE[node["kind"]]:
+        attributes.append(NODE_STYLE[node["kind"]])
+    if node["color"]:
+        attributes.append("style=filled, fillcolor=%s" % quote(node["color"]))
+    file_out.write("%s%s [%s];\n" % (
+        n_tab * TAB, quote(node["id"]), ", ".join(attributes)))
+
+
+def write_cluster(cluster, children, nodes, file_out, n_tab=1):
+    """Write a cluster, its nodes and nested clusters
+
+    Parameters
+    ----------
+    cluster : dict
+        Cluster of the graph
+
+    children : dict
+        Nested clusters by cluster id
+
+    nodes : dict
+        Nodes by cluster id
+
+    file_out : file handle
+        Output file handle
+
+    n_tab : int
+        Number of tabs to indent
+    """
+    file_out.write("%ssubgraph %s {\n" % (
+        n_tab * TAB, quote("cluster_" + cluster["id"])))
+    label = "".join(
+        "<<%s>>\\n" % stereotype
+        for stereotype in cluster["stereotypes"]) + cluster["id"]
+    file_out.write("%slabel=%s;\n" % ((n_tab + 1) * TAB, quote(label)))
+    if cluster["color"]:
+        file_out.write("%sstyle=filled; fillcolor=%s;\n" % (
+            (n_tab + 1) * TAB, quote(cluster["color"])))
+    for node in nodes.get(cluster["id"], []):
+        write_node(node, file_out, n_tab + 1)
+    for child in children.get(cluster["id"], []):
+        write_cluster(child, children, nodes, file_out, n_tab + 1)
+    file_out.write("%s}\n" % (n_tab * TAB))
+
+
+def write_dot(package, output="/tmp/gen.dot", draw_depend=False,
+              draw_import_cost=False, collapse_depth=None, max_members=None,
+              hide_isolated=False, node_budget=None):
+    """Write a class diagram in DOT format
+
+    Parameters are the ones of
+    boring_stuff.uml.class_diagram.write_class_diagram.
+    """
+    logger.info("write_dot to %s" % output)
+    graph = build_graph(
+        package, draw_depend, draw_import_cost, collapse_depth, max_members,
+        hide_isolated, node_budget)
+
+    children = {}
+    for cluster in graph["clusters"]:
+        children.setdefault(cluster["parent"], []).append(cluster)
+    nodes = {}
+    for node in graph["nodes"]:
+        nodes.setdefault(node["cluster"], []).append(node)
+
+    with open(output, "w") as file_out:
+        file_out.write("digraph %s {\n" % quote(graph["name"]))
+        file_out.write(
+            '%sgraph [rankdir=BT, fontname="Helvetica", fontsize=10];\n' % TAB)
+        file_out.write(
+            '%snode [shape=record, fontname="Helvetica", fontsize=10];\n' %
+            TAB)
+        for node in nodes.get(None, []):
+            write_node(node, file_out)
+        for cluster in children.get(None, []):
+            write_cluster(cluster, children, nodes, file_out)
+        for edge in graph["edges"]:
+            file_out.write("%s%s -> %s [%s];\n" % (
+                TAB, quote(edge["source"]), quote(edge["target"]),
+                EDGE_STYLE[edge["kind"]]))
+        file_out.write("}\n")
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+"""Class diagram as a graph of nodes and edges
+
+boring_stuff.uml.class_diagram writes PlantUML text and leaves the
+layout to PlantUML.  build_graph walks the same package specification,
+with the same level of detail options, and returns a plain graph that
+the other renderers (see boring_stuff.uml.renderers) lay out
+themselves.
+
+Graph
+-----
+name
+    Name of the package
+clusters
+    Packages and modules: 'id', 'parent' (id or None), 'stereotypes'
+    and 'color'
+nodes
+    'id', 'label', 'kind' (class, module, collapsed, skipped or
+    external), 'cluster' (id or None), 'members' (text of the
+    attributes and methods), 'more' (number of members left out),
+    'stereotypes' and 'color'
+edges
+    'source', 'target' (node ids) and 'kind'.  An 'extends' edge goes
+    from a class to its parent (resolved with
+    boring_stuff.parser.inheritance), a 'depends' edge from a module
+    to its dependency.
+
+Examples
+--------
+>>> from boring_stuff.projects.map import map_python
+>>> from boring_stuff.uml.graph import build_graph, write_json
+>>> c_package = map_python("boring_stuff")
+>>> graph = build_graph(c_package, draw_depend=True)
+>>> write_json(c_package, "/tmp/output.json", max_members=10)
+"""
+import json
+import logging
+import numpy as np
+from boring_stuff.uml import class_diagram as CD
+
+logger = logging.getLogger("boring_stuff.uml.graph")
+
+
+def build_graph(package, draw_depend=False, draw_import_cost=False,
+                collapse_depth=None, max_members=None, hide_isolated=False,
+                node_budget=None):
+    """Graph of the class diagram of a package
+
+    Parameters
+    ----------
+    package : dict
+        Package specification from the mappers
+
+    draw_depend, draw_import_cost, collapse_depth, max_members,
+    hide_isolated, node_budget
+        See boring_stuff.uml.class_diagram.write_class_diagram
+
+    Returns
+    -------
+    graph : dict
+        See the module documentation
+    """
+    tracker = CD.make_tracker(
+        package, draw_import_cost, collapse_depth, max_members,
+        hide_isolated, node_budget)
+    graph = {
+        "name": package.get("name"),
+        "clusters": [],
+        "nodes": [],
+        "edges": [],
+    }
+    # (class id, parent name, parent id) linked once all nodes exist
+    parents = []
+    _add_spec(graph, package, 0, None, tracker, parents)
+
+    ids = set(node["id"] for node in graph["nodes"])
+    for class_id, parent, parent_id in parents:
+        parent_id = _parent_node(parent, parent_id, ids)
+        if parent_id is None:
+            continue
+        _add_external(graph, ids, parent_id)
+        graph["edges"].append(
+            {"source": class_id, "target": parent_id, "kind": "extends"})
+
+    if draw_depend:
+        anchors = _anchors(graph)
+        for module, dependency in CD.collapse_dependencies(
+                tracker["dependencies"], tracker.get("collapsed", [])):
+            source = _resolve_module(module, ids, anchors)
+            target = _resolve_module(dependency, ids, anchors)
+            _add_external(graph, ids, source)
+            _add_external(graph, ids, target)
+            if source != target:
+                graph["edges"].append(
+                    {"source": source, "target": target, "kind": "depends"})
+    return graph
+
+
+def _node(node_id, label, kind, cluster, members=None, more=0,
+          stereotypes=None, color=None):
+    return {
+        "id": node_id,
+        "label": label,
+        "kind": kind,
+        "cluster": cluster,
+        "members": members or [],
+        "more": more,
+        "stereotypes": stereotypes or [],
+        "color": color,
+    }
+
+
+def _add_spec(graph, spec, depth, cluster, tracker, parents):
+    """Add a package/module and its descendants, like write_package"""
+    name = spec.get("name")
+    if spec.get("skipped"):
+        graph["nodes"].append(_node(
+            name, name, "skipped", cluster, stereotypes=["skipped"]))
+        return
+
+    if CD.is_collapsed(depth, tracker):
+        if spec["type"] == "module" and not CD.has_members(spec):
+            return
+        tracker.setdefault("collapsed", []).append(name)
+        tracker["dependencies"].extend(CD.subtree_dependencies(spec))
+        stereotypes, color = CD.analytics_style(spec, tracker)
+        graph["nodes"].append(_node(
+            name, name, "collapsed", cluster,
+            stereotypes=[CD.summary_label(spec)] + stereotypes, color=color))
+        return
+
+    tracker["dependencies"].extend(spec.get("dependencies", []))
+    if spec["type"] == "module" and not CD.has_members(spec):
+        # ignore empty modules (like __init__.py)
+        return
+
+    stereotypes, color = CD.analytics_style(spec, tracker)
+    graph["clusters"].append({
+        "id": name,
+        "parent": cluster,
+        "stereotypes": stereotypes,
+        "color": color,
+    })
+    for child in spec.get("modules", []) + spec.get("subpackages", []):
+        _add_spec(graph, child, depth + 1, name, tracker, parents)
+    if spec["type"] == "package":
+        return
+
+    var_list = spec.get("variables", [])
+    func_list = spec.get("methods", [])
+    if var_list or func_list:
+        (var_list, func_list), n_hidden = CD.limit_members(
+            [var_list, func_list], tracker.get("max_members"))
+        graph["nodes"].append(_node(
+            name + ".module", name.split(".")[-1], "module", name,
+            [CD.format_variable(var_spec) for var_spec in var_list] +
+            [CD.format_function(func_spec) for func_spec in func_list],
+            n_hidden, ["module"]))
+
+    for class_spec in spec.get("class_list", []):
+        if tracker.get("hide_isolated") and \
+                CD.is_isolated(class_spec, tracker["extended"]):
+            continue
+        (att_list, methods, s_funcs, c_funcs), n_hidden = CD.limit_members([
+            class_spec.get("attributes", []), class_spec.get("methods", []),
+            class_spec.get("staticmethods", []),
+            class_spec.get("classmethods", [])], tracker.get("max_members"))
+        members = [CD.format_variable(att) for att in att_list] + \
+            [CD.format_function(method) for method in methods] + \
+            [CD.format_function(func) + " {static}" for func in s_funcs] + \
+            [CD.format_function(func) + " {class}" for func in c_funcs]
+        class_id = name + "." + class_spec["name"]
+        graph["nodes"].append(_node(
+            class_id, class_spec["name"], "class", name, members, n_hidden))
+
+        parent_list = class_spec.get("parent") or []
+        if np.isscalar(parent_list):
+            parent_list = [parent_list]
+        parent_ids = class_spec.get("parent_ids")
+        for parent, parent_id in zip(
+                parent_list, parent_ids or [None] * len(parent_list)):
+            parents.append((class_id, parent, parent_id))
+
+
+def _parent_node(parent, parent_id, ids):
+    """Node id of a parent class, None for object
+
+    A resolved parent in a collapsed package is drawn as the summary
+    node, an unresolved one as an external node named as written.
+    """
+    if parent_id is None:
+        return None if parent == "object" else parent
+    parts = parent_id.split(".")
+    for i_part in range(len(parts), 0, -1):
+        if ".".join(parts[:i_part]) in ids:
+            return ".".join(parts[:i_part])
+    return parent_id
+
+
+def _anchors(graph):
+    """First node of each cluster (and its ancestors)"""
+    parent_of = dict(
+        (cluster["id"], cluster["parent"]) for cluster in graph["clusters"])
+    anchors = {}
+    for node in graph["nodes"]:
+        cluster = node["cluster"]
+        while cluster is not None and cluster not in anchors:
+            anchors[cluster] = node["id"]
+            cluster = parent_of.get(cluster)
+    return anchors
+
+
+def _resolve_module(name, ids, anchors):
+    """Node id standing for a module in a dependency"""
+    for node_id in [name, name + ".module"]:
+        if node_id in ids:
+            return node_id
+    return anchors.get(name, name)
+
+
+def _add_external(graph, ids, node_id):
+    """Add a node for a class/module outside of the diagram"""
+    if node_id not in ids:
+        ids.add(node_id)
+        graph["nodes"].append(_node(node_id, node_id, "external", None))
+
+
+def write_json(package, output="/tmp/gen.json", draw_depend=False,
+               draw_import_cost=False, collapse_depth=None, max_members=None,
+               hide_isolated=False, node_budget=None):
+    """Write the graph of build_graph as JSON
+
+    Parameters are the ones of
+    boring_stuff.uml.class_diagram.write_class_diagram.
+    """
+    logger.info("write_json to %s" % output)
+    graph = build_graph(
+        package, draw_depend, draw_import_cost, collapse_depth, max_members,
+        hide_isolated, node_budget)
+    with open(output, "w") as file_out:
+        json.dump(graph, file_out, indent=1)
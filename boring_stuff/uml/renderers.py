@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+"""Registry of the class diagram renderers
+
+A renderer writes a package specification (from the mappers) to a
+file.  All take the arguments of
+boring_stuff.uml.class_diagram.write_class_diagram:
+
+    write(package, output, draw_depend=False, draw_import_cost=False,
+          collapse_depth=None, max_members=None, hide_isolated=False,
+          node_budget=None)
+
+Renderers
+    plantuml : PlantUML text (boring_stuff.uml.class_diagram), an image
+        needs the PlantUML jar
+    dot : Graphviz DOT (boring_stuff.uml.dot)
+    json : nodes and edges (boring_stuff.uml.graph)
+    svg : image laid out in python (boring_stuff.uml.svg), no JVM or
+        Graphviz needed
+
+benchmark times the renderers on the same package, and optionally the
+PlantUML jar turning the PlantUML text into an SVG.
+
+Examples
+--------
+>>> from boring_stuff.projects.map import map_python
+>>> from boring_stuff.uml.renderers import render, benchmark
+>>> c_package = map_python("boring_stuff")
+>>> render(c_package, "/tmp/output.svg", max_members=10)
+>>> render(c_package, "/tmp/output.txt", fmt="dot")
+>>> records = benchmark(c_package, "/tmp/bench")
+
+Register a new renderer
+
+>>> from boring_stuff.uml.renderers import register_renderer
+>>> register_renderer("mermaid", write_mermaid, [".mmd"])
+"""
+from collections import OrderedDict
+import logging
+import os
+import subprocess
+import time
+from boring_stuff.uml.class_diagram import write_class_diagram
+from boring_stuff.uml.dot import write_dot
+from boring_stuff.uml.graph import write_json
+from boring_stuff.uml.svg import write_svg
+
+logger = logging.getLogger("boring_stuff.uml.renderers")
+
+RENDERERS = OrderedDict()
+"""(write function, file extensions) by renderer name"""
+
+
+def register_renderer(name, write, extensions=()):
+    """Add or replace a renderer
+
+    Parameters
+    ----------
+    name : str
+        Name of the format, like "svg"
+
+    write : function
+        Function with the arguments of write_class_diagram
+
+    extensions : list
+        File extensions (with the dot) selecting this renderer in
+        get_renderer
+    """
+    RENDERERS[name] = (write, [ext.lower() for ext in extensions])
+
+
+def get_renderer(fmt=None, output=None):
+    """Find a renderer by name, else by the extension of output
+
+    Returns
+    -------
+    name : str
+        Name of the renderer
+
+    write : function
+        The renderer
+
+    Raises
+    ------
+    ValueError
+        If no renderer matches
+    """
+    if fmt is not None:
+        if fmt not in RENDERERS:
+            raise ValueError("Unknown format %s (known: %s)" % (
+                fmt, ", ".join(RENDERERS)))
+        return fmt, RENDERERS[fmt][0]
+
+    ext = os.path.splitext(output or "")[1].lower()
+    for name, (write, extensions) in RENDERERS.items():
+        if ext in extensions:
+            return name, write
+    raise ValueError("No renderer for %s, choose a format among %s" % (
+        output, ", ".join(RENDERERS)))
+
+
+def render(package, output, fmt=None, **options):
+    """Write a class diagram with the renderer of fmt or of the extension
+
+    Parameters
+    ----------
+    package : dict
+        Package specification from the mappers
+
+    output : str
+        Output file
+
+    fmt : str or None
+        Name of the renderer, if None use the extension of output
+
+    options
+        Arguments of write_class_diagram (draw_depend, max_members, ...)
+    """
+    name, write = get_renderer(fmt, output)
+    logger.info("Rendering %s as %s" % (output, name))
+    write(package, output, **options)
+
+
+def benchmark(package, output_dir, formats=None, repeat=3,
+              plantuml_jar=None, **options):
+    """Time the renderers on the same package
+
+    Parameters
+    ----------
+    package : dict
+        Package specification from the mappers
+
+    output_dir : str
+        Directory of the outputs ("diagram.<format>")
+
+    formats : list or None
+        Names of the renderers, default all
+
+    repeat : int
+        Number of runs, the best time is kept
+
+    plantuml_jar : str or None
+        Path of plantuml.jar.  If provided, also time the JVM turning
+        the PlantUML text into an SVG ("plantuml+jvm", run once).
+
+    options
+        Arguments of write_class_diagram (draw_depend, max_members, ...)
+
+    Returns
+    -------
+    records : list
+        'format', 'seconds', 'bytes' and 'output' of each run
+    """
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    records = []
+    for name in formats or list(RENDERERS):
+        write = get_renderer(name)[1]
+        output = os.path.join(output_dir, "diagram." + name)
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            write(package, output, **options)
+            best = min(best, time.perf_counter() - start)
+        records.append({
+            "format": name, "seconds": best,
+            "bytes": os.path.getsize(output), "output": output})
+
+    if plantuml_jar:
+        wsd = os.path.join(output_dir, "diagram.plantuml")
+        if not os.path.isfile(wsd):
+            write_class_diagram(package, wsd, **options)
+        start = time.perf_counter()
+        subprocess.run(
+            ["java", "-jar", plantuml_jar, "-tsvg", "-o",
+             os.path.abspath(output_dir), wsd], check=True)
+        output = os.path.splitext(wsd)[0] + ".svg"
+        records.append({
+            "format": "plantuml+jvm",
+            "seconds": time.perf_counter() - start,
+            "bytes": os.path.getsize(output) if os.path.isfile(output) else 0,
+            "output": output})
+    return records
+
+
+def format_benchmark(records):
+    """Table of the benchmark records, fastest first"""
+    lines = ["%10s %12s  %s" % ("time(ms)", "bytes", "format")]
+    for record in sorted(records, key=lambda r: r["seconds"]):
+        lines.append("%10.1f %12d  %s" % (
+            1e3 * record["seconds"], record["bytes"], record["format"]))
+    return "\n".join(lines)
+
+
+register_renderer(
+    "plantuml", write_class_diagram, [".wsd", ".puml", ".plantuml", ".uml"])
+register_renderer("dot", write_dot, [".dot", ".gv"])
+register_renderer("json", write_json, [".json"])
+register_renderer("svg", write_svg, [".svg"])
+
+
+if __name__ == "__main__":
+    # --------------------------  parse commands  ---------------------------
+    from argparse import ArgumentParser
+    import importlib
+    parser = ArgumentParser()
+    parser.add_argument(
+        "target",
+        help="Project directory to parse, or module to import and inspect")
+    parser.add_argument(
+        "output", help="Output file, or directory with --benchmark")
+    parser.add_argument(
+        "--format", default=None, choices=list(RENDERERS),
+        help="Renderer (default: from the extension of output)")
+    parser.add_argument(
+        "--depend", action="store_true", help="Draw the dependencies")
+    parser.add_argument(
+        "--max-members", default=None, type=int,
+        help="Draw at most N members per class")
+    parser.add_argument(
+        "--node-budget", default=None, type=int,
+        help="Collapse the diagram to at most N packages and classes")
+    parser.add_argument(
+        "--benchmark", default=0, type=int,
+        help="Time all the renderers, best of N runs")
+    parser.add_argument(
+        "--plantuml-jar", default=None,
+        help="With --benchmark, also time plantuml.jar rendering an SVG")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.target):
+        from boring_stuff.projects.map import map_python
+        c_package = map_python(args.target)
+    else:
+        from boring_stuff.projects.map_with_inspect import map_module
+        c_package = map_module(importlib.import_module(args.target))
+
+    options = dict(
+        draw_depend=args.depend, max_members=args.max_members,
+        node_budget=args.node_budget)
+    if args.benchmark:
+        print(format_benchmark(benchmark(
+            c_package, args.output, repeat=args.benchmark,
+            plantuml_jar=args.plantuml_jar, **options)))
+    else:
+        render(c_package, args.output, fmt=args.format, **options)
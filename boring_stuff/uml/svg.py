@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+"""Class diagram drawn as SVG, without PlantUML or Graphviz
+
+The graph of boring_stuff.uml.graph.build_graph is laid out in layers:
+a class is one layer below its lowest parent, the classes without a
+parent in the diagram (and the other nodes) are in the first layer.
+Inside a layer, the nodes are ordered by the mean position of their
+parents (barycenter), then by module, and a layer wider than
+MAX_WIDTH wraps on several rows.
+
+The sizes are estimated from the number of characters, there is no
+font metric, so the layout is linear in the size of the diagram.
+
+Examples
+--------
+>>> from boring_stuff.projects.map import map_python
+>>> from boring_stuff.uml.svg import write_svg
+>>> c_package = map_python("boring_stuff")
+>>> write_svg(c_package, "/tmp/output.svg", max_members=10)
+"""
+from html import escape
+import logging
+from boring_stuff.uml.graph import build_graph
+
+logger = logging.getLogger("boring_stuff.uml.svg")
+
+CHAR_WIDTH = 7
+"""Estimated width of a character (px)"""
+
+LINE_HEIGHT = 16
+"""Height of a line of text (px)"""
+
+PADDING = 6
+"""Space between the border of a node and its text (px)"""
+
+H_GAP = 30
+"""Horizontal space between nodes (px)"""
+
+V_GAP = 50
+"""Vertical space between rows (px)"""
+
+MAX_WIDTH = 2400
+"""Width above which a layer wraps on a new row (px)"""
+
+FILL = {
+    "class": "#FEFECE",
+    "module": "#E8F0FE",
+    "collapsed": "#EEEEEE",
+    "skipped": "#FFFFFF",
+    "external": "#FFFFFF",
+}
+"""Background of the nodes by kind"""
+
+STYLE = """
+text { font-family: monospace; font-size: 11px; }
+.title { font-weight: bold; }
+.node rect { stroke: #A80036; stroke-width: 1; }
+.skipped rect, .external rect { stroke-dasharray: 4 3; }
+.extends { stroke: #A80036; fill: none; marker-end: url(#extends); }
+.depends { stroke: #A80036; fill: none; stroke-dasharray: 6 4;
+           marker-end: url(#depends); }
+"""
+"""CSS of the SVG document"""
+
+
+def node_lines(node):
+    """Header and member lines of a node
+
+    Returns
+    -------
+    header : list
+        Stereotypes, the package and the name
+    members : list
+        Text of the members, with the "+N more" line
+    """
+    header = ["<<%s>>" % stereotype for stereotype in node["stereotypes"]]
+    if node["cluster"] is not None and node["kind"] in ["class", "module"]:
+        header.append(node["cluster"])
+    header.append(node["label"])
+    members = list(node["members"])
+    if node["more"]:
+        members.append(".. +%d more .." % node["more"])
+    return header, members
+
+
+def node_size(node):
+    """Estimated (width, height) of a node"""
+    header, members = node_lines(node)
+    width = max(len(line) for line in header + members) * CHAR_WIDTH
+    height = (len(header) + len(members)) * LINE_HEIGHT
+    if members or node["kind"] == "class":
+        height += PADDING
+    return width + 2 * PADDING, height + 2 * PADDING
+
+
+def layer_ranks(graph):
+    """Layer of each node, one below its lowest parent
+
+    Returns
+    -------
+    ranks : dict
+        Layer (0 is the top) by node id
+    """
+    parents = {}
+    for edge in graph["edges"]:
+        if edge["kind"] == "extends":
+            parents.setdefault(edge["source"], []).append(edge["target"])
+
+    ranks = {}
+    for node in graph["nodes"]:
+        # iterative depth first search, a cycle stops at the first repeat
+        path = [node["id"]]
+        on_path = set(path)
+        while path:
+            node_id = path[-1]
+            if node_id in ranks:
+                path.pop()
+                on_path.discard(node_id)
+                continue
+            pending = [parent for parent in parents.get(node_id, [])
+                       if parent not in ranks and parent not in on_path]
+            if pending:
+                path.append(pending[0])
+                on_path.add(pending[0])
+                continue
+            ranks[node_id] = 1 + max(
+                [ranks[parent] for parent in parents.get(node_id, [])
+                 if parent in ranks] + [-1])
+            path.pop()
+            on_path.discard(node_id)
+    return ranks
+
+
+def layered_layout(graph):
+    """Position of the nodes of a graph
+
+    Parameters
+    ----------
+    graph : dict
+        Graph from boring_stuff.uml.graph.build_graph
+
+    Returns
+    -------
+    boxes : dict
+        (x, y, width, height) of each node id
+
+    size : tuple
+        (width, height) of the drawing
+    """
+    ranks = layer_ranks(graph)
+    parents = {}
+    for edge in graph["edges"]:
+        if edge["kind"] == "extends":
+            parents.setdefault(edge["source"], []).append(edge["target"])
+
+    layers = []
+    for node in graph["nodes"]:
+        while len(layers) <= ranks[node["id"]]:
+            layers.append([])
+        layers[ranks[node["id"]]].append(node)
+
+    boxes = {}
+    y_pos = H_GAP
+    width = 0
+    for layer in layers:
+        # barycenter of the parents placed in the previous layers
+        centers = {}
+        for node in layer:
+            x_list = [boxes[parent][0] + boxes[parent][2] / 2.0
+                      for parent in parents.get(node["id"], [])
+                      if parent in boxes]
+            centers[node["id"]] = sum(x_list) / len(x_list) if x_list else \
+                float("inf")
+        layer.sort(
+            key=lambda node: (centers[node["id"]], node["cluster"] or ""))
+
+        x_pos = H_GAP
+        row_height = 0
+        for node in layer:
+            node_width, node_height = node_size(node)
+            if x_pos > H_GAP and x_pos + node_width > MAX_WIDTH:
+                # wrap to a new row
+                y_pos += row_height + V_GAP
+                x_pos = H_GAP
+                row_height = 0
+            boxes[node["id"]] = (x_pos, y_pos, node_width, node_height)
+            x_pos += node_width + H_GAP
+            row_height = max(row_height, node_height)
+            width = max(width, x_pos)
+        y_pos += row_height + V_GAP
+    return boxes, (max(width, 2 * H_GAP), y_pos)
+
+
+def write_node(node, box, file_out):
+    """Write the group of a node: box, header and members"""
+    x_pos, y_pos, width, height = box
+    fill = node["color"] or FILL[node["kind"]]
+    file_out.write('<g class="node %s" id="%s">\n' % (
+        node["kind"], escape(node["id"])))
+    file_out.write(
+        '<rect x="%d" y="%d" width="%d" height="%d" fill="%s"/>\n' % (
+            x_pos, y_pos, width, height, fill))
+
+    header, members = node_lines(node)
+    y_text = y_pos + PADDING
+    for i_line, line in enumerate(header):
+        y_text += LINE_HEIGHT
+        file_out.write(
+            '<text x="%d" y="%d" text-anchor="middle"%s>%s</text>\n' % (
+                x_pos + width / 2, y_text - 4,
+                ' class="title"' if i_line == len(header) - 1 else "",
+                escape(line, False)))
+    if members or node["kind"] == "class":
+        y_text += PADDING / 2
+        file_out.write(
+            '<line x1="%d" y1="%d" x2="%d" y2="%d" stroke="#A80036"/>\n' % (
+                x_pos, y_text, x_pos + width, y_text))
+        y_text += PADDING / 2
+    for line in members:
+        y_text += LINE_HEIGHT
+        file_out.write('<text x="%d" y="%d">%s</text>\n' % (
+            x_pos + PADDING, y_text - 4, escape(line, False)))
+    file_out.write("</g>\n")
+
+
+def write_edge(edge, boxes, file_out):
+    """Write an edge from the source to the target box"""
+    x_src, y_src, w_src, h_src = boxes[edge["source"]]
+    x_dst, y_dst, w_dst, h_dst = boxes[edge["target"]]
+    x_1 = x_src + w_src / 2.0
+    x_2 = x_dst + w_dst / 2.0
+    if y_dst + h_dst <= y_src:
+        # target above: top of the source to the bottom of the target
+        y_1, y_2 = y_src, y_dst + h_dst
+    elif y_src + h_src <= y_dst:
+        y_1, y_2 = y_src + h_src, y_dst
+    else:
+        # same row: side to side
+        y_1 = y_src + h_src / 2.0
+        y_2 = y_dst + h_dst / 2.0
+        if x_2 > x_1:
+            x_1, x_2 = x_src + w_src, x_dst
+        else:
+            x_1, x_2 = x_src, x_dst + w_dst
+    file_out.write('<path class="%s" d="M%.1f,%.1f L%.1f,%.1f"/>\n' % (
+        edge["kind"], x_1, y_1, x_2, y_2))
+
+
+def write_svg(package, output="/tmp/gen.svg", draw_depend=False,
+              draw_import_cost=False, collapse_depth=None, max_members=None,
+              hide_isolated=False, node_budget=None):
+    """Draw a class diagram as SVG
+
+    Parameters are the ones of
+    boring_stuff.uml.class_diagram.write_class_diagram.
+    """
+    logger.info("write_svg to %s" % output)
+    graph = build_graph(
+        package, draw_depend, draw_import_cost, collapse_depth, max_members,
+        hide_isolated, node_budget)
+    boxes, (width, height) = layered_layout(graph)
+
+    with open(output, "w") as file_out:
+        file_out.write(
+            '<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" '
+            'viewBox="0 0 %d %d">\n' % (width, height, width, height))
+        file_out.write(
+            "<title>%s</title>\n" % escape(str(graph["name"]), False))
+        file_out.write("<style>%s</style>\n" % STYLE)
+        file_out.write(
+            '<defs>\n'
+            '<marker id="extends" viewBox="0 0 10 10" refX="10" refY="5" '
+            'markerWidth="12" markerHeight="12" orient="auto">'
+            '<path d="M0,0 L10,5 L0,10 z" fill="#FFFFFF" stroke="#A80036"/>'
+            '</marker>\n'
+            '<marker id="depends" viewBox="0 0 10 10" refX="10" refY="5" '
+            'markerWidth="10" markerHeight="10" orient="auto">'
+            '<path d="M0,0 L10,5 L0,10" fill="none" stroke="#A80036"/>'
+            '</marker>\n'
+            '</defs>\n')
+        for node in graph["nodes"]:
+            write_node(node, boxes[node["id"]], file_out)
+        for edge in graph["edges"]:
+            write_edge(edge, boxes, file_out)
+        file_out.write("</svg>\n")
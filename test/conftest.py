@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+"""Fixtures shared by the tests"""
+import pytest
+
+
+@pytest.fixture
+def make_project():
+    """Function creating a small project tree under a root directory"""
+    def make(root):
+        pkg = root / "pkg"
+        (pkg / "sub").mkdir(parents=True)
+        (pkg / ".git").mkdir()
+        (pkg / "node_modules").mkdir()
+        (pkg / "__init__.py").write_text("")
+        (pkg / "core.py").write_text(
+            "class Base(object):\n"
+            "    def run(self, value):\n"
+            "        pass\n")
+        (pkg / "sub" / "__init__.py").write_text("")
+        (pkg / "sub" / "leaf.py").write_text("def helper(a, b):\n    pass\n")
+        (pkg / "sub" / "data.txt").write_text("data")
+        (pkg / "sub" / ".hidden.cfg").write_text("")
+        (pkg / ".git" / "hook.py").write_text("def hook(x):\n    pass\n")
+        (pkg / "node_modules" / "x.py").write_text("def x(y):\n    pass\n")
+        return pkg
+    return make
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+"""Test batch mapping with boring_stuff.projects.batch"""
+import json
+from boring_stuff.projects import batch
+
+
+def test_run_batch(tmp_path, make_project):
+    pkg = make_project(tmp_path)
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps({
+        "defaults": {"depend": True},
+        "targets": [
+            {"path": str(pkg), "output": str(tmp_path / "static.wsd")},
+            {"path": str(pkg), "name": "sub_only", "include": ["pkg.sub"],
+             "output": str(tmp_path / "sub.wsd")},
+            {"module": "boring_stuff.class_helper",
+             "output": str(tmp_path / "inspect.wsd")},
+            {"module": "no_such_module_xyz",
+             "output": str(tmp_path / "missing.wsd")},
+        ]}))
+    targets = batch.load_manifest(str(manifest))
+    assert targets[0]["name"] == str(pkg)
+
+    history = [{"name": "sub_only", "seconds": 1.0},
+               {"name": str(pkg), "seconds": 2.0}]
+    assert batch.schedule(targets, history) == [2, 3, 0, 1]
+
+    records = batch.run_batch(
+        targets, workers=1, cache_dir=str(tmp_path / "cache"))
+    assert [r["ok"] for r in records] == [True, True, True, False]
+    assert "class Setter" in (tmp_path / "inspect.wsd").read_text()
+    assert "pkg.core" not in (tmp_path / "sub.wsd").read_text()
+    # the second target reused the modules parsed by the first
+    assert batch._WORKER["service"].stats["parse_hits"] > 0
+
+    report = batch.format_report(records)
+    assert "4 targets, 1 failed" in report
+
+    # same results from a pool of processes
+    pool_records = batch.run_batch(targets, workers=2, history=records)
+    assert [r["ok"] for r in pool_records] == [True, True, True, False]
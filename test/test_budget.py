@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""Test the budget governor of boring_stuff.projects.budget"""
+import time
+import pytest
+from boring_stuff.projects import map as MAP
+from boring_stuff.projects import map_with_inspect as MWI
+from boring_stuff.projects.budget import Budget, BudgetExceeded
+
+
+def test_run_timeout():
+    budget = Budget(module_timeout=0.1)
+    assert budget.run(sum, [1, 2]) == 3
+    with pytest.raises(BudgetExceeded):
+        budget.run(time.sleep, 2)
+
+
+def test_map_python_truncated(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.py").write_text("def f(x):\n    pass\n")
+    (tmp_path / "sub" / "b.py").write_text("def g(x):\n    pass\n")
+
+    c_package = MAP.map_python(str(tmp_path), budget=Budget(wall_time=0))
+    assert c_package["truncated"]
+    assert c_package["modules"] == []
+
+    c_package = MAP.map_python(str(tmp_path), budget=Budget(wall_time=60))
+    assert "truncated" not in c_package
+
+
+def test_map_module_skipped(tmp_path, monkeypatch):
+    pkg = tmp_path / "budget_pkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("from . import fast, slow\n")
+    (pkg / "fast.py").write_text("def f(x):\n    pass\n")
+    (pkg / "slow.py").write_text(
+        "import time\n"
+        "def __dir__():\n"
+        "    return ['lazy']\n"
+        "def __getattr__(name):\n"
+        "    time.sleep(2)\n"
+        "    raise AttributeError(name)\n"
+        "def g(x):\n    pass\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import budget_pkg
+
+    # inspecting 'slow' hangs in its lazy __getattr__
+    c_package = MWI.map_module(budget_pkg, budget=Budget(module_timeout=0.5))
+    modules = dict((m["name"], m) for m in c_package["modules"])
+    assert "skipped" not in modules["budget_pkg.fast"]
+    assert modules["budget_pkg.slow"]["skipped"] == "timeout after 0.5 s"
+    assert c_package["truncated"] == "timeout after 0.5 s"
+
+    c_package = MWI.map_module(budget_pkg, budget=Budget(wall_time=0))
+    for module in c_package["modules"]:
+        assert module["skipped"]
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""Test the persistent cache of boring_stuff.projects.cache"""
+import os
+import sys
+import pytest
+from boring_stuff.projects import cache as CACHE
+from boring_stuff.projects import map_with_inspect as MWI
+
+
+def make_package(root, name):
+    pkg = root / name
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("from . import shapes\n")
+    (pkg / "shapes.py").write_text(
+        "SIDES = 4\n"
+        "class Square(object):\n"
+        "    def area(self, side):\n"
+        "        return side * side\n")
+    return pkg
+
+
+def test_map_module_cached(tmp_path, monkeypatch):
+    make_package(tmp_path, "cached_pkg")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    cache = CACHE.MapCache(str(tmp_path / "cache"))
+
+    cold = CACHE.map_module_cached("cached_pkg", cache)
+    assert cache.misses == 2
+    assert cold["modules"][0]["class_list"][0]["name"] == "Square"
+    assert cold["modules"][0]["variables"][0]["type"] == "<class 'int'>"
+
+    # warm run, nothing is imported
+    for name in ["cached_pkg", "cached_pkg.shapes"]:
+        monkeypatch.delitem(sys.modules, name)
+    warm = CACHE.map_module_cached("cached_pkg", cache)
+    assert cache.hits == 2
+    assert "cached_pkg" not in sys.modules
+    assert warm == cold
+
+    import cached_pkg
+    direct = CACHE._as_json(MWI.map_module(cached_pkg))
+    assert warm == direct
+
+
+def test_cache_eviction(tmp_path):
+    cache = CACHE.MapCache(str(tmp_path), max_bytes=3000)
+    for i_key in range(10):
+        cache.put("key%d" % i_key, {"data": "x" * 1000})
+    assert cache.total_bytes <= 3000
+    assert cache.get("key9") is not None
+    assert cache.get("key0") is None
+
+    # overwriting a key does not count it twice
+    size = cache.total_bytes
+    cache.put("key9", {"data": "x" * 1000})
+    assert cache.total_bytes == size
+
+    # a value that cannot be stored leaves no temporary file
+    with pytest.raises(TypeError):
+        cache.put("bad", {"data": object()})
+    assert [name for name in os.listdir(str(tmp_path))
+            if name.endswith(".tmp")] == []
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""Test the PlantUML writer in boring_stuff.uml.class_diagram"""
+import io
+from boring_stuff.projects.map import map_python
+from boring_stuff.uml import class_diagram as CD
+
+
+def test_draw_level_of_detail(tmp_path, make_project):
+    pkg = make_project(tmp_path)
+    (pkg / "core.py").write_text(
+        "class Base(object):\n"
+        "    def run(self, value):\n"
+        "        pass\n"
+        "    def stop(self):\n"
+        "        pass\n"
+        "    def reset(self):\n"
+        "        pass\n\n"
+        "class Child(Base):\n"
+        "    pass\n\n"
+        "class Lonely(object):\n"
+        "    pass\n")
+    (pkg / "sub" / "leaf.py").write_text(
+        "from ..core import Base\n\ndef helper(a, b):\n    pass\n")
+    c_package = map_python(str(pkg))
+
+    # pkg, core (+3 classes), sub, leaf (+functions)
+    assert CD.count_nodes(c_package) == 8
+    assert CD.count_nodes(c_package, collapse_depth=0) == 3
+    assert CD.count_nodes(c_package, hide_isolated=True) == 7
+    assert CD.fit_depth(c_package, 8) is None
+    assert CD.fit_depth(c_package, 7) == 1
+    assert CD.fit_depth(c_package, 6) == 0
+
+    output = str(tmp_path / "gen.wsd")
+    CD.write_class_diagram(c_package, output, draw_depend=True, node_budget=5)
+    text = open(output).read()
+    assert "package pkg.sub <<collapsed: 2 modules, 0 classes, " \
+        "1 functions>>" in text
+    assert "pkg.sub.leaf" not in text and "class Base" not in text
+    assert "pkg.core <|.down. pkg.sub\n" in text
+
+    CD.write_class_diagram(
+        c_package, output, max_members=2, hide_isolated=True)
+    text = open(output).read()
+    assert "reset" not in text and ".. +1 more .." in text
+    assert "class Child" in text and "Lonely" not in text
+
+
+def test_collapse_depth_not_indentation(tmp_path, make_project):
+    pkg = make_project(tmp_path)
+    c_package = map_python(str(pkg))
+    tracker = CD.make_tracker(c_package, collapse_depth=1)
+
+    # nested in an outer block: indented, but still the top of the tree
+    file_out = io.StringIO()
+    CD.write_package(c_package, file_out, n_tab=2, tracker=tracker)
+    text = file_out.getvalue()
+    assert "package pkg.sub {" in text
+    assert "class Base" in text
+    assert "package pkg.sub.leaf <<collapsed" in text
+
+
+def test_limit_members():
+    groups = [["a", "b"], ["c"], ["d", "e"]]
+    assert CD.limit_members(groups) == (groups, 0)
+    assert CD.limit_members(groups, 3) == ([["a", "b"], ["c"], []], 2)
+    assert CD.limit_members(groups, 1) == ([["a"], [], []], 4)
+    assert CD.limit_members(groups, 0) == ([[], [], []], 5)
+    assert CD.limit_members(groups, 10) == (groups, 0)
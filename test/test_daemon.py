@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""Test the mapping daemon of boring_stuff.projects.daemon"""
+import os
+import threading
+import pytest
+from boring_stuff.projects import daemon
+from boring_stuff.projects.name_filter import NameFilter
+
+
+def test_service_cache(tmp_path, make_project):
+    pkg = make_project(tmp_path)
+    service = daemon.MapService()
+    request = {"op": "render", "path": str(pkg)}
+
+    first = service.handle(request)
+    assert first["ok"]
+    assert "class Base" in first["result"]["text"]
+    second = service.handle(request)
+    assert second == first
+    assert service.stats["parse_hits"] == service.stats["parse_misses"] == 4
+    assert service.stats["render_hits"] == 1
+
+    # a changed file is parsed and rendered again
+    core = pkg / "core.py"
+    core.write_text(core.read_text() + "\nclass Extra(Base):\n    pass\n")
+    os.utime(str(core), ns=(1, 1))
+    third = service.handle(request)
+    assert "class Extra" in third["result"]["text"]
+    assert service.stats["parse_misses"] == 5
+
+    query = service.handle({"op": "query", "path": str(pkg), "name": "Base"})
+    assert query["result"] == [
+        {"type": "class", "name": "pkg.core.Base", "module": "pkg.core"}]
+    assert not service.handle({"op": "nope"})["ok"]
+
+
+def test_cached_modules_not_shared(tmp_path, make_project):
+    pkg = make_project(tmp_path)
+    (pkg / "sub" / "leaf.py").write_text(
+        "from ..core import Base\n\nclass Leaf(Base):\n    pass\n")
+    service = daemon.MapService()
+    first = service.map_path({"path": str(pkg)})[0]
+    leaf = first["subpackages"][0]["modules"][1]["class_list"][0]
+    assert leaf["parent_ids"] == ["pkg.core.Base"]
+
+    # the parents resolved again, without pkg.core, in another tree
+    service.map_path({"path": str(pkg)}, name_filter=NameFilter(["pkg.sub"]))
+    assert leaf["parent_ids"] == ["pkg.core.Base"]
+
+
+def test_server(tmp_path, make_project):
+    pkg = make_project(tmp_path)
+    socket_path = str(tmp_path / "daemon.sock")
+
+    # no daemon, run in-process or fail
+    assert daemon.call("ping", socket_path) == "pong"
+    try:
+        daemon.call("ping", socket_path, fallback=False)
+        assert False, "expected DaemonError"
+    except daemon.DaemonError:
+        pass
+
+    server = daemon.MapServer(socket_path)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        results = []
+
+        def worker():
+            results.append(daemon.call(
+                "map", socket_path, fallback=False, path=str(pkg)))
+        workers = [threading.Thread(target=worker) for _ in range(8)]
+        for c_worker in workers:
+            c_worker.start()
+        for c_worker in workers:
+            c_worker.join()
+        assert len(results) == 8
+        assert all(result == results[0] for result in results)
+        assert results[0]["name"] == "pkg"
+
+        stats = daemon.call("stats", socket_path, fallback=False)
+        # 8 maps and the stats request itself
+        assert stats["requests"] == 9
+        assert stats["parse_hits"] > 0
+    finally:
+        daemon.call("shutdown", socket_path, fallback=False)
+        thread.join(5)
+        server.server_close()
+    assert not os.path.exists(socket_path)
+
+
+def test_private_socket(tmp_path, monkeypatch):
+    # the socket is private as soon as it is bound, not after the chmod
+    socket_path = str(tmp_path / "daemon.sock")
+    monkeypatch.setattr(daemon.os, "chmod", lambda path, mode: None)
+    server = daemon.MapServer(socket_path)
+    try:
+        assert os.stat(socket_path).st_mode & 0o077 == 0
+    finally:
+        server.server_close()
+
+
+def test_foreign_socket(tmp_path, monkeypatch):
+    socket_path = str(tmp_path / "daemon.sock")
+    server = daemon.MapServer(socket_path)
+    try:
+        # seen from another user, the socket is neither used nor removed
+        uid = os.getuid()
+        monkeypatch.setattr(daemon.os, "getuid", lambda: uid + 1)
+        assert daemon._connect(socket_path) is None
+        with pytest.raises(daemon.DaemonError):
+            daemon.call("ping", socket_path, fallback=False)
+        with pytest.raises(daemon.DaemonError):
+            daemon.MapServer(socket_path)
+        assert os.path.exists(socket_path)
+    finally:
+        monkeypatch.undo()
+        server.server_close()
+
+    # a directory others can write to is refused
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(daemon.DaemonError):
+        daemon.MapServer(str(shared / "daemon.sock"))
+
+
+def test_parsed_lru(tmp_path, make_project):
+    pkg = make_project(tmp_path)
+    service = daemon.MapService(max_parsed=2, max_rendered=1)
+    service.handle({"op": "map", "path": str(pkg)})
+    assert len(service.parsed) == 2
+
+    for draw_depend in [False, True, False]:
+        service.handle(
+            {"op": "render", "path": str(pkg), "draw_depend": draw_depend})
+    assert list(service.rendered)[0][2] is False
+    assert service.stats["render_misses"] == 3
+
+
+def test_default_socket(monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", "/run/user/1")
+    assert daemon.DEFAULT_SOCKET == "/run/user/1/boring_stuff.sock"
+    # no os.getuid on Windows
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    monkeypatch.delattr(daemon.os, "getuid")
+    monkeypatch.setattr(daemon.getpass, "getuser", lambda: "someone")
+    assert daemon.default_socket().endswith(
+        os.path.join("boring_stuff-someone", "boring_stuff.sock"))
+
+
+def test_inspect_copies():
+    service = daemon.MapService()
+    request = {"op": "inspect", "module": "boring_stuff.class_helper"}
+    first = service.handle(request)["result"]
+    first["name"] = "changed"
+    second = service.handle(request)["result"]
+    assert service.stats["inspect_hits"] == 1
+    assert second["name"] == "boring_stuff.class_helper"
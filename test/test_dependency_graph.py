@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""Test the analytics of boring_stuff.projects.dependency_graph"""
+import numpy as np
+from boring_stuff.projects.dependency_graph import DependencyGraph
+
+
+def brute_force_reach(n_nodes, edges):
+    """Reachability matrix by repeated squaring"""
+    reach = np.eye(n_nodes, dtype=bool)
+    for source, target in edges:
+        reach[source, target] = True
+    for _ in range(int(np.ceil(np.log2(max(n_nodes, 2))))):
+        reach = reach | (reach.astype(int).dot(reach.astype(int)) > 0)
+    return reach
+
+
+def test_cycles_and_layers():
+    edges = [
+        ["app", "core"], ["app", "util"], ["core", "util"],
+        ["a", "b"], ["b", "c"], ["c", "a"], ["c", "core"],
+        ["selfish", "selfish"],
+    ]
+    graph = DependencyGraph(edges, ["lonely"])
+    assert graph.cycles() == [["a", "b", "c"], ["selfish"]]
+
+    layers = graph.layers()
+    assert layers["util"] == 0 and layers["lonely"] == 0
+    assert layers["core"] == 1
+    assert layers["app"] == 2
+    assert layers["a"] == layers["b"] == layers["c"] == 2
+
+    blast = graph.blast_radius()
+    assert blast["util"] == 5
+    assert blast["a"] == 2
+    assert blast["app"] == 0
+    assert graph.reaches("a", "util")
+    assert not graph.reaches("util", "a")
+
+
+def test_random_closure():
+    rng = np.random.RandomState(1)
+    n_nodes = 300
+    src = rng.randint(0, n_nodes, 900)
+    dst = rng.randint(0, n_nodes, 900)
+    # mostly downward with a few cycles
+    dst = np.where(rng.random_sample(900) < 0.9, src // 2, dst)
+    edges = list(zip(src.tolist(), dst.tolist()))
+
+    graph = DependencyGraph(edges, list(range(n_nodes)))
+    expected = brute_force_reach(n_nodes, edges)
+
+    reach = graph.transitive_closure()
+    comp = graph.components
+    bits = np.unpackbits(
+        reach.view(np.uint8), axis=1, bitorder="little")[:, :reach.shape[0]]
+    assert (bits[comp][:, comp] == expected).all()
+
+    # small chunks go through the chunked and pruned path
+    n_dependents, n_dependencies = graph.reach_counts(chunk_bits=64)
+    assert (n_dependents == expected.sum(axis=0) - 1).all()
+    assert (n_dependencies == expected.sum(axis=1) - 1).all()
+
+
+def test_annotate(tmp_path):
+    from boring_stuff.uml.class_diagram import write_class_diagram
+    c_package = {
+        "type": "package", "name": "pkg", "subpackages": [], "modules": [
+            {"type": "module", "name": "pkg.a", "methods": [
+                {"name": "f", "params": [], "access": "public"}],
+             "dependencies": [["pkg.a", "pkg.b"]]},
+            {"type": "module", "name": "pkg.b", "methods": [
+                {"name": "g", "params": [], "access": "public"}],
+             "dependencies": [["pkg.b", "pkg.a"]]},
+        ]}
+    graph = DependencyGraph.from_spec(c_package)
+    graph.annotate(c_package)
+    assert c_package["modules"][0]["analytics"]["cycle"] == 0
+
+    output = str(tmp_path / "gen.wsd")
+    write_class_diagram(c_package, output, draw_depend=True)
+    text = open(output).read()
+    assert "package pkg.a <<layer 0, blast radius 1>> #FFCCCC {" in text
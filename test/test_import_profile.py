@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""Test boring_stuff.projects.import_profile"""
+import importlib
+import sys
+from boring_stuff.projects import map_with_inspect as MWI
+from boring_stuff.projects.import_profile import ImportProfiler
+
+
+def make_package(root):
+    pkg = root / "profiled_pkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("")
+    (pkg / "slow.py").write_text(
+        "import time\n"
+        "from . import z_heavy\n"
+        "time.sleep(0.05)\n"
+        "def f(x):\n"
+        "    pass\n")
+    (pkg / "z_heavy.py").write_text(
+        "DATA = [str(i) for i in range(5000)]\n"
+        "def g(x):\n"
+        "    pass\n")
+    return pkg
+
+
+def test_import_profile(tmp_path, monkeypatch, capsys):
+    make_package(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    profiler = ImportProfiler(trace_memory=True)
+    with profiler:
+        mod = importlib.import_module("profiled_pkg")
+    c_package = MWI.map_module(mod, import_workers=1, import_profile=profiler)
+    assert profiler._finder not in sys.meta_path
+
+    slow = profiler.records["profiled_pkg.slow"]
+    heavy = profiler.records["profiled_pkg.z_heavy"]
+    assert slow["self_time"] >= 0.05
+    assert slow["time"] >= slow["self_time"] + heavy["time"] - 1e-6
+    assert heavy["memory"] > 100000
+    assert slow["self_memory"] < heavy["memory"]
+    assert profiler.report(top=1)[0][0] == "profiled_pkg.slow"
+
+    # the real loader is restored
+    loader = sys.modules["profiled_pkg.slow"].__loader__
+    assert type(loader).__name__ == "SourceFileLoader"
+
+    modules = dict((m["name"], m) for m in c_package["modules"])
+    assert modules["profiled_pkg.slow"]["import_cost"]["self_time"] >= 0.05
+
+    from boring_stuff.uml.class_diagram import write_class_diagram
+    output = str(tmp_path / "gen.wsd")
+    write_class_diagram(c_package, output, draw_import_cost=True)
+    assert "package profiled_pkg.slow <<import" in open(output).read()
+    assert "#FF0000" in open(output).read()
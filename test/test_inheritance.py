@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""Test the parent resolution of boring_stuff.parser.inheritance"""
+from boring_stuff.parser.inheritance import ClassIndex, resolve_parents
+from boring_stuff.projects.map import map_python
+from boring_stuff.uml.class_diagram import write_class_diagram
+
+
+def map_hierarchy(pkg, single_pass=True):
+    (pkg / "__init__.py").write_text("from .core import Base\n")
+    (pkg / "core.py").write_text(
+        "class Base(object):\n"
+        "    pass\n\n"
+        "class Child(Base):\n"
+        "    pass\n")
+    (pkg / "other.py").write_text(
+        "class Base(object):\n"
+        "    pass\n\n"
+        "class Mixin(object):\n"
+        "    pass\n")
+    (pkg / "sub" / "leaf.py").write_text(
+        "from .. import Base as B\n"
+        "from .. import core\n"
+        "from ..other import *\n"
+        "import pkg.other\n\n"
+        "class Leaf(B):\n"
+        "    pass\n\n"
+        "class Dotted(core.Base, pkg.other.Base):\n"
+        "    class Inner(object):\n"
+        "        pass\n\n"
+        "    class Nested(Inner):\n"
+        "        pass\n\n"
+        "class Star(Mixin, ValueError):\n"
+        "    pass\n")
+    return map_python(str(pkg), single_pass=single_pass)
+
+
+def test_resolve_parents(tmp_path, make_project):
+    c_package = map_hierarchy(make_project(tmp_path))
+    # resolved at map time already
+    core = c_package["modules"][1]
+    assert core["class_list"][1]["parent_ids"] == ["pkg.core.Base"]
+    edges = resolve_parents(c_package)
+    assert sorted(edges) == [
+        ["pkg.core.Child", "pkg.core.Base"],
+        ["pkg.sub.leaf.Dotted", "pkg.core.Base"],
+        ["pkg.sub.leaf.Dotted", "pkg.other.Base"],
+        ["pkg.sub.leaf.Dotted.Nested", "pkg.sub.leaf.Dotted.Inner"],
+        ["pkg.sub.leaf.Leaf", "pkg.core.Base"],
+        ["pkg.sub.leaf.Star", "pkg.other.Mixin"]]
+    leaf = c_package["subpackages"][0]["modules"][1]
+    assert [class_spec["parent_ids"] for class_spec in leaf["class_list"]][
+        -1] == ["pkg.other.Mixin", None]
+
+    # the regex parser keeps dotted and multiple bases too
+    (tmp_path / "regex").mkdir()
+    c_package = map_hierarchy(
+        make_project(tmp_path / "regex"), single_pass=False)
+    assert sorted(resolve_parents(c_package)) == [
+        ["pkg.core.Child", "pkg.core.Base"],
+        ["pkg.sub.leaf.Dotted", "pkg.core.Base"],
+        ["pkg.sub.leaf.Dotted", "pkg.other.Base"],
+        ["pkg.sub.leaf.Leaf", "pkg.core.Base"],
+        ["pkg.sub.leaf.Nested", "pkg.sub.leaf.Inner"],
+        ["pkg.sub.leaf.Star", "pkg.other.Mixin"]]
+    leaf = c_package["subpackages"][0]["modules"][1]
+    assert leaf["class_list"][1]["parent"] == [
+        "core.Base", "pkg.other.Base"]
+    assert leaf["class_list"][0]["parent"] == ["B"]
+
+    index = ClassIndex(c_package)
+    assert index.resolve("pkg.sub.leaf", "B") == "pkg.core.Base"
+    assert index.resolve("pkg.sub.leaf", "Generic[T]") is None
+    assert index.resolve("pkg.core", "Base") == "pkg.core.Base"
+
+
+def test_draw_resolved_parents(tmp_path, make_project):
+    c_package = map_hierarchy(make_project(tmp_path))
+    output = str(tmp_path / "gen.wsd")
+    write_class_diagram(c_package, output)
+    text = open(output).read()
+    assert "Base <|-down- Child\n" in text
+    assert "pkg.core.Base <|-down- pkg.sub.leaf.Leaf\n" in text
+    assert "pkg.other.Base <|-down- pkg.sub.leaf.Dotted\n" in text
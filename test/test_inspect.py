@@ -71,3 +71,140 @@ def test_class_mapping():
     var_list = ["var1"]
     for v in cls_spec["attributes"]:
         assert v["name"] in var_list
+
+
+def test_preimport_submodules(tmp_path, monkeypatch):
+    pkg = tmp_path / "preimport_pkg"
+    (pkg / "sub").mkdir(parents=True)
+    (pkg / "__init__.py").write_text("")
+    (pkg / "__main__.py").write_text("raise SystemExit(1)\n")
+    (pkg / "sub" / "__init__.py").write_text("")
+    for i_mod in range(8):
+        (pkg / ("leaf%d.py" % i_mod)).write_text(
+            "class Leaf%d(object):\n    pass\n" % i_mod)
+        (pkg / "sub" / ("deep%d.py" % i_mod)).write_text(
+            "def deep(a):\n    return a\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    import preimport_pkg
+    names = MWI.preimport_submodules(preimport_pkg, workers=4)
+    assert len(names) == 17
+    assert "preimport_pkg.__main__" not in names
+    assert "preimport_pkg.sub.deep7" in sys.modules
+
+    c_package = MWI.map_module(preimport_pkg, import_workers=4)
+    assert len(c_package["modules"]) == 8
+    assert c_package["subpackages"][0]["name"] == "preimport_pkg.sub"
+
+
+def test_lean_and_unload(tmp_path, monkeypatch):
+    import gc
+    import importlib
+    import weakref
+    pkg = tmp_path / "lean_pkg"
+    (pkg / "sub").mkdir(parents=True)
+    (pkg / "__init__.py").write_text("from . import a, sub\n")
+    (pkg / "a.py").write_text(
+        "LIMIT = 10\n"
+        "class A(object):\n"
+        "    size = 1.5\n"
+        "    def run(self, x):\n"
+        "        pass\n")
+    (pkg / "sub" / "__init__.py").write_text("from . import b\n")
+    (pkg / "sub" / "b.py").write_text("NAME = 'b'\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    unloader = MWI.ModuleUnloader()
+    lean_pkg = importlib.import_module("lean_pkg")
+    class_ref = weakref.ref(lean_pkg.a.A)
+    c_package = MWI.map_module(lean_pkg, lean=True, unload=unloader)
+
+    modules = dict((m["name"], m) for m in c_package["modules"])
+    assert modules["lean_pkg.a"]["variables"][0]["type"] == "<class 'int'>"
+    attributes = modules["lean_pkg.a"]["class_list"][0]["attributes"]
+    assert attributes[0]["type"] == "<class 'float'>"
+    assert c_package["subpackages"][0]["modules"][0]["name"] == \
+        "lean_pkg.sub.b"
+
+    # the submodules are gone, only the package itself is kept
+    assert unloader.unloaded == 3
+    assert "lean_pkg" in sys.modules
+    assert "lean_pkg.a" not in sys.modules
+    assert "lean_pkg.sub.b" not in sys.modules
+    assert not hasattr(lean_pkg, "a")
+    gc.collect()
+    assert class_ref() is None
+    del sys.modules["lean_pkg"]
+
+    # the modules imported before the unloader are kept
+    unloader = MWI.ModuleUnloader()
+    from boring_stuff.class_helper import setter
+    MWI.map_module(importlib.import_module("boring_stuff"), unload=unloader)
+    assert unloader.unloaded == 0
+    assert sys.modules["boring_stuff.class_helper.setter"] is setter
+
+
+def test_lazy_package(tmp_path, monkeypatch):
+    import boring_stuff
+    from boring_stuff.projects.lazy_package import LazyPackage
+    assert LazyPackage(boring_stuff).materialize() == \
+        MWI.map_module(boring_stuff)
+
+    pkg = tmp_path / "lazy_pkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("from . import one, two\n")
+    for name in ["one", "two"]:
+        (pkg / (name + ".py")).write_text(
+            "class First(object):\n"
+            "    def run(self, x):\n"
+            "        pass\n"
+            "class Second(object):\n"
+            "    pass\n"
+            "def helper(a, b):\n"
+            "    pass\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import lazy_pkg
+
+    mapped = []
+    map_class = MWI.map_class
+
+    def counting_map_class(cls, *args):
+        mapped.append("%s.%s" % (cls.__module__, cls.__name__))
+        return map_class(cls, *args)
+    monkeypatch.setattr(MWI, "map_class", counting_map_class)
+
+    tree = LazyPackage(lazy_pkg)
+    assert tree.type == "package"
+    assert [child.name for child in tree.modules] == [
+        "lazy_pkg.one", "lazy_pkg.two"]
+    assert mapped == []
+
+    class_spec = tree.find("lazy_pkg.two.First")
+    assert "run" in [m["name"] for m in class_spec["methods"]]
+    assert tree.find("lazy_pkg.two.First") is class_spec
+    assert tree.find("lazy_pkg.two.helper")["params"] == ["a", "b"]
+    assert tree.find("lazy_pkg.three") is None
+    assert mapped == ["lazy_pkg.two.First"]
+
+    c_package = tree.materialize()
+    assert len(mapped) == 4
+    assert c_package == MWI.map_module(lazy_pkg)
+
+
+def test_parent_qualnames(tmp_path, monkeypatch):
+    pkg = tmp_path / "qual_pkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("from . import a, b, c\n")
+    for name in ["a", "b"]:
+        (pkg / (name + ".py")).write_text("class Base(object):\n    pass\n")
+    (pkg / "c.py").write_text(
+        "from .b import Base as BB\n\nclass Child(BB):\n    pass\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    import qual_pkg
+    c_package = MWI.map_module(qual_pkg)
+    child = [module for module in c_package["modules"]
+             if module["name"] == "qual_pkg.c"][0]["class_list"][0]
+    assert child["parent"] == ["Base"]
+    assert child["parent_qualnames"] == ["qual_pkg.b.Base"]
+    assert child["parent_ids"] == ["qual_pkg.b.Base"]
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""Test mapping a project directory with boring_stuff.projects.map"""
+import os
+from boring_stuff.projects import map as MAP
+
+
+def test_map_python(tmp_path, make_project):
+    pkg = make_project(tmp_path)
+    c_package = MAP.map_python(str(pkg))
+
+    assert c_package["name"] == "pkg"
+    assert [m["name"] for m in c_package["modules"]] == \
+        ["pkg.__init__", "pkg.core"]
+    assert [s["name"] for s in c_package["subpackages"]] == ["pkg.sub"]
+
+    # hidden files are kept, only hidden directories are ignored
+    sub = c_package["subpackages"][0]
+    assert sub["misc"] == [
+        str(pkg / "sub" / ".hidden.cfg"), str(pkg / "sub" / "data.txt")]
+
+    sub = MAP.map_python(str(pkg), keep_misc=False)["subpackages"][0]
+    assert sub["misc"] == []
+
+
+def test_ignore_patterns(tmp_path, make_project):
+    pkg = make_project(tmp_path)
+    c_package = MAP.map_python(
+        str(pkg), ignore=MAP.IGNORE_DIRS + ["sub/", "!node_modules"],
+        keep_misc=False)
+
+    assert [s["name"] for s in c_package["subpackages"]] == \
+        ["pkg.node_modules"]
+
+    rules = MAP.compile_ignore(["/top.py", "a/**/gen_*.py", "*.pyc"])
+    assert MAP.is_ignored(rules, "top.py")
+    assert not MAP.is_ignored(rules, "x/top.py")
+    assert MAP.is_ignored(rules, "a/b/c/gen_x.py")
+    assert MAP.is_ignored(rules, "deep/mod.pyc")
+
+
+def test_virtualenv(tmp_path, make_project):
+    pkg = make_project(tmp_path)
+    (pkg / "venv").mkdir()
+    (pkg / "venv" / "mod.py").write_text("def f(a):\n    pass\n")
+    (pkg / "env" / "lib").mkdir(parents=True)
+    (pkg / "env" / "pyvenv.cfg").write_text("home = /usr/bin\n")
+    (pkg / "env" / "lib" / "site.py").write_text("def g(b):\n    pass\n")
+
+    # a subpackage named venv is mapped, a real virtualenv is not
+    c_package = MAP.map_python(str(pkg))
+    assert [s["name"] for s in c_package["subpackages"]] == \
+        ["pkg.sub", "pkg.venv"]
+
+    import asyncio
+    from boring_stuff.projects.map_async import map_python_async
+    assert asyncio.run(map_python_async(str(pkg))) == c_package
+
+
+def test_symlink_loop(tmp_path, make_project):
+    pkg = make_project(tmp_path)
+    os.symlink(str(pkg), str(pkg / "sub" / "loop"))
+
+    c_package = MAP.map_python(str(pkg))
+    sub = c_package["subpackages"][0]
+    assert sub["subpackages"] == []
+
+
+def test_map_python_async(tmp_path, monkeypatch, make_project):
+    import asyncio
+    import threading
+    import time
+    from boring_stuff.projects import map_async
+
+    pkg = make_project(tmp_path)
+    for i_mod in range(20):
+        (pkg / ("mod_%02d.py" % i_mod)).write_text("def f(a):\n    pass\n")
+    expected = MAP.map_python(str(pkg))
+
+    # slow filesystem stand-in, count the reads waiting at the same time
+    read_file = map_async._read_file
+    lock = threading.Lock()
+    reads = {"active": 0, "overlap": 0}
+
+    def slow_read(filename):
+        with lock:
+            reads["active"] += 1
+            reads["overlap"] = max(reads["overlap"], reads["active"])
+        time.sleep(0.05)
+        with lock:
+            reads["active"] -= 1
+        return read_file(filename)
+    monkeypatch.setattr(map_async, "_read_file", slow_read)
+
+    c_package = asyncio.run(
+        map_async.map_python_async(str(pkg), concurrency=32))
+
+    assert c_package == expected
+    assert reads["overlap"] > 1
+
+
+def test_draw_static_dependencies(tmp_path, make_project):
+    from boring_stuff.uml.class_diagram import write_class_diagram
+    pkg = make_project(tmp_path)
+    (pkg / "sub" / "leaf.py").write_text(
+        "from ..core import Base\n\ndef helper(a, b):\n    pass\n")
+    c_package = MAP.map_python(str(pkg))
+
+    output = str(tmp_path / "gen.wsd")
+    write_class_diagram(c_package, output, draw_depend=True)
+    assert "pkg.core <|.down. pkg.sub.leaf" in open(output).read()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""Test mapping archives with boring_stuff.projects.map_archive"""
+import os
+import tarfile
+import zipfile
+from boring_stuff.projects import map as MAP
+from boring_stuff.projects.map_archive import map_archive
+from boring_stuff.projects.name_filter import NameFilter
+
+
+def strip_misc(c_package):
+    """Keep the file names of the misc paths"""
+    c_package["misc"] = [os.path.basename(path) for path in c_package["misc"]]
+    for subpackage in c_package["subpackages"]:
+        strip_misc(subpackage)
+    return c_package
+
+
+def make_archives(tmp_path, pkg):
+    (pkg / "core.py").write_text(
+        "from .sub import leaf\n" + (pkg / "core.py").read_text())
+
+    wheel = str(tmp_path / "pkg-1.0-py3-none-any.whl")
+    sdist = str(tmp_path / "pkg-1.0.tar.gz")
+    with zipfile.ZipFile(wheel, "w") as zip_out, \
+            tarfile.open(sdist, "w:gz") as tar_out:
+        for c_dir, _, files in os.walk(str(pkg)):
+            for name in files:
+                path = os.path.join(c_dir, name)
+                arc_name = os.path.relpath(path, str(tmp_path / "src"))
+                zip_out.write(path, arc_name)
+                tar_out.add(path, "pkg-1.0/" + arc_name)
+        zip_out.writestr("pkg-1.0.dist-info/METADATA", "Name: pkg\n")
+        zip_out.writestr("pkg-1.0.dist-info/RECORD", "")
+    return pkg, wheel, sdist
+
+
+def test_map_archive(tmp_path, make_project):
+    pkg, wheel, sdist = make_archives(
+        tmp_path, make_project(tmp_path / "src"))
+    expected = strip_misc(MAP.map_python(str(pkg), keep_misc=True))
+
+    from_wheel = map_archive(wheel, keep_misc=True)
+    assert from_wheel["subpackages"][0]["misc"] == [
+        wheel + "/pkg/sub/.hidden.cfg", wheel + "/pkg/sub/data.txt"]
+    assert strip_misc(from_wheel) == expected
+    assert strip_misc(map_archive(sdist, keep_misc=True)) == expected
+    assert strip_misc(map_archive(
+        sdist, root="pkg-1.0/pkg", keep_misc=True)) == expected
+
+    name_filter = NameFilter(exclude=["sub"])
+    assert strip_misc(map_archive(wheel, name_filter=name_filter)) == \
+        strip_misc(MAP.map_python(str(pkg), name_filter=name_filter))
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""Test the checkpointed mapping of boring_stuff.projects.map_environment"""
+import os
+import shutil
+from boring_stuff.projects import map_environment as ME
+
+
+def make_dist(site, name, version, top_level=None, record=None):
+    info = site / ("%s-%s.dist-info" % (name, version))
+    info.mkdir()
+    (info / "METADATA").write_text(
+        "Metadata-Version: 2.1\nName: %s\nVersion: %s\n" % (name, version))
+    if top_level is not None:
+        (info / "top_level.txt").write_text(top_level)
+    if record is not None:
+        (info / "RECORD").write_text(record)
+
+
+def make_site(root):
+    """site-packages with a package, a module and two broken packages"""
+    site = root / "site-packages"
+    (site / "alpha").mkdir(parents=True)
+    (site / "alpha" / "__init__.py").write_text(
+        "from . import core\nVERSION = '1.0'\n")
+    (site / "alpha" / "core.py").write_text(
+        "LIMIT = 3\nNAMES = ['a']\n\n"
+        "class Base(object):\n    size = 1\n\n"
+        "    def run(self):\n        pass\n")
+    make_dist(site, "alpha", "1.0", top_level="alpha\n")
+
+    (site / "beta.py").write_text("def beta(a):\n    pass\n")
+    make_dist(site, "Beta_Mod", "2.0", record=(
+        "beta.py,,\nBeta_Mod-2.0.dist-info/METADATA,,\n"))
+
+    for name, source in [("crash", "import os\nos._exit(3)\n"),
+                         ("hang", "import time\ntime.sleep(60)\n")]:
+        (site / name).mkdir()
+        (site / name / "__init__.py").write_text(source)
+        make_dist(site, name, "0.1", top_level=name + "\n")
+    return site
+
+
+def test_resume_and_index(tmp_path):
+    site = make_site(tmp_path)
+    dists = ME.list_distributions(str(site))
+    assert [(d["name"], d["top_level"]) for d in dists] == [
+        ("alpha", ["alpha"]), ("beta-mod", ["beta"]), ("crash", ["crash"]),
+        ("hang", ["hang"])]
+
+    checkpoint = str(tmp_path / "checkpoint")
+    records = ME.map_environment(str(site), checkpoint, names=["Alpha"])
+    assert [(r["name"], r["status"], r["classes"]) for r in records] == [
+        ("alpha", "ok", 1)]
+    first = ME.CheckpointStore(checkpoint).load(dists[0])
+
+    # interrupted after alpha: the next run maps the others only
+    records = ME.map_environment(str(site), checkpoint, workers=2)
+    assert sorted(r["name"] for r in records) == ["beta-mod", "crash", "hang"]
+    store = ME.CheckpointStore(checkpoint)
+    assert store.load(dists[0]) == first
+    assert ME.map_environment(str(site), checkpoint) == []
+
+    index = ME.build_index(store, str(tmp_path / "index.json"))
+    assert index["owners"] == {
+        "alpha": "alpha", "beta": "beta-mod", "crash": "crash",
+        "hang": "hang"}
+    assert index["failed"] == []
+    merged = ME.merge_packages(store)
+    assert [p["name"] for p in merged["subpackages"]] == [
+        "alpha", "crash", "hang"]
+    assert merged["modules"][0]["methods"][0]["name"] == "beta"
+
+
+def test_isolated_failures(tmp_path):
+    site = make_site(tmp_path)
+    checkpoint = str(tmp_path / "checkpoint")
+    # 'hang' sleeps for 60 s, the timeout leaves 'alpha' room on a slow
+    # runner
+    records = ME.map_environment(
+        str(site), checkpoint, workers=2, method="inspect", timeout=10,
+        names=["crash", "hang", "alpha"])
+    status = dict((r["name"], (r["status"], r["error"])) for r in records)
+    assert status["alpha"] == ("ok", None)
+    assert status["crash"] == ("failed", "worker exited with code 3")
+    assert status["hang"][1].startswith("worker timed out")
+    assert [f for f in os.listdir(checkpoint) if f.endswith(".tmp")] == []
+
+    # failed distributions are kept unless retried
+    assert ME.map_environment(str(site), checkpoint, method="inspect",
+                              names=["crash"]) == []
+    records = ME.map_environment(
+        str(site), checkpoint, method="inspect", names=["crash"],
+        retry_failed=True)
+    assert [r["name"] for r in records] == ["crash"]
+    assert ME.build_index(ME.CheckpointStore(checkpoint))["failed"] == [
+        "crash", "hang"]
+
+
+def test_stale_and_corrupt_records(tmp_path):
+    site = make_site(tmp_path)
+    checkpoint = str(tmp_path / "checkpoint")
+    ME.map_environment(str(site), checkpoint, names=["alpha", "beta-mod"])
+    store = ME.CheckpointStore(checkpoint)
+
+    # upgraded: only the record of the new version is kept
+    old = store.load(ME.list_distributions(str(site))[0])
+    (site / "alpha-1.0.dist-info").rename(site / "alpha-2.0.dist-info")
+    (site / "alpha-2.0.dist-info" / "METADATA").write_text(
+        "Metadata-Version: 2.1\nName: alpha\nVersion: 2.0\n")
+    # same prefix, another distribution
+    store.save(dict(old, name="alpha-beta", version="0.1"))
+    records = ME.map_environment(str(site), checkpoint, names=["alpha"])
+    assert [(r["name"], r["version"]) for r in records] == [("alpha", "2.0")]
+    assert [(r["name"], r["version"]) for r in store.records()] == [
+        ("alpha", "2.0"), ("alpha-beta", "0.1"), ("beta-mod", "2.0")]
+
+    # unreadable record: skipped by the index, mapped again
+    with open(os.path.join(checkpoint, "beta-mod-2.0.json"), "w") as file_out:
+        file_out.write("{broken")
+    assert [r["name"] for r in store.records()] == ["alpha", "alpha-beta"]
+    records = ME.map_environment(str(site), checkpoint, names=["beta-mod"])
+    assert [r["name"] for r in records] == ["beta-mod"]
+
+    # a full run drops the distributions that are not installed
+    for name in ["crash", "hang"]:
+        shutil.rmtree(str(site / name))
+        shutil.rmtree(str(site / ("%s-0.1.dist-info" % name)))
+    assert ME.map_environment(str(site), checkpoint) == []
+    index = ME.build_index(store)
+    assert [r["name"] for r in index["distributions"]] == ["alpha", "beta-mod"]
+    assert index["owners"] == {"alpha": "alpha", "beta": "beta-mod"}
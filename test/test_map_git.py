@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""Test the incremental mapping of boring_stuff.projects.map_git"""
+import json
+import shutil
+import subprocess
+import pytest
+from boring_stuff.projects import map_git as MG
+from boring_stuff.projects.map import map_python
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("git") is None, reason="git is not installed")
+
+
+def git(repo, *args):
+    subprocess.run(
+        ["git", "-C", str(repo), "-c", "user.name=test",
+         "-c", "user.email=test@example.com"] + list(args),
+        check=True, stdout=subprocess.PIPE)
+
+
+def test_update_map(tmp_path, make_project):
+    pkg = make_project(tmp_path)
+    (pkg / "sub" / "deep").mkdir()
+    (pkg / "sub" / "deep" / "gone.py").write_text("def gone():\n    pass\n")
+    (pkg / "sub" / "old.py").write_text("class Old(object):\n    pass\n")
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "add", "pkg")
+    git(tmp_path, "commit", "-q", "-m", "base")
+    commit = MG.resolve_commit(str(pkg))
+
+    saved = str(tmp_path / "base.json")
+    MG.save_map(map_python(str(pkg)), saved, commit=commit)
+
+    # modify, add (tracked and untracked), delete and rename
+    (pkg / "core.py").write_text(
+        "class Base(object):\n    def stop(self):\n        pass\n")
+    (pkg / "sub" / "new.py").write_text("def new(a):\n    pass\n")
+    (pkg / "extra").mkdir()
+    (pkg / "extra" / "tool.py").write_text("def tool():\n    pass\n")
+    (pkg / "notes.txt").write_text("notes")
+    git(tmp_path, "add", "pkg/sub/new.py")
+    git(tmp_path, "rm", "-q", "-r", "pkg/sub/deep")
+    git(tmp_path, "mv", "pkg/sub/old.py", "pkg/sub/renamed.py")
+
+    assert sorted(MG.changed_files(str(pkg), commit)) == [
+        ("A", "extra/tool.py"), ("A", "notes.txt"), ("A", "sub/new.py"),
+        ("A", "sub/renamed.py"), ("D", "sub/deep/gone.py"),
+        ("D", "sub/old.py"), ("M", "core.py")]
+
+    c_package, base_commit = MG.load_map(saved)
+    assert base_commit == commit
+    parsed = []
+
+    def parse(filename, base_name=None, single_pass=False):
+        parsed.append(filename)
+        from boring_stuff.parser.parser_python import parse_file
+        return parse_file(filename, base_name, single_pass)
+
+    c_package, delta = MG.update_map(c_package, str(pkg), commit, parse=parse)
+    assert len(parsed) == 4
+    assert json.dumps(c_package) == json.dumps(map_python(str(pkg)))
+
+    assert [module["name"] for module in delta["modules"]] == ["pkg.core"]
+    assert [sub["name"] for sub in delta["subpackages"]] == [
+        "pkg.extra", "pkg.sub"]
+    sub = delta["subpackages"][1]
+    assert [(module["name"], module.get("skipped")) for module in
+            sub["modules"]] == [("pkg.sub.new", None),
+                                ("pkg.sub.old", "removed"),
+                                ("pkg.sub.renamed", None)]
+    assert sub["subpackages"][0]["modules"][0]["name"] == "pkg.sub.deep.gone"
+
+    with pytest.raises(MG.GitError):
+        MG.changed_files(str(pkg), "no-such-ref")
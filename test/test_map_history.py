@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""Test the SQLite history of boring_stuff.projects.map_history"""
+from boring_stuff.projects.map import map_python
+from boring_stuff.projects.map_history import MapHistory
+
+
+def test_history_queries(tmp_path, make_project):
+    pkg = make_project(tmp_path)
+    history = MapHistory(str(tmp_path / "maps.sqlite"))
+    history.save(map_python(str(pkg), single_pass=True), "pkg", "1.0",
+                 created=1)
+
+    (pkg / "core.py").write_text(
+        "class Base(object):\n"
+        "    def run(self, value, *args, **kw):\n"
+        "        pass\n\n"
+        "    @staticmethod\n"
+        "    def stop():\n"
+        "        pass\n")
+    (pkg / "sub" / "leaf.py").write_text(
+        "from ..core import Base\n\n"
+        "class Leaf(Base):\n"
+        "    def stop(self):\n"
+        "        pass\n\n"
+        "class Error(ValueError):\n"
+        "    pass\n")
+    c_package = map_python(str(pkg), single_pass=True)
+    history.save(c_package, "pkg", "2.0", created=2)
+    # saving again replaces the snapshot
+    history.save(c_package, "pkg", "2.0", created=2)
+    history.close()
+
+    history = MapHistory(str(tmp_path / "maps.sqlite"))
+    assert [release for release, _ in history.releases("pkg")] == [
+        "1.0", "2.0"]
+    assert history.first_appearance("pkg", "run") == "1.0"
+    assert history.first_appearance("pkg", "stop") == "2.0"
+    assert history.first_appearance("pkg", "stop", class_name="Leaf") == \
+        "2.0"
+    assert history.first_appearance("pkg", "helper") == "1.0"
+    assert history.first_appearance("pkg", "missing") is None
+
+    assert history.subclasses("pkg", "2.0", "pkg.core.Base") == [
+        "pkg.sub.leaf.Leaf"]
+    assert history.subclasses("pkg", "2.0", "ValueError") == [
+        "pkg.sub.leaf.Error"]
+    assert history.subclasses("pkg", "1.0", "pkg.core.Base") == []
+    assert history.query(
+        "SELECT COUNT(*) FROM classes c JOIN snapshots s "
+        "ON s.id = c.snapshot_id WHERE s.release = ?", ("2.0",)) == [(3,)]
+
+    # the queries only search indexes
+    plan = history.query(
+        "EXPLAIN QUERY PLAN SELECT class_id FROM bases "
+        "WHERE snapshot_id = 1 AND base = 'x'")
+    assert "USING COVERING INDEX" in plan[0][-1]
+
+    loaded = history.load("pkg", "2.0")
+    core = loaded["modules"][1]
+    assert core["name"] == "pkg.core"
+    base = core["class_list"][0]
+    assert base["parent"] == ["object"]
+    assert base["methods"][0]["params"] == ["self", "value"]
+    assert base["methods"][0]["var_params"] == "args"
+    assert base["staticmethods"][0]["name"] == "stop"
+    leaf = loaded["subpackages"][0]["modules"][1]
+    assert leaf["dependencies"] == [["pkg.sub.leaf", "pkg.core"]]
+
+    history.delete("pkg", "1.0")
+    assert history.load("pkg", "1.0") is None
+    assert history.first_appearance("pkg", "run") == "2.0"
+    history.close()
+
+
+def test_history_map_module(tmp_path, monkeypatch):
+    import importlib
+    import sys
+    from boring_stuff.projects.map_with_inspect import map_module
+    pkg = tmp_path / "history_pkg"
+    (pkg / "sub").mkdir(parents=True)
+    # the __init__ defines members: a "module" with submodules
+    (pkg / "__init__.py").write_text(
+        "class Shape(object):\n"
+        "    def area(self):\n"
+        "        pass\n\n"
+        "from . import shapes, sub\n")
+    (pkg / "shapes.py").write_text(
+        "from . import Shape\n\n"
+        "class Square(Shape):\n"
+        "    pass\n")
+    (pkg / "sub" / "__init__.py").write_text("from . import leaf\n")
+    (pkg / "sub" / "leaf.py").write_text("def leaf(a):\n    pass\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    for name in ["history_pkg", "history_pkg.shapes", "history_pkg.sub",
+                 "history_pkg.sub.leaf"]:
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    c_package = map_module(importlib.import_module("history_pkg"))
+    assert c_package["type"] == "module"
+
+    history = MapHistory(str(tmp_path / "maps.sqlite"))
+    history.save(c_package, "pkg", "1.0", created=1)
+    loaded = history.load("pkg", "1.0")
+    assert loaded["type"] == "module"
+    assert loaded["class_list"][0]["name"] == "Shape"
+    assert [m["name"] for m in loaded["modules"]] == ["history_pkg.shapes"]
+    sub = loaded["subpackages"][0]
+    assert sub["name"] == "history_pkg.sub"
+    assert sub["modules"][0]["methods"][0]["name"] == "leaf"
+    assert history.subclasses("pkg", "1.0", "history_pkg.Shape") == [
+        "history_pkg.shapes.Square"]
+    history.close()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""Test the name filters of boring_stuff.projects.name_filter"""
+import sys
+from boring_stuff.projects import map as MAP
+from boring_stuff.projects import map_with_inspect as MWI
+from boring_stuff.projects.name_filter import NameFilter
+
+
+def test_patterns():
+    name_filter = NameFilter(
+        include=["pkg.core"], exclude=["tests", "*_pb2"], max_depth=3)
+    assert name_filter.allows("pkg")
+    assert name_filter.allows("pkg.core.models")
+    assert not name_filter.allows("pkg.vendor")
+    assert not name_filter.allows("pkg.core.tests.test_a")
+    assert not name_filter.allows("pkg.core.api_pb2")
+    assert not name_filter.allows("pkg.core.a.b.c")
+
+    name_filter = NameFilter(include=["pkg.*.core", "re:other\\.x\\d"])
+    assert name_filter.allows("pkg.sub")
+    assert name_filter.allows("pkg.sub.core.mod", False)
+    assert not name_filter.allows("pkg.sub.mod", False)
+    assert name_filter.allows("other.x1", False)
+
+
+def make_package(root, name):
+    pkg = root / name
+    for sub in ["core", "tests", "vendor"]:
+        (pkg / sub).mkdir(parents=True)
+        (pkg / sub / "__init__.py").write_text("")
+        (pkg / sub / "mod.py").write_text("def f(x):\n    pass\n")
+    (pkg / "__init__.py").write_text("")
+    return pkg
+
+
+def test_map_python_filter(tmp_path):
+    pkg = make_package(tmp_path, "filter_pkg")
+    c_package = MAP.map_python(
+        str(pkg), name_filter=NameFilter(include=["filter_pkg.core"]))
+    assert [s["name"] for s in c_package["subpackages"]] == \
+        ["filter_pkg.core"]
+    assert c_package["modules"] == []
+
+    c_package = MAP.map_python(
+        str(pkg), name_filter=NameFilter(exclude=["tests"], max_depth=1))
+    assert [s["name"] for s in c_package["subpackages"]] == \
+        ["filter_pkg.core", "filter_pkg.vendor"]
+    assert c_package["subpackages"][0]["modules"] == []
+
+
+def test_map_module_filter(tmp_path, monkeypatch):
+    make_package(tmp_path, "filter_mod_pkg")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import filter_mod_pkg
+
+    c_package = MWI.map_module(
+        filter_mod_pkg, import_workers=1,
+        name_filter=NameFilter(exclude=["tests", "vendor"]))
+    assert [s["name"] for s in c_package["subpackages"]] == \
+        ["filter_mod_pkg.core"]
+    # excluded subtrees are never imported
+    assert "filter_mod_pkg.tests" not in sys.modules
+    assert "filter_mod_pkg.vendor.mod" not in sys.modules
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+"""Test the regex based parser in boring_stuff.parser.parser_python"""
+from boring_stuff.parser import parser_python as PP
+
+SOURCE = (
+    "import os\n"
+    "\n"
+    "class Base(object):\n"
+    "    def __init__(self, name):\n"
+    "        self.name = name\n"
+    "\n"
+    "    def _run(self, a, b):\n"
+    "        pass\n"
+    "\n"
+    "class Child(Base):\n"
+    "    def go(self):\n"
+    "        pass\n"
+)
+
+
+def test_parse_file(tmp_path):
+    src = tmp_path / "sample.py"
+    src.write_text(SOURCE)
+    module = PP.parse_file(str(src), "pkg")
+
+    assert module["name"] == "pkg.sample"
+    c_list = module["class_list"]
+    assert [c["name"] for c in c_list] == ["Base", "Child"]
+    assert c_list[1]["parent"] == ["Base"]
+    assert [m["name"] for m in c_list[0]["methods"]] == ["__init__", "_run"]
+    assert c_list[0]["methods"][1]["access"] == "PROTECTED"
+    assert c_list[0]["methods"][1]["params"] == ["self", "a", "b"]
+
+
+def test_parse_buffer_matches_text():
+    from_bytes = PP.parse_buffer(SOURCE.encode(), "sample")
+    from_text = PP.parse_buffer(SOURCE, "sample")
+    assert from_bytes == from_text
+
+
+def test_empty_and_crlf(tmp_path):
+    empty = tmp_path / "empty.py"
+    empty.write_text("")
+    assert PP.parse_file(str(empty))["methods"] == []
+
+    crlf = tmp_path / "crlf.py"
+    crlf.write_bytes(SOURCE.replace("\n", "\r\n").encode())
+    module = PP.parse_file(str(crlf))
+    assert [c["name"] for c in module["class_list"]] == ["Base", "Child"]
+
+
+def test_single_pass():
+    source = (
+        "def top(x, y=f(1), *args, **kw):\n"
+        "    def inner(q):\n"
+        "        pass\n"
+        "\n"
+        "class A(Base, mod.Mixin, metaclass=Meta):\n"
+        "    @staticmethod\n"
+        "    def make(a, b: Dict[str, int] = None):\n"
+        "        pass\n"
+        "\n"
+        "    class Inner:\n"
+        "        def m(self):\n"
+        "            pass\n"
+        "\n"
+        "    def run(self, *, key):\n"
+        "        pass\n"
+    )
+    module = PP.parse_buffer_single_pass(source, "m")
+
+    assert [f["name"] for f in module["methods"]] == ["top"]
+    top = module["methods"][0]
+    assert top["params"] == ["x", "y"]
+    assert top["var_params"] == "args"
+    assert top["varkw_params"] == "kw"
+
+    c_list = module["class_list"]
+    assert [c["name"] for c in c_list] == ["A", "A.Inner"]
+    assert c_list[0]["parent"] == ["Base", "mod.Mixin"]
+    assert c_list[1]["parent"] is None
+    assert [f["name"] for f in c_list[0]["methods"]] == ["run"]
+    assert c_list[0]["methods"][0]["params"] == ["self", "key"]
+    assert c_list[0]["staticmethods"][0]["params"] == ["a", "b"]
+    assert [f["name"] for f in c_list[1]["methods"]] == ["m"]
+
+
+def test_single_pass_dedent():
+    source = (
+        "class A:\n"
+        "    def m(self, sep=')', end=\"(\"):\n"
+        '        """Doc\n'
+        "\n"
+        "Not indented\n"
+        '"""\n'
+        "        return f(\n"
+        "x)\n"
+        "\n"
+        "    if True:\n"
+        "        def n(self, a, b='#', c=\"\"\"(\"\"\"):\n"
+        "            pass\n"
+        "\n"
+        "if True:\n"
+        "    def f(x):\n"
+        "        pass\n"
+        "try:\n"
+        "    class B(A):\n"
+        "        def g(self):\n"
+        "            pass\n"
+        "except ImportError:\n"
+        "    pass\n"
+    )
+    module = PP.parse_buffer_single_pass(source, "m")
+
+    assert [f["name"] for f in module["methods"]] == ["f"]
+    c_list = module["class_list"]
+    assert [c["name"] for c in c_list] == ["A", "B"]
+    assert [f["name"] for f in c_list[0]["methods"]] == ["m", "n"]
+    assert c_list[0]["methods"][0]["params"] == ["self", "sep", "end"]
+    assert c_list[0]["methods"][1]["params"] == ["self", "a", "b", "c"]
+    assert [f["name"] for f in c_list[1]["methods"]] == ["g"]
+
+
+def test_single_pass_strings():
+    source = (
+        '"""Module doc\n'
+        "\n"
+        "import doctest\n"
+        "class Doc:\n"
+        '"""\n'
+        "class A:\n"
+        "    def m(self):\n"
+        '        x = """\n'
+        "class Fake:\n"
+        "    pass\n"
+        '"""\n'
+        "\n"
+        "    def n(self):\n"
+        "        pass\n"
+        "if True:\n"
+        "    s = '''\n"
+        "def g(y):\n"
+        "'''\n"
+        "    def f(x):\n"
+        "        pass\n"
+    )
+    module = PP.parse_buffer_single_pass(source, "m")
+
+    assert [c["name"] for c in module["class_list"]] == ["A"]
+    assert [f["name"] for f in module["class_list"][0]["methods"]] == [
+        "m", "n"]
+    assert [f["name"] for f in module["methods"]] == ["f"]
+    assert module["dependencies"] == []
+    assert PP.scan_imports(source, "m") == ([], [])
+
+
+def test_single_pass_continued_params():
+    source = (
+        "def f(a, b, \\\n"
+        "      c, d=1):\n"
+        "    pass\n"
+        "def g(x, \\\r\n"
+        "      y=(1, 2), *rest):\n"
+        "    pass\n"
+    )
+    module = PP.parse_buffer_single_pass(source, "m")
+    assert [f["params"] for f in module["methods"]] == [
+        ["a", "b", "c", "d"], ["x", "y"]]
+    assert module["methods"][1]["var_params"] == "rest"
+
+
+def test_parse_imports(tmp_path):
+    pkg = tmp_path / "pkg" / "sub"
+    pkg.mkdir(parents=True)
+    src = pkg / "mod.py"
+    src.write_text(
+        "import os, sys as system  # comment\n"
+        "from __future__ import annotations\n"
+        "from . import sibling, other as alias\n"
+        "from ..core import Base\n"
+        "from ...outside import x\n"
+        "from numpy.linalg import (\n"
+        "    norm,  # vector norm\n"
+        "    inv,\n"
+        ")\n"
+        "def lazy():\n"
+        "    import json\n")
+    module = PP.parse_file(str(src), "pkg.sub")
+
+    assert [d[1] for d in module["dependencies"]] == [
+        "os", "sys", "pkg.sub.sibling", "pkg.sub.other", "pkg.core",
+        "...outside", "numpy.linalg", "json"]
+    assert module["dependencies"][0][0] == "pkg.sub.mod"
+    assert PP.parse_file(str(src), "pkg.sub", single_pass=True)[
+        "dependencies"] == module["dependencies"]
+    assert list(module["imports"].items()) == [
+        ("os", "os"), ("system", "sys"), ("sibling", "pkg.sub.sibling"),
+        ("alias", "pkg.sub.other"), ("Base", "pkg.core.Base"),
+        ("x", "...outside.x"), ("norm", "numpy.linalg.norm"),
+        ("inv", "numpy.linalg.inv"), ("json", "json")]
+
+    # package __init__ resolves against the package itself
+    assert PP.resolve_import("core", 1, "pkg.__init__") == "pkg.core"
+
+
+def make_large_source(n_blocks):
+    """Module mixing classes, decorated and plain functions, imports"""
+    blocks = []
+    for i_block in range(n_blocks):
+        blocks.append(
+            "import mod%d\n"
+            "class Gen%d(Base):\n"
+            "    @staticmethod\n"
+            "    def make(a, b=2):\n"
+            "        from . import sib%d\n"
+            "    class Inner:\n"
+            "        def _run(self):\n"
+            "            pass\n"
+            "\n"
+            "@register\n"
+            "def helper%d(x, *args, **kw):\n"
+            "    def inner(q):\n"
+            "        pass\n"
+            "\n"
+            "def plain%d(y):\n"
+            "    pass\n" % ((i_block % 7, i_block, i_block % 5) +
+                            (i_block, i_block)))
+    return "\n".join(blocks)
+
+
+def test_parse_file_parallel(tmp_path):
+    src = tmp_path / "generated.py"
+    src.write_text(make_large_source(300))
+    buf = src.read_bytes()
+
+    points = PP.split_points(buf, 8, single_pass=True)
+    assert len(points) == 9
+    for point in points[1:-1]:
+        # never between a decorator and its function
+        assert buf[point:point + 6] in [b"class ", b"def pl"]
+
+    for single_pass in [False, True]:
+        serial = PP.parse_file(str(src), "pkg", single_pass, workers=1)
+        parallel = PP.parse_file(
+            str(src), "pkg", single_pass, workers=2, parallel_size=0)
+        assert parallel == serial
+        assert PP.parse_file_parallel(
+            str(src), "pkg.generated", single_pass, workers=2) == serial
+        assert len(serial["class_list"]) >= 300
+        assert len(serial["dependencies"]) == 12
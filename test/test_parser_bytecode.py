@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""Test the bytecode parser in boring_stuff.parser.parser_bytecode"""
+import compileall
+import importlib.util
+import py_compile
+import pytest
+from boring_stuff.parser import parser_bytecode as PB
+from boring_stuff.parser import parser_python as PP
+from boring_stuff.projects.map import map_python
+
+SOURCE = (
+    "from __future__ import annotations\n"
+    "import __future__, os\n"
+    "from . import sibling\n"
+    "from .sub.mod import name as alias\n"
+    "\n"
+    "class Base(object):\n"
+    "    def __init__(self, name, *args, key=None, **kw):\n"
+    "        self.name = name\n"
+    "\n"
+    "    @staticmethod\n"
+    "    def make(a, b=2):\n"
+    "        import json\n"
+    "\n"
+    "    @classmethod\n"
+    "    def create(cls):\n"
+    "        pass\n"
+    "\n"
+    "    class Inner:\n"
+    "        def _run(self):\n"
+    "            pass\n"
+    "\n"
+    "class Child(Base, mod.Mixin, Generic[T], metaclass=Meta):\n"
+    "    handler = lambda self: None\n"
+    "\n"
+    "def top(x, y=f(1), /, z=3, *, w):\n"
+    "    def inner(q):\n"
+    "        pass\n"
+    "    return [i for i in x]\n"
+)
+
+
+def test_same_as_single_pass():
+    from_code = PB.parse_code(compile(SOURCE, "sample", "exec"), "pkg.sample")
+    from_source = PP.parse_buffer_single_pass(SOURCE, "pkg.sample")
+    for class_spec in from_source["class_list"]:
+        class_spec["signature_loc"] = None
+    assert from_code == from_source
+    assert from_code["class_list"][2]["parent"] == [
+        "Base", "mod.Mixin", "Generic[T]"]
+    assert from_code["dependencies"] == [
+        ["pkg.sample", "__future__"], ["pkg.sample", "os"],
+        ["pkg.sample", "pkg.sibling"], ["pkg.sample", "pkg.sub.mod"],
+        ["pkg.sample", "json"]]
+
+
+def test_parse_file_uses_fresh_pyc(tmp_path):
+    src = tmp_path / "sample.py"
+    src.write_text(SOURCE)
+    assert PB.cached_pyc(str(src)) is None
+
+    pyc = py_compile.compile(str(src), doraise=True)
+    assert PB.cached_pyc(str(src)) == pyc
+    module = PB.parse_file(str(src), "pkg")
+    assert module["name"] == "pkg.sample"
+    assert module["class_list"][0]["signature_loc"] is None
+
+    # the source changed, back to the source parser
+    src.write_text(SOURCE + "\ndef extra():\n    pass\n")
+    assert PB.cached_pyc(str(src)) is None
+    module = PB.parse_file(str(src), "pkg")
+    assert module["class_list"][0]["signature_loc"] is not None
+    assert module["methods"][-1]["name"] == "extra"
+
+
+def test_sourceless_package(tmp_path):
+    pkg = tmp_path / "pkg"
+    pkg.mkdir()
+    for name, source in [("__init__", ""), ("sample", SOURCE),
+                         ("kept", "def kept():\n    pass\n")]:
+        src = pkg / (name + ".py")
+        src.write_text(source)
+        py_compile.compile(str(src), cfile=str(pkg / (name + ".pyc")))
+        if name != "kept":
+            src.unlink()
+
+    c_package = map_python(str(pkg), bytecode=True, keep_misc=False)
+    names = [module["name"] for module in c_package["modules"]]
+    assert names == ["pkg.__init__", "pkg.kept", "pkg.sample"]
+    sample = c_package["modules"][2]
+    assert [c["name"] for c in sample["class_list"]] == [
+        "Base", "Base.Inner", "Child"]
+
+    # without bytecode, only the source is mapped
+    c_package = map_python(str(pkg), keep_misc=False)
+    assert [module["name"] for module in c_package["modules"]] == ["pkg.kept"]
+
+
+def test_same_map_with_and_without_pyc(tmp_path):
+    pkg = tmp_path / "pkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("from .sample import Base\n")
+    (pkg / "sample.py").write_text(SOURCE)
+
+    def mapped():
+        c_package = map_python(str(pkg), bytecode=True, keep_misc=False)
+        for module in c_package["modules"]:
+            for class_spec in module["class_list"]:
+                class_spec["signature_loc"] = None
+        return c_package
+
+    from_source = mapped()
+    compileall.compile_dir(str(pkg), quiet=1)
+    assert PB.cached_pyc(str(pkg / "sample.py")) is not None
+    assert mapped() == from_source
+
+
+def test_other_python_version(tmp_path):
+    pyc = tmp_path / "old.pyc"
+    pyc.write_bytes(b"\x00\x00\r\n" + bytes(12))
+    assert importlib.util.MAGIC_NUMBER != b"\x00\x00\r\n"
+    with pytest.raises(ValueError):
+        PB.parse_pyc(str(pyc))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""Test the class diagram renderers in boring_stuff.uml"""
+import json
+import xml.etree.ElementTree as ET
+import pytest
+from boring_stuff.projects.map import map_python
+from boring_stuff.uml import renderers as R
+from boring_stuff.uml.graph import build_graph
+
+
+def map_sample(pkg):
+    (pkg / "core.py").write_text(
+        "class Base(object):\n"
+        "    def run(self, value):\n"
+        "        pass\n\n"
+        "class Child(Base):\n"
+        "    def stop(self):\n"
+        "        pass\n\n"
+        "class Error(ValueError):\n"
+        "    pass\n")
+    (pkg / "sub" / "leaf.py").write_text(
+        "import os\n"
+        "from ..core import Base\n\n"
+        "def helper(a, b):\n"
+        "    pass\n\n"
+        "class Leaf(Base):\n"
+        "    pass\n")
+    return map_python(str(pkg), single_pass=True)
+
+
+def test_build_graph(tmp_path, make_project):
+    c_package = map_sample(make_project(tmp_path))
+    graph = build_graph(c_package, draw_depend=True)
+    nodes = dict((node["id"], node) for node in graph["nodes"])
+    assert nodes["pkg.core.Base"]["members"] == ["+ void run(self, value)"]
+    assert nodes["pkg.sub.leaf.module"]["members"] == ["+ void helper(a, b)"]
+    assert nodes["ValueError"]["kind"] == "external"
+    assert [cluster["id"] for cluster in graph["clusters"]] == [
+        "pkg", "pkg.core", "pkg.sub", "pkg.sub.leaf"]
+
+    edges = [(edge["source"], edge["target"], edge["kind"])
+             for edge in graph["edges"]]
+    assert ("pkg.core.Child", "pkg.core.Base", "extends") in edges
+    assert ("pkg.sub.leaf.Leaf", "pkg.core.Base", "extends") in edges
+    assert ("pkg.sub.leaf.module", "pkg.core.Base", "depends") in edges
+    assert ("pkg.sub.leaf.module", "os", "depends") in edges
+
+    # same level of detail as the PlantUML writer
+    graph = build_graph(c_package, draw_depend=True, collapse_depth=0)
+    assert [node["id"] for node in graph["nodes"] if
+            node["kind"] == "collapsed"] == ["pkg.core", "pkg.sub"]
+    assert ("pkg.sub", "pkg.core", "depends") in [
+        (edge["source"], edge["target"], edge["kind"])
+        for edge in graph["edges"]]
+
+
+def test_render_formats(tmp_path, make_project):
+    c_package = map_sample(make_project(tmp_path))
+    for name in ["gen.wsd", "gen.dot", "gen.json", "gen.svg"]:
+        R.render(c_package, str(tmp_path / name), draw_depend=True)
+
+    assert "class Child" in (tmp_path / "gen.wsd").read_text()
+    dot = (tmp_path / "gen.dot").read_text()
+    assert 'subgraph "cluster_pkg.core"' in dot
+    assert '"pkg.core.Child" -> "pkg.core.Base" [arrowhead=empty];' in dot
+    graph = json.loads((tmp_path / "gen.json").read_text())
+    assert len(graph["nodes"]) == 7
+
+    svg = ET.parse(str(tmp_path / "gen.svg")).getroot()
+    groups = svg.findall("{http://www.w3.org/2000/svg}g")
+    assert len(groups) == len(graph["nodes"])
+    assert len(svg.findall("{http://www.w3.org/2000/svg}path")) == \
+        len(graph["edges"])
+
+    with pytest.raises(ValueError):
+        R.render(c_package, str(tmp_path / "gen.png"))
+
+
+def test_register_and_benchmark(tmp_path, make_project):
+    c_package = map_sample(make_project(tmp_path))
+    calls = []
+    R.register_renderer(
+        "names", lambda package, output, **kw: calls.append(kw), [".txt"])
+    try:
+        R.render(c_package, str(tmp_path / "out.txt"), max_members=3)
+        assert calls == [{"max_members": 3}]
+        assert R.get_renderer(output="gen.PUML")[0] == "plantuml"
+    finally:
+        del R.RENDERERS["names"]
+
+    records = R.benchmark(c_package, str(tmp_path / "bench"), repeat=1)
+    assert [record["format"] for record in records] == [
+        "plantuml", "dot", "json", "svg"]
+    assert all(record["bytes"] > 0 for record in records)
+    assert "svg" in R.format_benchmark(records)
@@ -1,5 +1,6 @@
 import pytest
-from boring_stuff.class_helper.setter import Setter
+from boring_stuff.class_helper.setter import Setter, setter_schema, \
+    ValidationError
 SEXES = ["Male", "Female"]
 class Person(object):
     def __init__(self, name="Bob", age=1, sex="Male"):
@@ -35,6 +36,121 @@ def test_dtype():
         p.set_sex("Hello")
 
 
+@setter_schema
+class Member(Person):
+    def __init__(self, **kwargs):
+        Person.__init__(self)
+        self.set_fields(kwargs)
+
+    @Setter(min=1, max=12, dtype=int)
+    def set_month(self, month):
+        self.month = month
+
+    @Setter(dtype=str)
+    def set_name(self, name):
+        self.name = name
+
+    @Setter(min=0.0, max=1.0)
+    def set_ratio(self, ratio):
+        self.ratio = ratio
+
+def test_schema_set_fields():
+    assert Member.setter_fields == ("age", "sex", "month", "name", "ratio")
+    m = Member(age="42", sex="Female", month="3", name=7, ratio=0.5)
+    assert (m.age, m.sex, m.month, m.name, m.ratio) == (
+        42.0, "Female", 3, "7", 0.5)
+    # any subset, the setters are still usable one by one
+    m.set_fields({"month": 4})
+    m.set_month(5)
+    assert (m.month, m.age) == (5, 42.0)
+
+def test_schema_errors():
+    m = Member(age=1)
+    with pytest.raises(ValidationError) as info:
+        m.set_fields({"age": -3, "sex": "Hello", "month": "x", "name": "Al",
+                      "ratio": "high", "height": 3})
+    assert sorted(info.value.errors) == [
+        "age", "height", "month", "ratio", "sex"]
+    assert info.value.errors["age"] == "Minimum is 0"
+    assert info.value.errors["ratio"].startswith("TypeError")
+    # nothing is set when a value is invalid
+    assert (m.age, m.name) == (1.0, "Bob")
+    with pytest.raises(ValidationError):
+        Member(age=3, sex="Male", month=13, name="Al", ratio=0.5)
+
+def test_schema_matches_setters():
+    values = [-1, 0, 0.5, 1, 12, 13, 1000, 1001, "3", "x", None, "Male"]
+    for name in Member.setter_fields:
+        for value in values:
+            try:
+                getattr(Member(), "set_" + name)(value)
+                expected = True
+            except (AssertionError, TypeError, ValueError):
+                expected = False
+            try:
+                Member.validate_fields({name: value})
+                valid = True
+            except ValidationError:
+                valid = False
+            assert valid == expected, (name, value)
+
+
+def test_schema_override():
+    @setter_schema
+    class Plain(Member):
+        def set_month(self, month):
+            self.month = -month
+
+    # the plain override is not a field any more
+    assert Plain.setter_fields == ("age", "sex", "name", "ratio")
+    member = Plain(age=3)
+    member.set_month(3)
+    assert member.month == -3
+    with pytest.raises(ValidationError):
+        member.set_fields({"month": 3})
+
+    @setter_schema
+    class Stricter(Member):
+        @Setter(min=6, max=12, dtype=int)
+        def set_month(self, month):
+            self.month = -month
+
+    member = Stricter()
+    member.set_fields({"month": "7"})
+    assert member.month == -7
+    with pytest.raises(ValidationError):
+        member.set_fields({"month": 3})
+
+
+def test_schema_unhashable_enum():
+    @setter_schema
+    class Toss(object):
+        @Setter(enum=["Head", "Tail"])
+        def set_toss(self, toss):
+            self.toss = toss
+
+    with pytest.raises(ValidationError) as info:
+        Toss.validate_fields({"toss": ["Head"]})
+    assert info.value.errors == {"toss": "Expecting in ['Head', 'Tail']"}
+    assert Toss.validate_fields({"toss": "Tail"}) == {"toss": "Tail"}
+
+
+def test_schema_name_conflict():
+    with pytest.raises(TypeError):
+        @setter_schema
+        class Own(Person):
+            def set_fields(self, values):
+                pass
+
+    class Base(object):
+        setter_fields = ("a",)
+
+    with pytest.raises(TypeError):
+        @setter_schema
+        class Derived(Base):
+            pass
+
+
 if __name__ == "__main__":
     from argparse import ArgumentParser
     parser = ArgumentParser()